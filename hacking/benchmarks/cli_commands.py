@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Times running show commands one at a time and as a batch through network_cli and the ios cliconf, on a fake device with latency."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import sys
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.loader import cliconf_loader, connection_loader, terminal_loader
+
+
+class FakeShell(object):
+    '''
+    Stands in for the paramiko channel of an ios device: the commands typed
+    reach the device half a round trip later, are run one after the other,
+    and their output, echo and prompt come back half a round trip later.
+    '''
+
+    def __init__(self, rtt, command_time, output_lines):
+        self.rtt = rtt
+        self.command_time = command_time
+        self.output = b'\r\n'.join(b'line %d of the output of the command' % i for i in range(output_lines))
+        self.device_free = 0
+        self.pending = []
+
+    def sendall(self, data):
+        now = time.time()
+        for command in data.split(b'\r')[:-1]:
+            start = max(now + self.rtt / 2, self.device_free)
+            self.device_free = start + self.command_time
+            self.pending.append([self.device_free + self.rtt / 2, b'%s\r\n%s\r\nrouter#' % (command, self.output)])
+
+    def recv(self, size):
+        (ready, data) = self.pending[0]
+        if ready > time.time():
+            time.sleep(ready - time.time())
+        if len(data) <= size:
+            self.pending.pop(0)
+        else:
+            self.pending[0][1] = data[size:]
+        return data[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=10)
+    parser.add_argument('--rtt', type=float, nargs='+', default=[0.001, 0.02, 0.1])
+    parser.add_argument('--command-time', type=float, default=0.005)
+    parser.add_argument('--output-lines', type=int, default=100)
+    args = parser.parse_args()
+
+    commands = ['show command %d' % i for i in range(args.commands)]
+
+    connection = connection_loader.get('network_cli', PlayContext(), '/dev/null')
+    connection._terminal = terminal_loader.get('ios', connection)
+    cliconf = cliconf_loader.get('ios', connection)
+
+    for rtt in args.rtt:
+        timings = []
+        outputs = []
+        for run_commands in (cliconf.run_commands, cliconf.run_commands_batch):
+            connection._ssh_shell = FakeShell(rtt, args.command_time, args.output_lines)
+            start = time.time()
+            outputs.append(run_commands(commands))
+            timings.append(time.time() - start)
+
+        if outputs[0] != outputs[1]:
+            raise Exception('the outputs of the commands run as a batch differ')
+
+        print('%d commands, %5.1fms round trip: one at a time %.3fs, batch %.3fs' % (
+            args.commands, rtt * 1000, timings[0], timings[1]))
+
+
+if __name__ == '__main__':
+    main()
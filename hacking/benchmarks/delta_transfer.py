@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Compares the bytes on the wire of sending a changed file whole and as a delta against its previous version."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.module_utils.common.delta import apply_delta, block_checksums, delta_block_size, write_delta
+
+
+def build_map(lines, seed):
+    '''
+    Builds a file looking like a generated haproxy map or hosts file, the
+    same seed giving the same lines.
+    '''
+
+    rand = random.Random(seed)
+    return b''.join(b'/path/%08x 10.%d.%d.%d\n' % (rand.getrandbits(32), rand.randint(0, 255), rand.randint(0, 255),
+                                                   rand.randint(0, 255)) for i in range(lines))
+
+
+def modify(data, changes, seed):
+    ''' Replaces, inserts or deletes a line in as many places of the data '''
+
+    rand = random.Random(seed)
+    lines = data.splitlines(True)
+    for i in range(changes):
+        pos = rand.randrange(len(lines))
+        change = rand.choice(('replace', 'insert', 'delete'))
+        if change == 'replace':
+            lines[pos] = b'/changed/%08x 192.168.0.%d\n' % (rand.getrandbits(32), rand.randint(0, 255))
+        elif change == 'insert':
+            lines.insert(pos, b'/added/%08x 192.168.1.%d\n' % (rand.getrandbits(32), rand.randint(0, 255)))
+        else:
+            del lines[pos]
+    return b''.join(lines)
+
+
+def run(tmpdir, old, new):
+    old_path = os.path.join(tmpdir, 'old')
+    new_path = os.path.join(tmpdir, 'new')
+    delta_path = os.path.join(tmpdir, 'delta')
+    patched_path = os.path.join(tmpdir, 'patched')
+    with open(old_path, 'wb') as f:
+        f.write(old)
+    with open(new_path, 'wb') as f:
+        f.write(new)
+
+    start = time.time()
+    block_size = delta_block_size(len(new))
+    # the checksums are sent back as json in the stat module results
+    signature_bytes = len(json.dumps(block_checksums(old_path, block_size)))
+    with open(delta_path, 'wb') as f:
+        write_delta(new_path, block_checksums(old_path, block_size), block_size, f)
+    apply_delta(old_path, delta_path, patched_path)
+    elapsed = time.time() - start
+
+    with open(patched_path, 'rb') as f:
+        if f.read() != new:
+            raise Exception('the delta did not rebuild the file')
+
+    return (block_size, signature_bytes, os.path.getsize(delta_path), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--changes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    old = build_map(args.lines, 0)
+    print('%d bytes file' % len(old))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for changes in args.changes:
+            new = modify(old, changes, changes)
+            (block_size, signature_bytes, delta_bytes, elapsed) = run(tmpdir, old, new)
+            print('%5d changes: whole file %9d bytes, delta %9d + checksums %8d bytes (%5.1f%%), %d bytes blocks, %.3fs' % (
+                changes, len(new), delta_bytes, signature_bytes, 100.0 * (delta_bytes + signature_bytes) / len(new),
+                block_size, elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Times VariableManager.get_vars() for every host of a large inventory, with and without the layer caches."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import sys
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+from ansible.playbook.play import Play
+from ansible.vars.manager import VariableManager
+
+
+def build_inventory(loader, hosts, groups, groups_per_host):
+    inventory = InventoryManager(loader=loader, sources='localhost,')
+
+    for g in range(groups):
+        group_name = 'group%d' % g
+        inventory.add_group(group_name)
+        group = inventory.groups[group_name]
+        group.set_variable('group_var', g)
+        group.set_variable('group%d_var' % g, dict(value=g, items=list(range(10))))
+
+    for h in range(hosts):
+        host_name = 'host%d' % h
+        for g in range(groups_per_host):
+            inventory._inventory.add_host(host_name, 'group%d' % ((h + g) % groups))
+        inventory.get_host(host_name).set_variable('host_var', h)
+
+    inventory.reconcile_inventory()
+    return inventory
+
+
+def run(variable_manager, play, task, hosts, rounds, use_cache):
+    start = time.time()
+    for _ in range(rounds):
+        for host in hosts:
+            variable_manager.get_vars(play=play, host=host, task=task, include_hostvars=False, use_cache=use_cache)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, default=5000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--groups-per-host', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=3, help='number of tasks to simulate')
+    args = parser.parse_args()
+
+    loader = DataLoader()
+    inventory = build_inventory(loader, args.hosts, args.groups, args.groups_per_host)
+    variable_manager = VariableManager(loader=loader, inventory=inventory)
+
+    play = Play.load(dict(
+        hosts='all',
+        gather_facts='no',
+        vars=dict(play_var='value'),
+        tasks=[dict(debug=dict(msg='{{ play_var }}'))],
+    ), variable_manager=variable_manager, loader=loader)
+    task = play.compile()[-1].block[0]
+    hosts = inventory.get_hosts(play.hosts)
+
+    print('%d hosts in %d groups, %d rounds' % (len(hosts), args.groups, args.rounds))
+    for (label, use_cache) in (('uncached', False), ('cached', True)):
+        elapsed = run(variable_manager, play, task, hosts, args.rounds, use_cache)
+        print('%-10s %8.2fs %8.1fus per call' % (label, elapsed, elapsed * 1e6 / (len(hosts) * args.rounds)))
+
+
+if __name__ == '__main__':
+    main()
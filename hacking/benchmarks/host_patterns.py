@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Times resolving host patterns and limit expressions against a large inventory."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import sys
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+
+PATTERNS = (
+    'all',
+    'webservers:&prod',
+    'all:!dc1',
+    'webservers:dbservers:&prod:!dc1:!canary',
+    'group1*:&dc2:!group17',
+    'host1*:&webservers',
+    '~host[0-9]*5$:!dbservers',
+)
+
+LIMITS = (
+    None,
+    'prod:!canary',
+    'dc1:dc2:&webservers',
+)
+
+
+def build_inventory(hosts, groups):
+    inventory = InventoryManager(loader=DataLoader())
+    data = inventory._inventory
+
+    roles = ('webservers', 'dbservers', 'cache')
+    for name in roles + ('prod', 'staging', 'canary', 'dc1', 'dc2', 'dc3'):
+        data.add_group(name)
+    for g in range(groups):
+        data.add_group('group%d' % g)
+        data.add_child(roles[g % len(roles)], 'group%d' % g)
+
+    for h in range(hosts):
+        name = 'host%d' % h
+        data.add_host(name, 'group%d' % (h % groups))
+        data.add_host(name, 'prod' if h % 4 else 'staging')
+        data.add_host(name, 'dc%d' % (h % 3 + 1))
+        if h % 100 == 0:
+            data.add_host(name, 'canary')
+
+    inventory.reconcile_inventory()
+    return inventory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=200)
+    args = parser.parse_args()
+
+    inventory = build_inventory(args.hosts, args.groups)
+    print('%d hosts in %d groups' % (args.hosts, len(inventory.groups)))
+
+    for limit in LIMITS:
+        inventory.subset(limit)
+        for pattern in PATTERNS:
+            inventory.clear_caches()
+            start = time.time()
+            hosts = inventory.get_hosts(pattern)
+            print('%-22s %-42s %7d hosts %8.3fs' % (limit, pattern, len(hosts), time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Times building a large inventory of nested groups and resolving group membership and host patterns against it."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import sys
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+
+
+class Timer:
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *args):
+        print('%-28s %8.3fs' % (self.label, time.time() - self.start))
+
+
+def build_inventory(hosts, groups, groups_per_host):
+    '''
+    Builds an inventory with groups nested in a tree of regions, each host
+    belonging to several leaf groups.
+    '''
+
+    inventory = InventoryManager(loader=DataLoader())
+    data = inventory._inventory
+
+    regions = max(1, groups // 10)
+    for r in range(regions):
+        data.add_group('region%d' % r)
+    for g in range(groups):
+        data.add_group('group%d' % g)
+        data.add_child('region%d' % (g % regions), 'group%d' % g)
+
+    for h in range(hosts):
+        for g in range(groups_per_host):
+            data.add_host('host%d' % h, 'group%d' % ((h * 7 + g) % groups))
+
+    return inventory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, default=50000)
+    parser.add_argument('--groups', type=int, default=300)
+    parser.add_argument('--groups-per-host', type=int, default=3)
+    args = parser.parse_args()
+
+    print('%d hosts in %d groups' % (args.hosts, args.groups))
+
+    with Timer('build'):
+        inventory = build_inventory(args.hosts, args.groups, args.groups_per_host)
+    with Timer('reconcile'):
+        inventory.reconcile_inventory()
+    with Timer('get_groups_dict'):
+        inventory.get_groups_dict()
+    with Timer('patterns'):
+        for pattern in ('all', 'region1', 'region*:!group1', 'region1:&region2', 'group1:group2:group3', 'host1*'):
+            inventory.get_hosts(pattern)
+    with Timer('add_host + get_groups_dict'):
+        for i in range(10):
+            inventory.add_host('new%d' % i, 'group%d' % i)
+            inventory.get_groups_dict()
+
+
+if __name__ == '__main__':
+    main()
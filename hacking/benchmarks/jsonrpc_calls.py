@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Measures the json-rpc calls per second a module can make to ansible-connection, connecting for every call, over one socket and pipelined."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import imp
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.module_utils.connection import Connection
+from ansible.playbook.play_context import PlayContext
+from ansible.utils.display import Display
+
+
+class FakeConnection(object):
+    ''' Stands in for a network connection plugin, answering without talking to a device '''
+
+    connected = True
+
+    def __init__(self):
+        self._play_context = PlayContext()
+        self._play_context.timeout = 30
+
+    def get_option(self, option):
+        return 30
+
+    def close(self):
+        pass
+
+    def get_capabilities(self):
+        return '{"network_api": "cliconf", "device_info": {"network_os": "fake"}}'
+
+    def get(self, command):
+        return 'output of %s' % command
+
+
+def start_server(socket_path):
+    '''
+    Runs the request loop of ansible-connection, serving a fake connection,
+    in a child process.
+    '''
+
+    ansible_connection = imp.load_source('ansible_connection', os.path.join(BASE_PATH, 'bin', 'ansible-connection'))
+    ansible_connection.display = Display()
+
+    process = ansible_connection.ConnectionProcess(None, PlayContext(), socket_path, os.getcwd())
+    process.connection = FakeConnection()
+    process.srv.register(process.connection)
+    process.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    process.sock.bind(socket_path)
+    process.sock.listen(1)
+
+    pid = os.fork()
+    if pid == 0:
+        process.run()
+        os._exit(0)
+    process.sock.close()
+    return pid
+
+
+def per_call_connection(socket_path, calls):
+    for i in range(calls):
+        Connection(socket_path).get('show version')
+
+
+def reused_connection(socket_path, calls):
+    connection = Connection(socket_path)
+    for i in range(calls):
+        connection.get('show version')
+
+
+def pipelined(socket_path, calls, batch):
+    connection = Connection(socket_path)
+    for i in range(0, calls, batch):
+        connection.__rpc_batch__([('get', ['show version'], {})] * min(batch, calls - i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=50, help='calls sent at once when pipelining')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    socket_path = os.path.join(tmpdir, 'socket')
+    pid = start_server(socket_path)
+    try:
+        for (name, func) in (('new socket per call', lambda: per_call_connection(socket_path, args.calls)),
+                             ('one socket', lambda: reused_connection(socket_path, args.calls)),
+                             ('pipelined by %d' % args.batch, lambda: pipelined(socket_path, args.calls, args.batch))):
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+            print('%-20s %8.0f calls/s' % (name, args.calls / elapsed))
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Times finding the module_utils imported by every module in lib/ansible/modules and adding them to an AnsiballZ zip."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+from io import BytesIO
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.errors import AnsibleError
+from ansible.executor.module_common import recursive_finder
+
+
+def find_modules(path):
+    for (dirpath, dirnames, filenames) in os.walk(path):
+        for filename in sorted(filenames):
+            if filename.endswith('.py') and not filename.startswith('_'):
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    b_module_data = f.read()
+                if b'from ansible.module_utils' in b_module_data or b'import ansible.module_utils' in b_module_data:
+                    yield (filename[:-3], b_module_data)
+
+
+def run(modules):
+    failed = 0
+    start = time.time()
+    for (name, b_module_data) in modules:
+        zf = zipfile.ZipFile(BytesIO(), mode='w', compression=zipfile.ZIP_STORED)
+        try:
+            recursive_finder(name, b_module_data, set(), {('__init__',): (b'', '[builtin]')}, zf)
+        except (AnsibleError, SyntaxError):
+            failed += 1
+        zf.close()
+    return (time.time() - start, failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--path', default=os.path.join(ANSIBLE_PATH, 'ansible', 'modules'))
+    parser.add_argument('--passes', type=int, default=3)
+    args = parser.parse_args()
+
+    modules = list(find_modules(args.path))
+    print('%d modules' % len(modules))
+
+    for i in range(args.passes):
+        (elapsed, failed) = run(modules)
+        print('pass %d: %8.3fs (%.2fms per module, %d failed)' % (i + 1, elapsed, elapsed * 1000 / len(modules), failed))
+
+
+if __name__ == '__main__':
+    main()
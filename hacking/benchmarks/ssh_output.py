@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Times reading the output of commands of growing size through the ssh connection plugin, using a fake ssh executable."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.loader import connection_loader
+
+# stands in for ssh: ignores its arguments and writes the requested number
+# of megabytes of lines to stdout, and a few lines to stderr
+FAKE_SSH = '''#!%s
+import sys
+size = int(sys.argv[-1]) * 1024 * 1024
+line = b'x' * 99 + b'\\n'
+block = line * 655
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+while size > 0:
+    out.write(block[:size])
+    size -= len(block)
+out.flush()
+sys.stderr.write('Warning: Permanently added the host to the list of known hosts.\\n')
+'''
+
+
+def make_fake_ssh(tmpdir):
+    path = os.path.join(tmpdir, 'ssh')
+    with open(path, 'w') as f:
+        f.write(FAKE_SSH % sys.executable)
+    os.chmod(path, stat.S_IRWXU)
+    return path
+
+
+def run(connection, fake_ssh, size):
+    start = time.time()
+    (returncode, stdout, stderr) = connection._bare_run([fake_ssh, 'benchmark', str(size)], None, sudoable=False)
+    elapsed = time.time() - start
+
+    if returncode != 0 or len(stdout) != size * 1024 * 1024:
+        raise Exception('the fake ssh failed with %d: %s' % (returncode, stderr))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 500], help='output sizes in MB')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fake_ssh = make_fake_ssh(tmpdir)
+
+        play_context = PlayContext()
+        play_context.remote_addr = 'benchmark'
+        connection = connection_loader.get('ssh', play_context, os.devnull)
+        connection.set_options()
+
+        for size in args.sizes:
+            elapsed = run(connection, fake_ssh, size)
+            print('%5d MB: %.2fs, %.1f MB/s' % (size, elapsed, size / elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -347,7 +347,7 @@ class InventoryCLI(CLI):
 
     def yaml_inventory(self, top):
 
-        seen = []
+        seen = set()
 
         def format_group(group):
             results = {}
@@ -367,7 +367,7 @@ class InventoryCLI(CLI):
                 for h in sorted(group.hosts, key=attrgetter('name')):
                     myvars = {}
                     if h.name not in seen:  # avoid defining host vars more than once
-                        seen.append(h.name)
+                        seen.add(h.name)
                         myvars = self._get_host_variables(host=h)
                         self._remove_internal(myvars)
                     results[group.name]['hosts'][h.name] = myvars
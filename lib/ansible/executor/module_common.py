@@ -30,6 +30,8 @@ import shlex
 import zipfile
 import random
 import re
+from collections import OrderedDict
+from hashlib import sha1
 from io import BytesIO
 
 from ansible.release import __version__, __author__
@@ -145,7 +147,60 @@ else:
     PY3 = True
 
 ZIPDATA = """%(zipdata)s"""
+ANSIBALLZ_CACHE = %(cache)s
+ANSIBALLZ_SERVER = %(server)s
+
+def is_private_dir(path):
+    st = os.stat(path)
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+def load_zipdata():
+    # With ANSIBALLZ_REMOTE_CACHE the zip data is stored on this host, named
+    # after its sha1 checksum.  Payloads sent after that leave ZIPDATA empty
+    # and use the stored copy instead.
+    if ANSIBALLZ_CACHE is None:
+        return base64.b64decode(ZIPDATA)
+
+    import hashlib
+    cache_dir = os.path.expanduser(ANSIBALLZ_CACHE[0])
+    cached_zip = os.path.join(cache_dir, ANSIBALLZ_CACHE[1])
+    if ZIPDATA:
+        b_zipdata = ZIPDATA
+        if PY3:
+            b_zipdata = ZIPDATA.encode('ascii')
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, 0o700)
+            if is_private_dir(cache_dir):
+                # Write to a temp file first so that no one reads a
+                # partially written zip
+                fd, cached_part = tempfile.mkstemp(dir=cache_dir)
+                f = os.fdopen(fd, 'wb')
+                try:
+                    f.write(b_zipdata)
+                finally:
+                    f.close()
+                os.rename(cached_part, cached_zip)
+        except (IOError, OSError):
+            # The cache is only an optimization
+            pass
+        return base64.b64decode(b_zipdata)
 
+    try:
+        if is_private_dir(cache_dir):
+            f = open(cached_zip, 'rb')
+            try:
+                b_zipdata = f.read()
+            finally:
+                f.close()
+            if hashlib.sha1(b_zipdata).hexdigest() == ANSIBALLZ_CACHE[1]:
+                return base64.b64decode(b_zipdata)
+    except (IOError, OSError):
+        pass
+    # The controller sends the full payload when it sees this
+    print('{"failed": true, "msg": "AnsiballZ payload is not cached on this host", "_ansible_ansiballz_cache_miss": true}')
+    sys.exit(1)
+%(server_client)s
 def invoke_module(module, modlib_path, json_params):
     pythonpath = os.environ.get('PYTHONPATH')
     if pythonpath:
@@ -299,6 +354,7 @@ if __name__ == '__main__':
     ANSIBALLZ_PARAMS = %(params)s
     if PY3:
         ANSIBALLZ_PARAMS = ANSIBALLZ_PARAMS.encode('utf-8')
+    zipdata = load_zipdata()
     try:
         # There's a race condition with the controller removing the
         # remote_tmpdir and this module executing under async.  So we cannot
@@ -307,7 +363,7 @@ if __name__ == '__main__':
 
         zipped_mod = os.path.join(temp_path, 'ansible_modlib.zip')
         modlib = open(zipped_mod, 'wb')
-        modlib.write(base64.b64decode(ZIPDATA))
+        modlib.write(zipdata)
         modlib.close()
 
         if len(sys.argv) == 2:
@@ -336,7 +392,11 @@ if __name__ == '__main__':
             z.writestr(zinfo, sitecustomize)
             z.close()
 
-            exitcode = invoke_module(module, zipped_mod, ANSIBALLZ_PARAMS)
+            exitcode = None
+            if ANSIBALLZ_SERVER is not None:
+                exitcode = run_in_module_server(temp_path, zipped_mod, module, ANSIBALLZ_PARAMS)
+            if exitcode is None:
+                exitcode = invoke_module(module, zipped_mod, ANSIBALLZ_PARAMS)
     finally:
         try:
             shutil.rmtree(temp_path)
@@ -347,6 +407,277 @@ if __name__ == '__main__':
 '''
 
 
+# Runs AnsiballZ modules in processes forked from a long lived interpreter
+# which has already imported ansible.module_utils.basic.  Started in the
+# background by the AnsiballZ wrapper when ANSIBALLZ_MODULE_SERVER is enabled
+# and no server is listening yet, as:
+#   python -c MODULE_SERVER SERVER_DIR KEY IDLE_TIMEOUT
+# SERVER_DIR/KEY.zip holds the module_utils it imports.  The key is derived
+# from the interpreter and the module_utils files, so changing either starts
+# a new server.  Servers exit after IDLE_TIMEOUT seconds without requests.
+MODULE_SERVER = u'''
+import fcntl
+import json
+import os
+import select
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+
+def native(value):
+    if sys.version_info < (3,):
+        return value.encode('utf-8')
+    return value
+
+
+def run_module(request):
+    # Runs in a child of the server with the environment of the AnsiballZ
+    # wrapper that sent the request and never returns
+    exitcode = 1
+    try:
+        os.chdir(native(request['cwd']))
+        os.environ.clear()
+        for (name, value) in request['env'].items():
+            os.environ[native(name)] = native(value)
+        tempfile.tempdir = None
+        for (fd, path, flags) in ((0, os.devnull, os.O_RDONLY), (1, request['stdout'], os.O_WRONLY), (2, request['stderr'], os.O_WRONLY)):
+            new_fd = os.open(path, flags)
+            os.dup2(new_fd, fd)
+            os.close(new_fd)
+
+        # Modules and module_utils not imported yet come from the payload
+        zipped_mod = native(request['zip'])
+        sys.path.insert(0, zipped_mod)
+        import ansible
+        import ansible.module_utils.basic
+        ansible.__path__.insert(0, os.path.join(zipped_mod, 'ansible'))
+        ansible.module_utils.__path__.insert(0, os.path.join(zipped_mod, 'ansible', 'module_utils'))
+        ansible.module_utils.basic._ANSIBLE_ARGS = request['params'].encode('utf-8')
+        sys.argv = [native(request['module'])]
+
+        import runpy
+        try:
+            try:
+                runpy.run_path(sys.argv[0], run_name='__main__')
+                exitcode = 0
+            except Exception:
+                # Report it as the interpreter would, some modules set a hook
+                # turning their exceptions into failures
+                sys.excepthook(*sys.exc_info())
+        except SystemExit:
+            e = sys.exc_info()[1]
+            if e.code is None:
+                exitcode = 0
+            elif isinstance(e.code, int):
+                exitcode = e.code
+            else:
+                sys.stderr.write('%s\\n' % e.code)
+    except Exception:
+        traceback.print_exc()
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(exitcode)
+
+
+def handle(conn):
+    # Runs in a child of the server for each request and never returns
+    try:
+        request = json.loads(conn.makefile('rb').readline().decode('utf-8'))
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            run_module(request)
+        conn.sendall('started\\n'.encode('ascii'))
+        status = os.waitpid(pid, 0)[1]
+        if os.WIFEXITED(status):
+            exitcode = os.WEXITSTATUS(status)
+        else:
+            exitcode = 128 + os.WTERMSIG(status)
+        conn.sendall(('%d\\n' % exitcode).encode('ascii'))
+    finally:
+        os._exit(0)
+
+
+def serve(server_dir, key, idle_timeout):
+    os.umask(0o077)
+    base = os.path.join(server_dir, key)
+
+    # Only one server per key, the lock is held until it exits
+    lock = open(base + '.lock', 'a')
+    fcntl.fcntl(lock.fileno(), fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        return
+
+    sys.path = [p for p in sys.path if p]
+    sys.path.insert(0, base + '.zip')
+    import ansible.module_utils.basic
+
+    sock_path = base + '.sock'
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    fcntl.fcntl(listener.fileno(), fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+    listener.bind(sock_path)
+    listener.listen(64)
+
+    children = set()
+    last_request = time.time()
+    try:
+        while True:
+            if select.select([listener], [], [], 1)[0]:
+                conn = listener.accept()[0]
+                pid = os.fork()
+                if pid == 0:
+                    listener.close()
+                    handle(conn)
+                conn.close()
+                children.add(pid)
+                last_request = time.time()
+            while children:
+                pid = os.waitpid(-1, os.WNOHANG)[0]
+                if not pid:
+                    break
+                children.discard(pid)
+            if not children and time.time() - last_request > idle_timeout:
+                break
+    finally:
+        os.unlink(sock_path)
+        listener.close()
+
+
+if __name__ == '__main__':
+    os.setsid()
+    serve(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+'''
+
+# Added to the AnsiballZ wrapper when ANSIBALLZ_MODULE_SERVER is enabled
+MODULE_SERVER_CLIENT = u'''
+MODULE_SERVER = %(source)s
+
+def start_module_server(base, zipped_mod):
+    # The server imports from its own copy of the zip as temp_path is
+    # removed once the module ran
+    try:
+        fd, part = tempfile.mkstemp(dir=os.path.dirname(base))
+        os.close(fd)
+        shutil.copyfile(zipped_mod, part)
+        os.rename(part, base + '.zip')
+        devnull = open(os.devnull, 'r+b')
+        subprocess.Popen([%(interpreter)s, '-c', MODULE_SERVER, os.path.dirname(base), os.path.basename(base), str(ANSIBALLZ_SERVER[2])],
+                         stdin=devnull, stdout=devnull, stderr=devnull, close_fds=True, cwd='/')
+        devnull.close()
+    except (IOError, OSError):
+        pass
+
+def run_in_module_server(temp_path, zipped_mod, module, json_params):
+    # Returns the exit code of the module, or None if the server did not run
+    # it and it has to be run here
+    import json
+    import socket
+    server_dir = os.path.expanduser(ANSIBALLZ_SERVER[0])
+    base = os.path.join(server_dir, ANSIBALLZ_SERVER[1])
+    stdout_path = os.path.join(temp_path, 'stdout')
+    stderr_path = os.path.join(temp_path, 'stderr')
+    if PY3:
+        json_params = json_params.decode('utf-8')
+    try:
+        request = dict(zip=zipped_mod, module=module, params=json_params, stdout=stdout_path, stderr=stderr_path,
+                       cwd=os.getcwd(), env=dict(os.environ))
+        request = json.dumps(request).encode('utf-8') + '\\n'.encode('ascii')
+    except ValueError:
+        # Paths or environment the server could not decode
+        return None
+
+    try:
+        if not os.path.isdir(server_dir):
+            os.makedirs(server_dir, 0o700)
+        if not is_private_dir(server_dir):
+            return None
+        for path in (stdout_path, stderr_path):
+            open(path, 'wb').close()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(base + '.sock')
+    except (IOError, OSError):
+        start_module_server(base, zipped_mod)
+        return None
+
+    try:
+        conn.sendall(request)
+        response = conn.makefile('rb')
+        started = response.readline()
+    except (IOError, OSError):
+        started = None
+    if not started or started.strip() != 'started'.encode('ascii'):
+        # The server went away without running the module
+        return None
+
+    try:
+        exitcode = int(response.readline())
+    except (IOError, OSError, ValueError):
+        sys.stderr.write('Lost the connection to the module server while the module was running\\n')
+        exitcode = 1
+
+    for (path, output) in ((stderr_path, sys.stderr), (stdout_path, sys.stdout)):
+        f = open(path, 'rb')
+        try:
+            if PY3:
+                output.buffer.write(f.read())
+            else:
+                output.write(f.read())
+        finally:
+            f.close()
+    return exitcode
+'''
+
+# Runs the AnsiballZ payloads of a batch of tasks (see TASK_BATCH_SIZE) one
+# after the other, the same way they are run when pipelining
+BATCH_TEMPLATE = u'''%(shebang)s
+%(coding)s
+import base64
+import json
+import subprocess
+import sys
+
+PAYLOADS = %(payloads)s
+
+
+def has_failed(stdout):
+    # Modules print their result last, on a line of its own
+    for line in reversed(stdout.splitlines()):
+        if line.startswith('{'):
+            try:
+                return json.loads(line).get('failed', False)
+            except ValueError:
+                return False
+    return False
+
+
+def main():
+    results = []
+    for payload in PAYLOADS:
+        p = subprocess.Popen([sys.executable, '-'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (stdout, stderr) = p.communicate(base64.b64decode(payload.encode('ascii')))
+        stdout = stdout.decode('utf-8', 'replace')
+        results.append(dict(rc=p.returncode, stdout=stdout, stderr=stderr.decode('utf-8', 'replace')))
+        # The modules after a failed one are left for the controller to run
+        # or skip as usual
+        if p.returncode != 0 or has_failed(stdout):
+            break
+    print(json.dumps(dict(batch_results=results)))
+
+
+if __name__ == '__main__':
+    main()
+'''
+
+
 def _strip_comments(source):
     # Strip comments and blank lines from the wrapper
     buf = []
@@ -362,9 +693,38 @@ if C.DEFAULT_KEEP_REMOTE_FILES:
     # Keep comments when KEEP_REMOTE_FILES is set.  That way users will see
     # the comments with some nice usage instructions
     ACTIVE_ANSIBALLZ_TEMPLATE = ANSIBALLZ_TEMPLATE
+    ACTIVE_MODULE_SERVER_CLIENT = MODULE_SERVER_CLIENT
+    ACTIVE_MODULE_SERVER = MODULE_SERVER
+    ACTIVE_BATCH_TEMPLATE = BATCH_TEMPLATE
 else:
     # ANSIBALLZ_TEMPLATE stripped of comments for smaller over the wire size
     ACTIVE_ANSIBALLZ_TEMPLATE = _strip_comments(ANSIBALLZ_TEMPLATE)
+    ACTIVE_MODULE_SERVER_CLIENT = _strip_comments(MODULE_SERVER_CLIENT)
+    ACTIVE_MODULE_SERVER = _strip_comments(MODULE_SERVER)
+    ACTIVE_BATCH_TEMPLATE = _strip_comments(BATCH_TEMPLATE)
+
+
+# Zip data of AnsiballZ modules by cache key, the module_utils files each
+# module source pulled in and the checksums of those files.  See
+# _get_ansiballz_zipdata()
+_ANSIBALLZ_ZIPDATA = OrderedDict()
+_ANSIBALLZ_DEPS = {}
+_FILE_CHECKSUMS = {}
+
+# ansible.module_utils imports by checksum of the module or module_utils
+# source they are in, and the existing module_utils directories by configured
+# paths.  See recursive_finder()
+_MODULE_IMPORTS = {}
+_MODULE_UTILS_PATHS = {}
+
+
+def _zip_writestr(zf, filename, data):
+    # Use a fixed timestamp so that the zip data only changes with the code in
+    # it.  This keeps its checksum stable for ANSIBALLZ_REMOTE_CACHE.
+    zinfo = zipfile.ZipInfo(filename, date_time=(1980, 1, 1, 0, 0, 0))
+    zinfo.compress_type = zf.compression
+    zinfo.external_attr = 0o600 << 16
+    zf.writestr(zinfo, data)
 
 
 class ModuleDepFinder(ast.NodeVisitor):
@@ -452,15 +812,44 @@ def _get_shebang(interpreter, task_vars, templar, args=tuple()):
     return (shebang, interpreter)
 
 
-def recursive_finder(name, data, py_module_names, py_module_cache, zf):
+def _get_module_imports(data):
+    """
+    Returns the ansible.module_utils imports in the source of a module or
+    module_utils file, as found by ModuleDepFinder.  They are cached by
+    checksum of the source so each file is only parsed once.
+    """
+    key = sha1(to_bytes(data, errors='surrogate_or_strict')).hexdigest()
+    imports = _MODULE_IMPORTS.get(key)
+    if imports is None:
+        tree = ast.parse(data)
+        finder = ModuleDepFinder()
+        finder.visit(tree)
+        imports = _MODULE_IMPORTS[key] = frozenset(finder.submodules)
+    return imports
+
+
+def _get_module_utils_paths():
+    # module_utils directories, checked for existence once per set of
+    # configured paths
+    paths = tuple(module_utils_loader._get_paths(subdirs=False))
+    module_utils_paths = _MODULE_UTILS_PATHS.get(paths)
+    if module_utils_paths is None:
+        module_utils_paths = [p for p in paths if os.path.isdir(p)]
+        module_utils_paths.append(_MODULE_UTILS_PATH)
+        _MODULE_UTILS_PATHS[paths] = module_utils_paths
+    return module_utils_paths
+
+
+def recursive_finder(name, data, py_module_names, py_module_cache, zf, py_module_paths=None):
     """
     Using ModuleDepFinder, make sure we have all of the module_utils files that
     the module its module_utils files needs.
+
+    If py_module_paths is given, the paths of the files added to zf are added
+    to it.
     """
-    # Parse the module and find the imports of ansible.module_utils
-    tree = ast.parse(data)
-    finder = ModuleDepFinder()
-    finder.visit(tree)
+    # Find the imports of ansible.module_utils in the module
+    imports = _get_module_imports(data)
 
     #
     # Determine what imports that we've found are modules (vs class, function.
@@ -472,9 +861,8 @@ def recursive_finder(name, data, py_module_names, py_module_cache, zf):
     # Exclude paths that match with paths we've already processed
     # (Have to exclude them a second time once the paths are processed)
 
-    module_utils_paths = [p for p in module_utils_loader._get_paths(subdirs=False) if os.path.isdir(p)]
-    module_utils_paths.append(_MODULE_UTILS_PATH)
-    for py_module_name in finder.submodules.difference(py_module_names):
+    module_utils_paths = _get_module_utils_paths()
+    for py_module_name in imports.difference(py_module_names):
         module_info = None
 
         if py_module_name[0] == 'six':
@@ -566,15 +954,16 @@ def recursive_finder(name, data, py_module_names, py_module_cache, zf):
     #
 
     # set of modules that we haven't added to the zipfile
-    unprocessed_py_module_names = normalized_modules.difference(py_module_names)
+    unprocessed_py_module_names = sorted(normalized_modules.difference(py_module_names))
 
     for py_module_name in unprocessed_py_module_names:
         py_module_path = os.path.join(*py_module_name)
         py_module_file_name = '%s.py' % py_module_path
 
-        zf.writestr(os.path.join("ansible/module_utils",
-                    py_module_file_name), py_module_cache[py_module_name][0])
+        _zip_writestr(zf, os.path.join("ansible/module_utils", py_module_file_name), py_module_cache[py_module_name][0])
         display.vvvvv("Using module_utils file %s" % py_module_cache[py_module_name][1])
+        if py_module_paths is not None:
+            py_module_paths.add(py_module_cache[py_module_name][1])
 
     # Add the names of the files we're scheduling to examine in the loop to
     # py_module_names so that we don't re-examine them in the next pass
@@ -582,7 +971,7 @@ def recursive_finder(name, data, py_module_names, py_module_cache, zf):
     py_module_names.update(unprocessed_py_module_names)
 
     for py_module_file in unprocessed_py_module_names:
-        recursive_finder(py_module_file, py_module_cache[py_module_file][0], py_module_names, py_module_cache, zf)
+        recursive_finder(py_module_file, py_module_cache[py_module_file][0], py_module_names, py_module_cache, zf, py_module_paths)
         # Save memory; the file won't have to be read again for this ansible module.
         del py_module_cache[py_module_file]
 
@@ -593,8 +982,212 @@ def _is_binary(b_module_data):
     return bool(start.translate(None, textchars))
 
 
+def _file_checksum(path):
+    # Only read the file again when its mtime or size changed
+    st = os.stat(path)
+    cached = _FILE_CHECKSUMS.get(path)
+    if cached is None or cached[:2] != (st.st_mtime, st.st_size):
+        with open(path, 'rb') as f:
+            cached = (st.st_mtime, st.st_size, sha1(f.read()).hexdigest())
+        _FILE_CHECKSUMS[path] = cached
+    return cached[2]
+
+
+def _ansiballz_cache_key(source_key, dep_paths):
+    key = sha1(to_bytes(source_key))
+    for path in dep_paths:
+        key.update(to_bytes(u'%s:%s\n' % (path, _file_checksum(path)), errors='surrogate_or_strict'))
+    return key.hexdigest()
+
+
+def _remember_zipdata(key, zipdata):
+    _ANSIBALLZ_ZIPDATA.pop(key, None)
+    _ANSIBALLZ_ZIPDATA[key] = zipdata
+    max_size = C.ANSIBALLZ_CACHE_MAX_SIZE * 1024 * 1024
+    while len(_ANSIBALLZ_ZIPDATA) > 1 and sum(len(z) for z in _ANSIBALLZ_ZIPDATA.values()) > max_size:
+        _ANSIBALLZ_ZIPDATA.popitem(last=False)
+
+
+def _get_cached_zipdata(lookup_path, source_key):
+    """
+    Returns the zip data cached for the module with the given source key, if
+    none of the module_utils files that went in it changed since.
+    """
+    dep_paths = _ANSIBALLZ_DEPS.get(source_key)
+    if dep_paths is None:
+        try:
+            with open(os.path.join(lookup_path, source_key + '.deps'), 'r') as f:
+                dep_paths = _ANSIBALLZ_DEPS[source_key] = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    try:
+        key = _ansiballz_cache_key(source_key, dep_paths)
+    except (IOError, OSError):
+        # A module_utils file went away, building the zip will report it
+        return None
+
+    zipdata = _ANSIBALLZ_ZIPDATA.get(key)
+    if zipdata is None:
+        cached_module_filename = os.path.join(lookup_path, key)
+        try:
+            with open(cached_module_filename, 'rb') as f:
+                zipdata = f.read()
+            # Most recently used entries are the last to be evicted
+            os.utime(cached_module_filename, None)
+        except (IOError, OSError):
+            return None
+        display.debug('ANSIBALLZ: using cached module: %s' % cached_module_filename)
+    _remember_zipdata(key, zipdata)
+    return zipdata
+
+
+def _write_cached_file(filename, data):
+    # Write to a temp file first so that no one looking for the file reads a
+    # partially written file
+    with open(filename + '-part', 'wb') as f:
+        f.write(data)
+    os.rename(filename + '-part', filename)
+
+
+def _evict_ansiballz_cache(lookup_path):
+    """
+    Removes the least recently used files in the cache until it fits in
+    ANSIBALLZ_CACHE_MAX_SIZE.
+    """
+    entries = []
+    for filename in os.listdir(lookup_path):
+        if filename.endswith('-part'):
+            continue
+        path = os.path.join(lookup_path, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    size = sum(entry[1] for entry in entries)
+    max_size = C.ANSIBALLZ_CACHE_MAX_SIZE * 1024 * 1024
+    for (mtime, entry_size, path) in sorted(entries):
+        if size <= max_size:
+            break
+        display.debug('ANSIBALLZ: Evicting %s' % path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        size -= entry_size
+
+
+def _get_ansiballz_zipdata(module_name, b_module_data, module_compression):
+    """
+    Returns the base64 encoded zip of the module and the module_utils files
+    it imports, built once and then cached in memory and in DEFAULT_LOCAL_TMP.
+
+    The cache is keyed on checksums of the module source and of every
+    module_utils file in the zip, so changes to any of them are picked up.
+    """
+    try:
+        compression_method = getattr(zipfile, module_compression)
+    except AttributeError:
+        display.warning(u'Bad module compression string specified: %s.  Using ZIP_STORED (no compression)' % module_compression)
+        compression_method = zipfile.ZIP_STORED
+
+    lookup_path = os.path.join(C.DEFAULT_LOCAL_TMP, 'ansiballz_cache')
+    source_key = "%s-%s-%s" % (module_name, module_compression, sha1(b_module_data).hexdigest())
+
+    # Optimization -- don't lock if the module has already been cached
+    zipdata = _get_cached_zipdata(lookup_path, source_key)
+    if zipdata is not None:
+        return zipdata
+
+    if module_name in action_write_locks.action_write_locks:
+        display.debug('ANSIBALLZ: Using lock for %s' % module_name)
+        lock = action_write_locks.action_write_locks[module_name]
+    else:
+        # If the action plugin directly invokes the module (instead of
+        # going through a strategy) then we don't have a cross-process
+        # Lock specifically for this module.  Use the "unexpected
+        # module" lock instead
+        display.debug('ANSIBALLZ: Using generic lock for %s' % module_name)
+        lock = action_write_locks.action_write_locks[None]
+
+    display.debug('ANSIBALLZ: Acquiring lock')
+    with lock:
+        display.debug('ANSIBALLZ: Lock acquired: %s' % id(lock))
+        # Check that no other process has created this while we were
+        # waiting for the lock
+        zipdata = _get_cached_zipdata(lookup_path, source_key)
+        if zipdata is not None:
+            return zipdata
+
+        display.debug('ANSIBALLZ: Creating module')
+        # Create the module zip data
+        zipoutput = BytesIO()
+        zf = zipfile.ZipFile(zipoutput, mode='w', compression=compression_method)
+        # Note: If we need to import from release.py first,
+        # remember to catch all exceptions: https://github.com/ansible/ansible/issues/16523
+        _zip_writestr(zf, 'ansible/__init__.py',
+                      b'from pkgutil import extend_path\n__path__=extend_path(__path__,__name__)\n__version__="' +
+                      to_bytes(__version__) + b'"\n__author__="' +
+                      to_bytes(__author__) + b'"\n')
+        _zip_writestr(zf, 'ansible/module_utils/__init__.py', b'from pkgutil import extend_path\n__path__=extend_path(__path__,__name__)\n')
+
+        _zip_writestr(zf, 'ansible_module_%s.py' % module_name, b_module_data)
+
+        py_module_cache = {('__init__',): (b'', '[builtin]')}
+        py_module_paths = set()
+        recursive_finder(module_name, b_module_data, set(), py_module_cache, zf, py_module_paths)
+        zf.close()
+        zipdata = base64.b64encode(zipoutput.getvalue())
+
+        dep_paths = sorted(py_module_paths)
+        key = _ansiballz_cache_key(source_key, dep_paths)
+        _ANSIBALLZ_DEPS[source_key] = dep_paths
+        _remember_zipdata(key, zipdata)
+
+        if not os.path.exists(lookup_path):
+            # Note -- if we have a global function to setup, that would
+            # be a better place to run this
+            os.makedirs(lookup_path)
+        display.debug('ANSIBALLZ: Writing module')
+        _write_cached_file(os.path.join(lookup_path, key), zipdata)
+        _write_cached_file(os.path.join(lookup_path, source_key + '.deps'), to_bytes(json.dumps(dep_paths)))
+        _evict_ansiballz_cache(lookup_path)
+        display.debug('ANSIBALLZ: Done creating module')
+
+    return zipdata
+
+
+def _get_module_server_key(interpreter, module_compression):
+    # Identifies the interpreter, code and module_utils imported by a module
+    # server.  The server imports them from the first payload that starts it,
+    # those were built from the same files as this zip
+    zipdata = _get_ansiballz_zipdata('module_server', b'from ansible.module_utils.basic import AnsibleModule\n', module_compression)
+    return sha1(to_bytes(interpreter + ACTIVE_MODULE_SERVER, errors='surrogate_or_strict') + zipdata).hexdigest()
+
+
+def preload_module(module_name, module_path, module_compression):
+    """
+    Builds the zip data of an AnsiballZ module ahead of its first use so that
+    processes forked afterwards find it in the in-memory cache.  Does nothing
+    for other kinds of modules.
+    """
+    with open(module_path, 'rb') as f:
+        b_module_data = f.read()
+
+    if _is_binary(b_module_data):
+        return
+    if REPLACER in b_module_data:
+        b_module_data = b_module_data.replace(REPLACER, b'from ansible.module_utils.basic import *')
+    elif b'from ansible.module_utils.' not in b_module_data:
+        return
+
+    _get_ansiballz_zipdata(module_name, b_module_data, module_compression)
+
+
 def _find_module_utils(module_name, b_module_data, module_path, module_args, task_vars, templar, module_compression, async_timeout, become,
-                       become_method, become_user, become_password, become_flags, environment):
+                       become_method, become_user, become_password, become_flags, environment, remote_cache_dir=None, remote_cache_stub=False):
     """
     Given the source of the module, convert it to a Jinja2 template to insert
     module code and return whether it's a new or old style module.
@@ -640,91 +1233,20 @@ def _find_module_utils(module_name, b_module_data, module_path, module_args, tas
         return b_module_data, module_style, shebang
 
     output = BytesIO()
-    py_module_names = set()
 
     if module_substyle == 'python':
         params = dict(ANSIBLE_MODULE_ARGS=module_args,)
         python_repred_params = repr(json.dumps(params))
 
-        try:
-            compression_method = getattr(zipfile, module_compression)
-        except AttributeError:
-            display.warning(u'Bad module compression string specified: %s.  Using ZIP_STORED (no compression)' % module_compression)
-            compression_method = zipfile.ZIP_STORED
-
-        lookup_path = os.path.join(C.DEFAULT_LOCAL_TMP, 'ansiballz_cache')
-        cached_module_filename = os.path.join(lookup_path, "%s-%s" % (module_name, module_compression))
-
-        zipdata = None
-        # Optimization -- don't lock if the module has already been cached
-        if os.path.exists(cached_module_filename):
-            display.debug('ANSIBALLZ: using cached module: %s' % cached_module_filename)
-            zipdata = open(cached_module_filename, 'rb').read()
-        else:
-            if module_name in action_write_locks.action_write_locks:
-                display.debug('ANSIBALLZ: Using lock for %s' % module_name)
-                lock = action_write_locks.action_write_locks[module_name]
-            else:
-                # If the action plugin directly invokes the module (instead of
-                # going through a strategy) then we don't have a cross-process
-                # Lock specifically for this module.  Use the "unexpected
-                # module" lock instead
-                display.debug('ANSIBALLZ: Using generic lock for %s' % module_name)
-                lock = action_write_locks.action_write_locks[None]
-
-            display.debug('ANSIBALLZ: Acquiring lock')
-            with lock:
-                display.debug('ANSIBALLZ: Lock acquired: %s' % id(lock))
-                # Check that no other process has created this while we were
-                # waiting for the lock
-                if not os.path.exists(cached_module_filename):
-                    display.debug('ANSIBALLZ: Creating module')
-                    # Create the module zip data
-                    zipoutput = BytesIO()
-                    zf = zipfile.ZipFile(zipoutput, mode='w', compression=compression_method)
-                    # Note: If we need to import from release.py first,
-                    # remember to catch all exceptions: https://github.com/ansible/ansible/issues/16523
-                    zf.writestr('ansible/__init__.py',
-                                b'from pkgutil import extend_path\n__path__=extend_path(__path__,__name__)\n__version__="' +
-                                to_bytes(__version__) + b'"\n__author__="' +
-                                to_bytes(__author__) + b'"\n')
-                    zf.writestr('ansible/module_utils/__init__.py', b'from pkgutil import extend_path\n__path__=extend_path(__path__,__name__)\n')
-
-                    zf.writestr('ansible_module_%s.py' % module_name, b_module_data)
-
-                    py_module_cache = {('__init__',): (b'', '[builtin]')}
-                    recursive_finder(module_name, b_module_data, py_module_names, py_module_cache, zf)
-                    zf.close()
-                    zipdata = base64.b64encode(zipoutput.getvalue())
-
-                    # Write the assembled module to a temp file (write to temp
-                    # so that no one looking for the file reads a partially
-                    # written file)
-                    if not os.path.exists(lookup_path):
-                        # Note -- if we have a global function to setup, that would
-                        # be a better place to run this
-                        os.makedirs(lookup_path)
-                    display.debug('ANSIBALLZ: Writing module')
-                    with open(cached_module_filename + '-part', 'wb') as f:
-                        f.write(zipdata)
-
-                    # Rename the file into its final position in the cache so
-                    # future users of this module can read it off the
-                    # filesystem instead of constructing from scratch.
-                    display.debug('ANSIBALLZ: Renaming module')
-                    os.rename(cached_module_filename + '-part', cached_module_filename)
-                    display.debug('ANSIBALLZ: Done creating module')
-
-            if zipdata is None:
-                display.debug('ANSIBALLZ: Reading module after lock')
-                # Another process wrote the file while we were waiting for
-                # the write lock.  Go ahead and read the data from disk
-                # instead of re-creating it.
-                try:
-                    zipdata = open(cached_module_filename, 'rb').read()
-                except IOError:
-                    raise AnsibleError('A different worker process failed to create module file. '
-                                       'Look at traceback for that process for debugging information.')
+        zipdata = _get_ansiballz_zipdata(module_name, b_module_data, module_compression)
+
+        cache = None
+        if remote_cache_dir:
+            # The target stores the zip data under its checksum.  A stub leaves
+            # the zip data out and relies on that stored copy.
+            cache = repr((to_native(remote_cache_dir), to_native(sha1(zipdata).hexdigest())))
+            if remote_cache_stub:
+                zipdata = b''
         zipdata = to_text(zipdata, errors='surrogate_or_strict')
 
         shebang, interpreter = _get_shebang(u'/usr/bin/python', task_vars, templar)
@@ -736,9 +1258,19 @@ def _find_module_utils(module_name, b_module_data, module_path, module_args, tas
         interpreter_parts = interpreter.split(u' ')
         interpreter = u"'{0}'".format(u"', '".join(interpreter_parts))
 
+        server = None
+        server_client = u''
+        if C.ANSIBALLZ_MODULE_SERVER:
+            server = repr((to_native(C.ANSIBALLZ_MODULE_SERVER_DIR), to_native(_get_module_server_key(interpreter, module_compression)),
+                           C.ANSIBALLZ_MODULE_SERVER_TIMEOUT))
+            server_client = ACTIVE_MODULE_SERVER_CLIENT % dict(source=repr(ACTIVE_MODULE_SERVER), interpreter=interpreter)
+
         now = datetime.datetime.utcnow()
         output.write(to_bytes(ACTIVE_ANSIBALLZ_TEMPLATE % dict(
             zipdata=zipdata,
+            cache=cache,
+            server=server,
+            server_client=server_client,
             ansible_module=module_name,
             params=python_repred_params,
             shebang=shebang,
@@ -869,7 +1401,8 @@ def _find_module_utils(module_name, b_module_data, module_path, module_args, tas
 
 
 def modify_module(module_name, module_path, module_args, templar, task_vars=None, module_compression='ZIP_STORED', async_timeout=0, become=False,
-                  become_method=None, become_user=None, become_password=None, become_flags=None, environment=None):
+                  become_method=None, become_user=None, become_password=None, become_flags=None, environment=None, remote_cache_dir=None,
+                  remote_cache_stub=False):
     """
     Used to insert chunks of code into modules before transfer rather than
     doing regular python imports.  This allows for more efficient transfer in
@@ -889,6 +1422,9 @@ def modify_module(module_name, module_path, module_args, templar, task_vars=None
     For powershell, this code effectively no-ops, as the exec wrapper requires access to a number of
     properties not available here.
 
+    When remote_cache_dir is set, AnsiballZ payloads store their zip data in that directory on the
+    target and, with remote_cache_stub, are built without it so the stored copy is used instead.
+
     """
     task_vars = {} if task_vars is None else task_vars
     environment = {} if environment is None else environment
@@ -901,7 +1437,8 @@ def modify_module(module_name, module_path, module_args, templar, task_vars=None
     (b_module_data, module_style, shebang) = _find_module_utils(module_name, b_module_data, module_path, module_args, task_vars, templar, module_compression,
                                                                 async_timeout=async_timeout, become=become, become_method=become_method,
                                                                 become_user=become_user, become_password=become_password, become_flags=become_flags,
-                                                                environment=environment)
+                                                                environment=environment, remote_cache_dir=remote_cache_dir,
+                                                                remote_cache_stub=remote_cache_stub)
 
     if module_style == 'binary':
         return (b_module_data, module_style, to_text(shebang, nonstring='passthru'))
@@ -932,3 +1469,18 @@ def modify_module(module_name, module_path, module_args, templar, task_vars=None
         b_module_data = b"\n".join(b_lines)
 
     return (b_module_data, module_style, shebang)
+
+
+def build_module_batch(shebang, payloads):
+    """
+    Returns a python script running the given new style python module
+    payloads one after the other with the interpreter it is run with, and
+    printing their output and return codes as a JSON list.  It stops at the
+    first module which fails.
+    """
+    output = ACTIVE_BATCH_TEMPLATE % dict(
+        shebang=shebang,
+        coding=ENCODING_STRING,
+        payloads=json.dumps([to_text(base64.b64encode(to_bytes(payload)), errors='surrogate_or_strict') for payload in payloads]),
+    )
+    return to_bytes(output, errors='surrogate_or_strict')
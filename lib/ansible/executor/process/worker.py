@@ -22,8 +22,15 @@ __metaclass__ = type
 import multiprocessing
 import os
 import sys
+import time
 import traceback
 
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
 from jinja2.exceptions import TemplateNotFound
 
 HAS_PYCRYPTO_ATFORK = False
@@ -36,10 +43,11 @@ except:
     # need to take charge of calling it.
     pass
 
-from ansible.errors import AnsibleConnectionFailure
+from ansible.errors import AnsibleConnectionFailure, AnsibleError
 from ansible.executor.task_executor import TaskExecutor
 from ansible.executor.task_result import TaskResult
 from ansible.module_utils._text import to_text
+from ansible.vars.delta import apply_vars_delta
 
 try:
     from __main__ import display
@@ -47,7 +55,7 @@ except ImportError:
     from ansible.utils.display import Display
     display = Display()
 
-__all__ = ['WorkerProcess']
+__all__ = ['WorkerProcess', 'PoolWorkerProcess']
 
 
 class WorkerProcess(multiprocessing.Process):
@@ -57,7 +65,8 @@ class WorkerProcess(multiprocessing.Process):
     for reading later.
     '''
 
-    def __init__(self, rslt_q, task_vars, host, task, play_context, loader, variable_manager, shared_loader_obj):
+    def __init__(self, rslt_q, task_vars, host, task, play_context, loader, variable_manager, shared_loader_obj, batch_tasks=None, batch_result=None,
+                 host_tmpdirs=None):
 
         super(WorkerProcess, self).__init__()
         # takes a task queue manager as the sole param:
@@ -66,9 +75,13 @@ class WorkerProcess(multiprocessing.Process):
         self._host = host
         self._task = task
         self._play_context = play_context
+        self._batch_tasks = batch_tasks
+        self._batch_result = batch_result
+        self._host_tmpdirs = host_tmpdirs
         self._loader = loader
         self._variable_manager = variable_manager
         self._shared_loader_obj = shared_loader_obj
+        self._connection_cache = None
 
         if sys.stdin.isatty():
             # dupe stdin, if we have one
@@ -104,6 +117,24 @@ class WorkerProcess(multiprocessing.Process):
         if HAS_PYCRYPTO_ATFORK:
             atfork()
 
+        self._run_task()
+
+        display.debug("WORKER PROCESS EXITING")
+
+        # pr.disable()
+        # s = StringIO.StringIO()
+        # sortby = 'time'
+        # ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
+        # ps.print_stats()
+        # with open('worker_%06d.stats' % os.getpid(), 'w') as f:
+        #     f.write(s.getvalue())
+
+    def _run_task(self):
+        '''
+        Runs the currently assigned host/task pair through the TaskExecutor
+        and puts the TaskResult on the results queue.
+        '''
+
         try:
             # execute the task and build a TaskResult from the result
             display.debug("running TaskExecutor() for %s/%s" % (self._host, self._task))
@@ -115,7 +146,11 @@ class WorkerProcess(multiprocessing.Process):
                 self._new_stdin,
                 self._loader,
                 self._shared_loader_obj,
-                self._rslt_q
+                self._rslt_q,
+                batch_tasks=self._batch_tasks,
+                batch_result=self._batch_result,
+                host_tmpdirs=self._host_tmpdirs,
+                connection_cache=self._connection_cache,
             ).run()
 
             display.debug("done running TaskExecutor() for %s/%s [%s]" % (self._host, self._task, self._task._uuid))
@@ -160,12 +195,176 @@ class WorkerProcess(multiprocessing.Process):
                     display.debug(u"WORKER EXCEPTION: %s" % to_text(e))
                     display.debug(u"WORKER TRACEBACK: %s" % to_text(traceback.format_exc()))
 
-        display.debug("WORKER PROCESS EXITING")
 
-        # pr.disable()
-        # s = StringIO.StringIO()
-        # sortby = 'time'
-        # ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
-        # ps.print_stats()
-        # with open('worker_%06d.stats' % os.getpid(), 'w') as f:
-        #     f.write(s.getvalue())
+class PoolWorkerProcess(WorkerProcess):
+    '''
+    A long-lived worker, started once per play, which receives host/task
+    jobs over a pipe and runs them one after another, instead of being
+    forked for a single task. The worker reports its state through a shared
+    array slot so the strategy knows when it can be handed another job, and
+    retires itself once it has run max_tasks jobs or its resident memory
+    has grown past max_memory (in MB) so the strategy can replace it.
+
+    With vars_delta, jobs carry the changes to the task vars since the
+    worker last ran a task for the same host rather than the full task vars,
+    see TaskQueueManager._get_vars_delta().
+
+    With keep_connections, the worker keeps the connections which can be
+    reused open for the later tasks on the same host, which the strategy
+    then always sends to this worker, and closes those left unused for
+    connection_ttl seconds (if set) or when it exits.
+    '''
+
+    WORKER_IDLE = 0
+    WORKER_BUSY = 1
+    WORKER_RETIRING = 2
+
+    def __init__(self, rslt_q, job_pipe, worker_states, slot, loader, variable_manager, shared_loader_obj, max_tasks=0, max_memory=0,
+                 vars_delta=False, keep_connections=False, connection_ttl=0):
+
+        super(PoolWorkerProcess, self).__init__(rslt_q, None, None, None, None, loader, variable_manager, shared_loader_obj)
+        self._job_pipe = job_pipe
+        self._worker_states = worker_states
+        self._slot = slot
+        self._max_tasks = max_tasks
+        self._max_memory = max_memory
+        self._vars_delta = vars_delta
+        self._connection_ttl = connection_ttl
+
+        # host name -> (version, task vars) last built for that host
+        self._vars_snapshots = dict()
+
+        if keep_connections:
+            self._connection_cache = dict()
+
+    def _get_memory_usage(self):
+        '''
+        Returns the peak resident set size of this process in MB, or
+        None if it cannot be determined on this platform.
+        '''
+        if not HAS_RESOURCE:
+            return None
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            # darwin reports bytes, everyone else reports kilobytes
+            return maxrss / (1024 * 1024)
+        return maxrss / 1024
+
+    def _apply_vars_delta(self):
+        '''
+        Rebuilds the full task vars for the current job from the delta it
+        carries and the vars last built for the same host.
+        '''
+
+        (base_version, delta, host_state, inventory) = self._task_vars
+
+        # catch up on the facts and inventory used by our hostvars first
+        self._variable_manager.apply_changes(host_state, inventory)
+
+        (version, old_vars) = self._vars_snapshots.get(self._host.name, (0, dict()))
+        if version != base_version:
+            raise AnsibleError("pool worker %d has version %d of the vars for %s, but was sent changes to version %d"
+                               % (self._slot, version, self._host.name, base_version))
+
+        fill = dict(hostvars=self._variable_manager._hostvars, groups=self._variable_manager._get_groups())
+        task_vars = apply_vars_delta(old_vars, delta, fill=fill)
+        self._vars_snapshots[self._host.name] = (version + 1, task_vars)
+
+        # the TaskExecutor modifies the top level of the vars it is given
+        self._task_vars = task_vars.copy()
+
+    def _run_task(self):
+        if self._vars_delta:
+            try:
+                self._apply_vars_delta()
+            except Exception:
+                self._rslt_q.put(TaskResult(
+                    self._host.name,
+                    self._task._uuid,
+                    dict(failed=True, exception=to_text(traceback.format_exc()), stdout=''),
+                    task_fields=self._task.dump_attrs(),
+                ))
+                return
+
+        super(PoolWorkerProcess, self)._run_task()
+
+    def _close_connections(self, idle_for=0):
+        '''
+        Closes the kept connections which have not been used for the last
+        idle_for seconds. Returns the number of seconds until the next one
+        of those left open expires, or None.
+        '''
+
+        if not self._connection_cache:
+            return None
+
+        now = time.time()
+        next_expiry = None
+        for (key, (connection, last_used)) in list(self._connection_cache.items()):
+            expiry = last_used + idle_for - now
+            if expiry > 0:
+                next_expiry = expiry if next_expiry is None else min(next_expiry, expiry)
+                continue
+
+            display.debug("worker %d closing the connection to %s" % (self._slot, key[1]))
+            del self._connection_cache[key]
+            try:
+                connection.close()
+            except Exception as e:
+                display.debug(u"error closing connection: %s" % to_text(e))
+
+        return next_expiry
+
+    def _should_retire(self, tasks_run):
+        if self._max_tasks and tasks_run >= self._max_tasks:
+            display.debug("worker %d has run %d tasks, retiring" % (self._slot, tasks_run))
+            return True
+
+        if self._max_memory:
+            memory = self._get_memory_usage()
+            if memory is not None and memory >= self._max_memory:
+                display.debug("worker %d is using %dMB of memory, retiring" % (self._slot, memory))
+                return True
+
+        return False
+
+    def run(self):
+        '''
+        Called when the process is started. Loops reading jobs off the job
+        pipe until it is sent None, the pipe is closed or it is time to retire.
+        '''
+
+        if HAS_PYCRYPTO_ATFORK:
+            atfork()
+
+        tasks_run = 0
+        while True:
+            try:
+                if self._connection_ttl:
+                    # wake up to close the connections as they expire
+                    timeout = self._close_connections(self._connection_ttl)
+                    while timeout is not None and not self._job_pipe.poll(timeout):
+                        timeout = self._close_connections(self._connection_ttl)
+                job = self._job_pipe.recv()
+            except (IOError, EOFError, KeyboardInterrupt):
+                break
+
+            if job is None:
+                break
+
+            (self._host, self._task, self._task_vars, self._play_context, self._batch_tasks, self._batch_result, self._host_tmpdirs) = job
+            self._run_task()
+            tasks_run += 1
+
+            # drop our references to the job so they can be freed while idle
+            self._host = self._task = self._task_vars = self._play_context = self._batch_tasks = self._batch_result = self._host_tmpdirs = None
+
+            if self._should_retire(tasks_run):
+                self._worker_states[self._slot] = self.WORKER_RETIRING
+                break
+
+            self._worker_states[self._slot] = self.WORKER_IDLE
+
+        self._close_connections()
+        display.debug("POOL WORKER PROCESS EXITING")
@@ -67,7 +67,8 @@ class TaskExecutor:
     # the module
     SQUASH_ACTIONS = frozenset(C.DEFAULT_SQUASH_ACTIONS)
 
-    def __init__(self, host, task, job_vars, play_context, new_stdin, loader, shared_loader_obj, rslt_q):
+    def __init__(self, host, task, job_vars, play_context, new_stdin, loader, shared_loader_obj, rslt_q, batch_tasks=None, batch_result=None,
+                 host_tmpdirs=None, connection_cache=None):
         self._host = host
         self._task = task
         self._job_vars = job_vars
@@ -79,6 +80,20 @@ class TaskExecutor:
         self._rslt_q = rslt_q
         self._loop_eval_error = None
 
+        # the tasks to run along with this one, or the result this task got
+        # when it ran along with an earlier one, see TASK_BATCH_SIZE
+        self._batch_tasks = batch_tasks
+        self._batch_result = batch_result
+
+        # the tmpdirs kept on the host by its earlier tasks in the play, see
+        # REMOTE_TMP_PER_PLAY
+        self._host_tmpdirs = host_tmpdirs
+
+        # the connections a pool worker keeps open for the later tasks of its
+        # hosts, as key -> (connection, last used), see WORKER_POOL_HOST_AFFINITY
+        self._connection_cache = connection_cache
+        self._connection_cache_key = None
+
         self._task.squash()
 
     def run(self):
@@ -91,6 +106,7 @@ class TaskExecutor:
 
         display.debug("in run() - task %s" % self._task._uuid)
 
+        res = None
         try:
             try:
                 items = self._get_loop_items()
@@ -168,19 +184,45 @@ class TaskExecutor:
             display.debug("dumping result to json")
             res = _clean_res(res)
             display.debug("done dumping result, returning")
-            return res
+
+            return self._add_host_tmpdirs(res)
         except AnsibleError as e:
-            return dict(failed=True, msg=wrap_var(to_text(e, nonstring='simplerepr')))
+            return self._add_host_tmpdirs(dict(failed=True, msg=wrap_var(to_text(e, nonstring='simplerepr'))))
         except Exception as e:
-            return dict(failed=True, msg='Unexpected failure during module execution.', exception=to_text(traceback.format_exc()), stdout='')
+            return self._add_host_tmpdirs(dict(failed=True, msg='Unexpected failure during module execution.', exception=to_text(traceback.format_exc()),
+                                               stdout=''))
         finally:
             try:
-                self._connection.close()
+                self._release_connection(keep=isinstance(res, dict) and not res.get('unreachable'))
             except AttributeError:
                 pass
             except Exception as e:
                 display.debug(u"error closing connection: %s" % to_text(e))
 
+    def _release_connection(self, keep):
+        '''
+        Closes the connection at the end of the task, unless it was put in the
+        connection cache and should be kept open for the next task on the host.
+        '''
+
+        if self._connection_cache_key is not None:
+            if keep:
+                self._connection_cache[self._connection_cache_key] = (self._connection, time.time())
+                return
+            self._connection_cache.pop(self._connection_cache_key, None)
+        self._connection.close()
+
+    def _add_host_tmpdirs(self, res):
+        '''
+        Hands the tmpdirs kept on the host back to the strategy with the
+        result, including those the task made or dropped even if it failed.
+        The strategy removes them at the end of the play.
+        '''
+
+        if self._host_tmpdirs is not None:
+            res['_ansible_host_tmpdirs'] = self._host_tmpdirs
+        return res
+
     def _get_loop_items(self):
         '''
         Loads a lookup plugin to handle the with_* portion of a task (if specified),
@@ -523,6 +565,14 @@ class TaskExecutor:
                 variable_params.update(self._task.args)
                 self._task.args = variable_params
 
+        # pool workers keep the connections which can be reused open for the
+        # later tasks on the same host
+        cache_key = None
+        if self._connection_cache is not None and not self._task.delegate_to:
+            cache_key = (self._play_context.connection, self._play_context.remote_addr, self._play_context.port, self._play_context.remote_user)
+            if not self._connection and cache_key in self._connection_cache:
+                self._connection = self._connection_cache[cache_key][0]
+
         # get the connection and the handler for this execution
         if (not self._connection or
                 not getattr(self._connection, 'connected', False) or
@@ -533,11 +583,16 @@ class TaskExecutor:
             # to be replaced with the one templated above, in case other data changed
             self._connection._play_context = self._play_context
 
+        if cache_key is not None and self._connection.reusable_across_tasks:
+            self._connection_cache_key = cache_key
+
         self._set_connection_options(variables, templar)
         self._set_shell_options(variables, templar)
 
         # get handler
         self._handler = self._get_action_handler(connection=self._connection, templar=templar)
+        if self._host_tmpdirs is not None and not self._task.delegate_to:
+            self._handler._host_tmpdirs = self._host_tmpdirs
 
         # Apply default params for action/module, if present
         # These are collected as a list of dicts, so we need to merge them
@@ -581,7 +636,15 @@ class TaskExecutor:
         for attempt in range(1, retries + 1):
             display.debug("running the handler")
             try:
-                result = self._handler.run(task_vars=variables)
+                if self._batch_result is not None:
+                    result = self._batch_result
+                elif self._batch_tasks and hasattr(self._handler, 'run_batch'):
+                    results = self._handler.run_batch(self._batch_tasks, task_vars=variables)
+                    result = results.pop(0)
+                    # handed back to the strategy, which keeps them for when it gets to these tasks
+                    result['_ansible_batch_results'] = dict((task._uuid, task_result) for (task, task_result) in zip(self._batch_tasks, results))
+                else:
+                    result = self._handler.run(task_vars=variables)
             except AnsibleActionSkip as e:
                 return dict(skipped=True, msg=to_text(e))
             except AnsibleActionFail as e:
@@ -22,10 +22,13 @@ __metaclass__ = type
 import multiprocessing
 import os
 import tempfile
+import time
 
 from ansible import constants as C
 from ansible.errors import AnsibleError
+from ansible.executor.module_common import preload_module
 from ansible.executor.play_iterator import PlayIterator
+from ansible.executor.process.worker import PoolWorkerProcess
 from ansible.executor.stats import AggregateStats
 from ansible.executor.task_result import TaskResult
 from ansible.module_utils.six import string_types
@@ -34,9 +37,11 @@ from ansible.playbook.block import Block
 from ansible.playbook.play_context import PlayContext
 from ansible.plugins.loader import callback_loader, strategy_loader, module_loader
 from ansible.plugins.callback import CallbackBase
+from ansible.plugins.strategy import SharedPluginLoaderObj
 from ansible.template import Templar
 from ansible.utils.helpers import pct_to_int
 from ansible.vars.hostvars import HostVars
+from ansible.vars.delta import diff_vars
 from ansible.vars.reserved import warn_if_reserved
 
 try:
@@ -109,11 +114,114 @@ class TaskQueueManager:
 
     def _initialize_processes(self, num):
         self._workers = []
+        self._worker_pipes = []
 
         for i in range(num):
             rslt_q = multiprocessing.Queue()
             self._workers.append([None, rslt_q])
 
+        if C.WORKER_POOL:
+            # the state of each pool worker lives in shared memory, so the
+            # workers can flag themselves as idle or retiring without a round
+            # trip through the results queue
+            self._worker_states = multiprocessing.RawArray('b', num)
+            self._worker_pipes = [None] * num
+            self._worker_vars = [None] * num
+            if C.WORKER_POOL_VARS_DELTA:
+                self._variable_manager.track_changes()
+            for slot in range(num):
+                self._start_pool_worker(slot)
+
+    def _start_pool_worker(self, slot):
+        '''
+        Starts a long-lived worker in the given slot, replacing any previous
+        (retired) worker there.
+        '''
+
+        (job_reader, job_writer) = multiprocessing.Pipe(duplex=False)
+        worker_prc = PoolWorkerProcess(
+            self._final_q,
+            job_reader,
+            self._worker_states,
+            slot,
+            self._loader,
+            self._variable_manager,
+            SharedPluginLoaderObj(),
+            max_tasks=C.WORKER_POOL_MAX_TASKS,
+            max_memory=C.WORKER_POOL_MAX_MEMORY,
+            vars_delta=C.WORKER_POOL_VARS_DELTA,
+            keep_connections=C.WORKER_POOL_HOST_AFFINITY,
+            connection_ttl=C.WORKER_POOL_CONNECTION_TTL,
+        )
+        self._worker_states[slot] = PoolWorkerProcess.WORKER_IDLE
+
+        if C.WORKER_POOL_VARS_DELTA:
+            # the new worker inherits the current state of the variable manager,
+            # and has not been sent the vars for any host yet
+            (vm_version, _, _) = self._variable_manager.get_changes()
+            self._worker_vars[slot] = [vm_version, dict()]
+        worker_prc.start()
+
+        # the reading end now belongs to the worker, closing our copy keeps
+        # workers started later from inheriting it
+        job_reader.close()
+
+        self._workers[slot][0] = worker_prc
+        self._worker_pipes[slot] = job_writer
+        display.debug("started pool worker %d (pid %s)" % (slot, worker_prc.pid))
+
+    def queue_pool_job(self, slot, host, task, task_vars, play_context, batch_tasks=None, batch_result=None, host_tmpdirs=None):
+        '''
+        Hands a task to the pool worker in the given slot, starting a new worker
+        there first if the previous one retired or exited. Returns False if the
+        worker is still busy with a previous task. batch_tasks, batch_result and
+        host_tmpdirs are passed on to the TaskExecutor.
+        '''
+
+        worker_prc = self._workers[slot][0]
+        state = self._worker_states[slot]
+        if state == PoolWorkerProcess.WORKER_RETIRING or worker_prc is None or not worker_prc.is_alive():
+            if worker_prc is not None:
+                worker_prc.join()
+                self._worker_pipes[slot].close()
+            self._start_pool_worker(slot)
+        elif state == PoolWorkerProcess.WORKER_BUSY:
+            return False
+
+        if C.WORKER_POOL_VARS_DELTA:
+            task_vars = self._get_vars_delta(slot, host, task_vars)
+
+        self._worker_states[slot] = PoolWorkerProcess.WORKER_BUSY
+        self._worker_pipes[slot].send((host, task, task_vars, play_context, batch_tasks, batch_result, host_tmpdirs))
+        return True
+
+    def _get_vars_delta(self, slot, host, task_vars):
+        '''
+        Returns what the pool worker in the given slot needs to rebuild the
+        task vars from those it was last sent for the host: the changes to
+        the variable manager since it last heard about them, and the delta
+        between the two sets of vars. Its copies of hostvars and groups are
+        used in place of ours.
+        '''
+
+        (vm_version, snapshots) = self._worker_vars[slot]
+        (vm_version, host_state, inventory) = self._variable_manager.get_changes(since=vm_version)
+
+        (version, old_vars) = snapshots.get(host.name, (0, dict()))
+        if old_vars is task_vars:
+            # the same dict is being sent again (task debugger redo), which
+            # may have been modified in place, so send it all
+            old_vars = dict()
+        delta = diff_vars(old_vars, task_vars, skip=('hostvars', 'groups'))
+
+        snapshots[host.name] = (version + 1, task_vars)
+        self._worker_vars[slot][0] = vm_version
+
+        # the changes every worker was sent are no longer needed
+        self._variable_manager.drop_changes(min(worker_vars[0] for worker_vars in self._worker_vars if worker_vars is not None))
+
+        return (version, delta, host_state, inventory)
+
     def _initialize_notified_handlers(self, play):
         '''
         Clears and initializes the shared notified handlers dict with entries
@@ -261,6 +369,14 @@ class TaskQueueManager:
             start_at_done=self._start_at_done,
         )
 
+        # the pool workers are forked once below and keep what they inherit,
+        # so compile the templates of the tasks and build their modules for
+        # all of them beforehand
+        if C.WORKER_POOL and Templar.template_cache.max_size:
+            self._compile_task_templates(templar, iterator._blocks)
+        if C.WORKER_POOL and C.ANSIBALLZ_CACHE_MAX_SIZE:
+            self._preload_modules(play_context, iterator._blocks)
+
         # adjust to # of workers to configured forks or size of batch, whatever is lower
         self._initialize_processes(min(self._options.forks, iterator.batch_size))
 
@@ -285,6 +401,9 @@ class TaskQueueManager:
         if getattr(self._options, 'start_at_task', None) is not None and play_context.start_at_task is None:
             self._start_at_done = True
 
+        if C.ANSIBLE_SSH_PREWARM:
+            strategy.prewarm_connections(iterator, play_context)
+
         # and run the play using the strategy and cleanup on way out
         play_return = strategy.run(iterator, play_context)
 
@@ -294,8 +413,50 @@ class TaskQueueManager:
 
         strategy.cleanup()
         self._cleanup_processes()
+
+        if Templar.template_cache.max_size:
+            display.debug("template cache: %(hits)d hits, %(misses)d misses, %(size)d/%(max_size)d templates" % Templar.template_cache.info())
         return play_return
 
+    def _get_tasks(self, blocks):
+        '''
+        Yields the tasks in the given blocks and in the blocks nested in them.
+        '''
+
+        for block in blocks:
+            for task in block.block + block.rescue + block.always:
+                if isinstance(task, Block):
+                    for nested_task in self._get_tasks([task]):
+                        yield nested_task
+                else:
+                    yield task
+
+    def _compile_task_templates(self, templar, blocks):
+        '''
+        Fills the template cache with the templates in the arguments, loops
+        and names of the tasks in the given blocks.
+        '''
+
+        for task in self._get_tasks(blocks):
+            templar.compile_templates([task.name, task.args, task.loop, task.delegate_to])
+
+    def _preload_modules(self, play_context, blocks):
+        '''
+        Builds the AnsiballZ zip data of the modules run by the tasks in the
+        given blocks, so that workers share it instead of each reading it
+        from the cache on disk.
+        '''
+
+        for action in sorted(set(task.action for task in self._get_tasks(blocks))):
+            module_path = module_loader.find_plugin(action, mod_type='.py')
+            if module_path is None:
+                continue
+            try:
+                preload_module(action, module_path, play_context.module_compression)
+            except Exception as e:
+                # the worker running the module reports the error
+                display.debug("could not preload module %s: %s" % (action, to_text(e)))
+
     def cleanup(self):
         display.debug("RUNNING CLEANUP")
         self.terminate()
@@ -304,6 +465,23 @@ class TaskQueueManager:
 
     def _cleanup_processes(self):
         if hasattr(self, '_workers'):
+            # ask any pool workers to exit on their own before terminating them
+            for job_pipe in self._worker_pipes:
+                if job_pipe is None:
+                    continue
+                try:
+                    job_pipe.send(None)
+                    job_pipe.close()
+                except (IOError, EOFError, ValueError):
+                    pass
+            if self._worker_pipes:
+                # give them a moment overall to exit, busy ones get terminated below
+                deadline = time.time() + 1
+                for (worker_prc, rslt_q) in self._workers:
+                    if worker_prc:
+                        worker_prc.join(max(0, deadline - time.time()))
+            self._worker_pipes = []
+
             for (worker_prc, rslt_q) in self._workers:
                 rslt_q.close()
                 if worker_prc and worker_prc.is_alive():
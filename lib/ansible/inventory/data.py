@@ -21,6 +21,8 @@ __metaclass__ = type
 
 import sys
 
+from itertools import chain
+
 from ansible import constants as C
 from ansible.errors import AnsibleError
 from ansible.inventory.group import Group
@@ -48,8 +50,11 @@ class InventoryData(object):
         self.groups = {}
         self.hosts = {}
 
-        # provides 'groups' magic var, host object has group_names
+        # provides 'groups' magic var, host object has group_names. Only the
+        # entries of the groups changed by the methods below are dropped, all
+        # of them when the groups were modified directly, see get_groups_dict()
         self._groups_dict_cache = {}
+        self._groups_dict_version = None
 
         # current localhost, implicit or explicit
         self.localhost = None
@@ -61,6 +66,16 @@ class InventoryData(object):
             self.add_group(group)
         self.add_child('all', 'ungrouped')
 
+    def __getstate__(self):
+        # groups do not keep their children when pickled, so the missing
+        # entries of the groups dict cannot be filled on the other side
+        self.get_groups_dict()
+        return self.__dict__.copy()
+
+    def __setstate__(self, data):
+        self.__dict__.update(data)
+        self._groups_dict_version = Group.membership_version
+
     def serialize(self):
         self._groups_dict_cache = None
         data = {
@@ -73,6 +88,7 @@ class InventoryData(object):
 
     def deserialize(self, data):
         self._groups_dict_cache = {}
+        self._groups_dict_version = None
         self.hosts = data.get('hosts')
         self.groups = data.get('groups')
         self.localhost = data.get('local')
@@ -164,7 +180,6 @@ class InventoryData(object):
         if group not in self.groups:
             g = Group(group)
             self.groups[group] = g
-            self._groups_dict_cache = {}
             display.debug("Added group %s to inventory" % group)
         else:
             display.debug("group %s already in inventory" % group)
@@ -212,8 +227,10 @@ class InventoryData(object):
             h = self.hosts[host]
 
         if g:
+            cache_is_current = self._groups_dict_is_current()
             g.add_host(h)
-            self._groups_dict_cache = {}
+            if cache_is_current:
+                self._group_changed(g)
             display.debug("Added host %s to group %s" % (host, group))
 
     def remove_host(self, host):
@@ -243,13 +260,15 @@ class InventoryData(object):
 
         if group in self.groups:
             g = self.groups[group]
+            cache_is_current = self._groups_dict_is_current()
             if child in self.groups:
                 g.add_child_group(self.groups[child])
             elif child in self.hosts:
                 g.add_host(self.hosts[child])
             else:
                 raise AnsibleError("%s is not a known host nor group" % child)
-            self._groups_dict_cache = {}
+            if cache_is_current:
+                self._group_changed(g)
             display.debug('Group %s now contains %s' % (group, child))
         else:
             raise AnsibleError("%s is not a known group" % group)
@@ -258,8 +277,29 @@ class InventoryData(object):
         """
         We merge a 'magic' var 'groups' with group name keys and hostname list values into every host variable set. Cache for speed.
         """
-        if not self._groups_dict_cache:
+        if not self._groups_dict_is_current():
+            self._groups_dict_cache = {}
+            self._groups_dict_version = Group.membership_version
+
+        if self._groups_dict_cache is None or len(self._groups_dict_cache) != len(self.groups):
+            # a new dict, in inventory order, reusing the entries of the groups which did not change
+            cache = self._groups_dict_cache or {}
+            self._groups_dict_cache = {}
             for (group_name, group) in iteritems(self.groups):
-                self._groups_dict_cache[group_name] = [h.name for h in group.get_hosts()]
+                if group_name in cache:
+                    self._groups_dict_cache[group_name] = cache[group_name]
+                else:
+                    self._groups_dict_cache[group_name] = [h.name for h in group.get_hosts()]
 
         return self._groups_dict_cache
+
+    def _groups_dict_is_current(self):
+        return self._groups_dict_version == Group.membership_version
+
+    def _group_changed(self, group):
+        ''' drops the entries of a group that changed and of all of its ancestors from the groups dict '''
+
+        if self._groups_dict_cache:
+            changed = set(g.name for g in chain([group], group.get_ancestors()))
+            self._groups_dict_cache = dict((name, hosts) for (name, hosts) in iteritems(self._groups_dict_cache) if name not in changed)
+        self._groups_dict_version = Group.membership_version
@@ -27,6 +27,10 @@ class Group:
 
     # __slots__ = [ 'name', 'hosts', 'vars', 'child_groups', 'parent_groups', 'depth', '_hosts_cache' ]
 
+    # bumped whenever the hosts or children of any group change, so indexes
+    # built from the groups can tell when they are out of date
+    membership_version = 0
+
     def __init__(self, name=None):
 
         self.depth = 0
@@ -201,6 +205,7 @@ class Group:
 
     def clear_hosts_cache(self):
 
+        Group.membership_version += 1
         self._hosts_cache = None
         for g in self.get_ancestors():
             g._hosts_cache = None
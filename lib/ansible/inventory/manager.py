@@ -131,6 +131,9 @@ class InventoryManager(object):
         # caches
         self._hosts_patterns_cache = {}  # resolved full patterns
         self._pattern_cache = {}  # resolved individual patterns
+        self._pattern_plans = {}  # split and ordered full patterns
+        self._subset_hosts = None  # resolved subset
+        self._hosts_version = 0  # changes whenever get_hosts() results may change
         self._inventory_plugins = []  # for generating inventory
 
         # the inventory dirs, files, script paths or lists of hosts
@@ -298,6 +301,8 @@ class InventoryManager(object):
         ''' clear all caches '''
         self._hosts_patterns_cache = {}
         self._pattern_cache = {}
+        self._subset_hosts = None
+        self._hosts_version += 1
         # FIXME: flush inventory cache
 
     def refresh_inventory(self):
@@ -354,12 +359,14 @@ class InventoryManager(object):
                 # mainly useful for hostvars[host] access
                 if not ignore_limits and self._subset:
                     # exclude hosts not in a subset, if defined
-                    subset = self._evaluate_patterns(self._subset)
-                    hosts = [h for h in hosts if h in subset]
+                    if self._subset_hosts is None:
+                        self._subset_hosts = frozenset(self._evaluate_patterns(self._subset))
+                    hosts = [h for h in hosts if h in self._subset_hosts]
 
                 if not ignore_restrictions and self._restriction:
                     # exclude hosts mentioned in any restriction (ex: failed hosts)
-                    hosts = [h for h in hosts if h.name in self._restriction]
+                    restriction = frozenset(self._restriction)
+                    hosts = [h for h in hosts if h.name in restriction]
 
                 seen = set()
                 self._hosts_patterns_cache[pattern_hash] = [x for x in hosts if x not in seen and not seen.add(x)]
@@ -380,27 +387,53 @@ class InventoryManager(object):
 
         return hosts
 
+    def _compile_patterns(self, patterns):
+        """
+        Takes a list of patterns and returns them in the order
+        _evaluate_patterns() applies them. The result only depends on the
+        patterns, so it is cached for the life of the manager.
+        """
+
+        key = tuple(patterns)
+        if key not in self._pattern_plans:
+            self._pattern_plans[key] = tuple(order_patterns(patterns))
+        return self._pattern_plans[key]
+
     def _evaluate_patterns(self, patterns):
         """
-        Takes a list of patterns and returns a list of matching host names,
+        Takes a list of patterns and returns a list of matching hosts,
         taking into account any negative and intersection patterns.
+
+        The hosts are kept in the order the patterns produce them, while sets
+        of them are used to check which hosts were already added or are
+        excluded or intersected by the following patterns.
         """
 
-        patterns = order_patterns(patterns)
         hosts = []
+        seen = set()
 
-        for p in patterns:
+        for p in self._compile_patterns(patterns):
             # avoid resolving a pattern that is a plain host
             if p in self._inventory.hosts:
-                hosts.append(self._inventory.get_host(p))
+                host = self._inventory.get_host(p)
+                if host.name not in seen:
+                    hosts.append(host)
+                    seen.add(host.name)
             else:
                 that = self._match_one_pattern(p)
                 if p.startswith("!"):
-                    hosts = [h for h in hosts if h not in frozenset(that)]
+                    that = frozenset(that)
+                    hosts = [h for h in hosts if h not in that]
+                    seen = set(h.name for h in hosts)
                 elif p.startswith("&"):
-                    hosts = [h for h in hosts if h in frozenset(that)]
+                    that = frozenset(that)
+                    hosts = [h for h in hosts if h in that]
+                    seen = set(h.name for h in hosts)
                 else:
-                    hosts.extend([h for h in that if h.name not in frozenset([y.name for y in hosts])])
+                    for h in that:
+                        if h.name not in seen:
+                            hosts.append(h)
+                            seen.add(h.name)
         return hosts
 
     def _match_one_pattern(self, pattern):
@@ -577,6 +610,7 @@ class InventoryManager(object):
         elif not isinstance(restriction, list):
             restriction = [restriction]
         self._restriction = [h.name for h in restriction]
+        self._hosts_version += 1
 
     def subset(self, subset_pattern):
         """
@@ -599,10 +633,13 @@ class InventoryManager(object):
                 else:
                     results.append(x)
             self._subset = results
+        self._subset_hosts = None
+        self._hosts_version += 1
 
     def remove_restriction(self):
         """ Do not restrict list operations """
         self._restriction = None
+        self._hosts_version += 1
 
     def clear_pattern_cache(self):
         self._pattern_cache = {}
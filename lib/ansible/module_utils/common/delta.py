@@ -0,0 +1,157 @@
+# Copyright: (c) 2018, Ansible Project
+# Simplified BSD License (see licenses/simplified_bsd.txt or https://opensource.org/licenses/BSD-2-Clause)
+"""Block level deltas between two versions of a file, in the spirit of rsync.
+
+The receiving side reports weak (adler32) and strong (sha1) checksums of the
+blocks of the file it has with :func:`block_checksums`, the sending side finds
+these blocks in the new version of the file with a rolling checksum and writes
+a delta of block copies and literal data with :func:`write_delta`, which the
+receiving side turns into the new version with :func:`apply_delta`.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import math
+import struct
+import zlib
+
+DELTA_MAGIC = b'ANSDELTA'
+
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 128 * 1024
+
+# adler32 modulus
+_ADLER_MOD = 65521
+
+_COPY = b'C'
+_LITERAL = b'L'
+_BUFSIZE = 64 * 1024
+
+
+def delta_block_size(size):
+    """Returns the block size to checksum a file of the given size with, about its square root like rsync."""
+    return min(MAX_BLOCK_SIZE, max(MIN_BLOCK_SIZE, int(math.sqrt(size))))
+
+
+def block_checksums(path, block_size):
+    """Returns the list of (weak, strong) checksums of each block of the file at path."""
+    checksums = []
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            checksums.append((zlib.adler32(block) & 0xffffffff, hashlib.sha1(block).hexdigest()))
+    return checksums
+
+
+def write_delta(path, checksums, block_size, out):
+    """Writes to the file object out the delta turning a file with the given block checksums into the file at path.
+
+    :returns: the number of bytes sent as literal data
+    """
+    blocks = {}
+    for index, (weak, strong) in enumerate(checksums):
+        blocks.setdefault(weak, {}).setdefault(strong, index)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    # the byte values to roll the checksum with, on python 2 too
+    values = bytearray(data)
+
+    out.write(DELTA_MAGIC + struct.pack('>I', block_size))
+    literal_bytes = [0]
+    copy = []
+
+    def flush_copy():
+        if copy:
+            out.write(_COPY + struct.pack('>QI', copy[0], copy[1]))
+            del copy[:]
+
+    def add_copy(index):
+        if copy and copy[0] + copy[1] == index:
+            copy[1] += 1
+        else:
+            flush_copy()
+            copy.extend((index, 1))
+
+    def flush_literal(start, end):
+        if end > start:
+            flush_copy()
+            out.write(_LITERAL + struct.pack('>I', end - start))
+            out.write(data[start:end])
+            literal_bytes[0] += end - start
+
+    size = len(data)
+    literal_start = pos = 0
+    a = b = None
+    while pos + block_size <= size:
+        if a is None:
+            weak = zlib.adler32(data[pos:pos + block_size]) & 0xffffffff
+            a, b = weak & 0xffff, weak >> 16
+        else:
+            weak = (b << 16) | a
+
+        candidates = blocks.get(weak)
+        if candidates:
+            index = candidates.get(hashlib.sha1(data[pos:pos + block_size]).hexdigest())
+            if index is not None:
+                flush_literal(literal_start, pos)
+                add_copy(index)
+                pos += block_size
+                literal_start = pos
+                a = None
+                continue
+
+        # roll the checksum one byte further
+        if pos + block_size < size:
+            a = (a - values[pos] + values[pos + block_size]) % _ADLER_MOD
+            b = (b - block_size * values[pos] + a - 1) % _ADLER_MOD
+        pos += 1
+
+    # the last block of the old file is usually shorter than the others
+    if literal_start == pos < size:
+        tail = data[pos:]
+        index = blocks.get(zlib.adler32(tail) & 0xffffffff, {}).get(hashlib.sha1(tail).hexdigest())
+        if index is not None:
+            add_copy(index)
+            literal_start = size
+
+    flush_literal(literal_start, size)
+    flush_copy()
+    return literal_bytes[0]
+
+
+def _copy_bytes(src, out, count):
+    while count > 0:
+        chunk = src.read(min(count, _BUFSIZE))
+        if not chunk:
+            break
+        out.write(chunk)
+        count -= len(chunk)
+
+
+def apply_delta(basis_path, delta_path, out_path):
+    """Writes to out_path the file described by the delta at delta_path against the file at basis_path."""
+    with open(basis_path, 'rb') as basis:
+        with open(delta_path, 'rb') as delta:
+            if delta.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+                raise ValueError('%s is not a delta' % delta_path)
+            block_size = struct.unpack('>I', delta.read(4))[0]
+
+            with open(out_path, 'wb') as out:
+                while True:
+                    op = delta.read(1)
+                    if not op:
+                        break
+                    elif op == _COPY:
+                        index, count = struct.unpack('>QI', delta.read(12))
+                        basis.seek(index * block_size)
+                        _copy_bytes(basis, out, count * block_size)
+                    elif op == _LITERAL:
+                        length = struct.unpack('>I', delta.read(4))[0]
+                        _copy_bytes(delta, out, length)
+                    else:
+                        raise ValueError('%s is not a valid delta' % delta_path)
@@ -26,8 +26,10 @@
 # LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
 # USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import errno
 import os
 import json
+import select
 import socket
 import struct
 import traceback
@@ -52,13 +54,15 @@ def recv_data(s):
             return None
         data += d
     data_len = struct.unpack('!Q', data[:header_len])[0]
-    data = data[header_len:]
-    while len(data) < data_len:
-        d = s.recv(data_len - len(data))
+    chunks = [data[header_len:]]
+    received = len(chunks[0])
+    while received < data_len:
+        d = s.recv(data_len - received)
         if not d:
             return None
-        data += d
-    return data
+        chunks.append(d)
+        received += len(d)
+    return b''.join(chunks)
 
 
 def exec_command(module, command):
@@ -98,6 +102,10 @@ class Connection(object):
             raise AssertionError('socket_path must be a value')
         self.socket_path = socket_path
 
+        # the socket is kept open for all the requests sent through this
+        # object, rather than connecting again for every request
+        self._socket = None
+
     def __getattr__(self, name):
         try:
             return self.__dict__[name]
@@ -130,6 +138,37 @@ class Connection(object):
 
         return response
 
+    def _exec_jsonrpc_batch(self, calls):
+        '''
+        Sends the json-rpc requests for calls, a list of (name, args, kwargs),
+        without waiting for the response to each request before sending the
+        next one, and returns the responses in the same order.
+        '''
+
+        reqs = [request_builder(name, *args, **kwargs) for (name, args, kwargs) in calls]
+
+        troubleshoot = 'https://docs.ansible.com/ansible/latest/network/user_guide/network_debug_troubleshooting.html#category-socket-path-issue'
+
+        if not os.path.exists(self.socket_path):
+            raise ConnectionError('socket_path does not exist or cannot be found. Please check %s' % troubleshoot)
+
+        out = self.send_batch([json.dumps(req) for req in reqs])
+        responses = dict((response['id'], response) for response in (json.loads(data) for data in out))
+
+        try:
+            return [responses[req['id']] for req in reqs]
+        except KeyError:
+            raise ConnectionError('invalid json-rpc id received')
+
+    def _get_result(self, response):
+        if 'error' in response:
+            err = response.get('error')
+            msg = err.get('data') or err['message']
+            code = err['code']
+            raise ConnectionError(to_text(msg, errors='surrogate_then_replace'), code=code)
+
+        return response['result']
+
     def __rpc__(self, name, *args, **kwargs):
         """Executes the json-rpc and returns the output received
            from remote device.
@@ -141,27 +180,93 @@ class Connection(object):
         """
 
         response = self._exec_jsonrpc(name, *args, **kwargs)
+        return self._get_result(response)
 
-        if 'error' in response:
-            err = response.get('error')
-            msg = err.get('data') or err['message']
-            code = err['code']
-            raise ConnectionError(to_text(msg, errors='surrogate_then_replace'), code=code)
+    def __rpc_batch__(self, calls):
+        """Executes the json-rpc calls pipelined over the connection socket
+           and returns their results in the same order.
+           :calls: List of (name, args, kwargs) tuples of the rpc methods to
+                   execute, with their ordered and keyword arguments
 
-        return response['result']
+           Raises ConnectionError for the first of the calls which failed.
+        """
 
-    def send(self, data):
-        try:
+        return [self._get_result(response) for response in self._exec_jsonrpc_batch(calls)]
+
+    def _connect(self):
+        if self._socket is None:
             sf = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sf.connect(self.socket_path)
+            try:
+                sf.connect(self.socket_path)
+            except socket.error:
+                sf.close()
+                raise
+            self._socket = sf
+        return self._socket
+
+    def _close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
 
+    def send(self, data):
+        try:
+            sf = self._connect()
             send_data(sf, to_bytes(data))
             response = recv_data(sf)
+            if response is None:
+                raise socket.error('the socket was closed before the response was received')
 
         except socket.error as e:
-            sf.close()
+            self._close()
             raise ConnectionError('unable to connect to socket', err=to_text(e, errors='surrogate_then_replace'), exception=traceback.format_exc())
 
-        sf.close()
-
         return to_text(response, errors='surrogate_or_strict')
+
+    def send_batch(self, requests):
+        '''
+        Sends all the requests and returns their responses in the same order.
+        Responses are read while the requests are being written, so that the
+        server is never blocked writing a response we are not reading.
+        '''
+
+        out = b''.join(struct.pack('!Q', len(data)) + data for data in (to_bytes(request) for request in requests))
+        sent = 0
+        buf = bytearray()
+        responses = []
+
+        try:
+            sf = self._connect()
+            sf.setblocking(0)
+            try:
+                while len(responses) < len(requests):
+                    (readable, writable, _) = select.select([sf], [sf] if sent < len(out) else [], [])
+                    try:
+                        if writable:
+                            sent += sf.send(out[sent:sent + 65536])
+                        if readable:
+                            d = sf.recv(65536)
+                            if not d:
+                                raise socket.error('the socket was closed before the responses were received')
+                            buf += d
+                    except socket.error as e:
+                        if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                            raise
+
+                    # split the complete responses off what was received
+                    start = 0
+                    while len(buf) - start >= 8:
+                        end = start + 8 + struct.unpack('!Q', bytes(buf[start:start + 8]))[0]
+                        if len(buf) < end:
+                            break
+                        responses.append(to_text(bytes(buf[start + 8:end]), errors='surrogate_or_strict'))
+                        start = end
+                    del buf[:start]
+            finally:
+                sf.setblocking(1)
+
+        except socket.error as e:
+            self._close()
+            raise ConnectionError('unable to connect to socket', err=to_text(e, errors='surrogate_then_replace'), exception=traceback.format_exc())
+
+        return responses
@@ -146,6 +146,14 @@ class Cli:
         connection = self._get_connection()
         return connection.run_commands(commands=commands, check_rc=check_rc)
 
+    def run_commands_batch(self, commands, check_rc=True):
+        """Run list of commands on remote device and return results, sending
+        those which expect no prompt together. The commands after one that
+        fails are still run by the device.
+        """
+        connection = self._get_connection()
+        return connection.run_commands_batch(commands=commands, check_rc=check_rc)
+
     def load_config(self, commands, commit=False, replace=False):
         """Loads the config commands onto the remote device
         """
@@ -410,8 +418,11 @@ def get_config(module, flags=None):
     return conn.get_config(flags)
 
 
-def run_commands(module, commands, check_rc=True):
+def run_commands(module, commands, check_rc=True, batch=False):
     conn = get_connection(module)
+    # eapi sends all of the commands in one request already
+    if batch and hasattr(conn, 'run_commands_batch'):
+        return conn.run_commands_batch(to_command(module, commands), check_rc=check_rc)
     return conn.run_commands(to_command(module, commands), check_rc=check_rc)
 
 
@@ -120,8 +120,11 @@ def to_commands(module, commands):
     return transform(commands)
 
 
-def run_commands(module, commands, check_rc=True):
+def run_commands(module, commands, check_rc=True, batch=False):
     connection = get_connection(module)
+    if batch:
+        # the commands after one that fails are still run by the device
+        return connection.run_commands_batch(commands=commands, check_rc=check_rc)
     return connection.run_commands(commands=commands, check_rc=check_rc)
 
 
@@ -153,6 +153,18 @@ class Cli:
         except ConnectionError as exc:
             self._module.fail_json(msg=to_text(exc))
 
+    def run_commands_batch(self, commands, check_rc=True):
+        """Run list of commands on remote device and return results, sending
+        those which expect no prompt together. The commands after one that
+        fails are still run by the device.
+        """
+        connection = self._get_connection()
+
+        try:
+            return connection.run_commands_batch(commands, check_rc)
+        except ConnectionError as exc:
+            self._module.fail_json(msg=to_text(exc))
+
     def load_config(self, config, return_error=False, opts=None):
         """Sends configuration commands to the remote device
         """
@@ -429,8 +441,11 @@ def get_config(module, flags=None):
     return conn.get_config(flags=flags)
 
 
-def run_commands(module, commands, check_rc=True):
+def run_commands(module, commands, check_rc=True, batch=False):
     conn = get_connection(module)
+    # nxapi sends all of the commands in one request already
+    if batch and hasattr(conn, 'run_commands_batch'):
+        return conn.run_commands_batch(to_command(module, commands), check_rc)
     return conn.run_commands(to_command(module, commands), check_rc)
 
 
@@ -239,6 +239,7 @@ import traceback
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils._text import to_bytes, to_native
+from ansible.module_utils.common.delta import apply_delta
 
 
 class AnsibleModuleError(Exception):
@@ -293,6 +294,7 @@ def main():
             remote_src=dict(type='bool'),
             local_follow=dict(type='bool'),
             checksum=dict(),
+            _delta_basis=dict(type='path'),  # src is a delta against this file, sent by the copy action
         ),
         add_file_common_args=True,
         supports_check_mode=True,
@@ -323,6 +325,17 @@ def main():
     if os.path.isdir(b_src):
         module.fail_json(msg="Remote copy does not support recursive copy of directory: %s" % (src))
 
+    if module.params['_delta_basis']:
+        # rebuild the file from the delta and the blocks of the current one,
+        # the checksum check below catches it changing since it was read
+        b_patched = b_src + b'.patched'
+        try:
+            apply_delta(to_bytes(module.params['_delta_basis'], errors='surrogate_or_strict'), b_src, b_patched)
+        except (IOError, OSError, ValueError) as e:
+            module.fail_json(msg="Failed to apply the delta to %s: %s" % (module.params['_delta_basis'], to_native(e)))
+        b_src = b_patched
+        src = to_native(b_src, errors='surrogate_or_strict')
+
     # Preserve is usually handled in the action plugin but mode + remote_src has to be done on the
     # remote host
     if module.params['mode'] == 'preserve':
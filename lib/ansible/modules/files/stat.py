@@ -371,6 +371,7 @@ import stat
 # import module snippets
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils._text import to_bytes
+from ansible.module_utils.common.delta import block_checksums
 
 
 def format_output(module, path, st):
@@ -447,6 +448,7 @@ def main():
             checksum_algorithm=dict(type='str', default='sha1',
                                     choices=['md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512'],
                                     aliases=['checksum', 'checksum_algo']),
+            _checksum_block_size=dict(type='int'),  # used by the copy action to send deltas
         ),
         supports_check_mode=True,
     )
@@ -517,6 +519,9 @@ def main():
         if get_checksum:
             output['checksum'] = module.digest_from_file(b_path, checksum_algorithm)
 
+        if module.params['_checksum_block_size']:
+            output['block_checksums'] = block_checksums(b_path, module.params['_checksum_block_size'])
+
     # try to get mime data if requested
     if get_mime:
         output['mimetype'] = output['charset'] = 'unknown'
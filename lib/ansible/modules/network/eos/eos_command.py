@@ -35,6 +35,8 @@ description:
 extends_documentation_fragment: eos
 notes:
   - Tested against EOS 4.15
+  - With C(connection=network_cli), the commands which expect no prompt are sent to the device together. When one of
+    them fails, the module fails, but the device still runs the commands after it.
 options:
   commands:
     description:
@@ -241,7 +243,7 @@ def main():
     match = module.params['match']
 
     while retries > 0:
-        responses = run_commands(module, commands)
+        responses = run_commands(module, commands, batch=True)
 
         for item in list(conditionals):
             if item(responses):
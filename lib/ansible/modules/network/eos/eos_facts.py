@@ -153,7 +153,7 @@ class FactsBase(object):
         self.responses = None
 
     def populate(self):
-        self.responses = run_commands(self.module, list(self.COMMANDS))
+        self.responses = run_commands(self.module, list(self.COMMANDS), batch=True)
 
 
 class Default(FactsBase):
@@ -37,6 +37,8 @@ description:
 extends_documentation_fragment: ios
 notes:
   - Tested against IOS 15.6
+  - With C(connection=network_cli), the commands which expect no prompt are sent to the device together. When one of
+    them fails, the module fails, but the device still runs the commands after it.
 options:
   commands:
     description:
@@ -214,7 +216,7 @@ def main():
     match = module.params['match']
 
     while retries > 0:
-        responses = run_commands(module, commands)
+        responses = run_commands(module, commands, batch=True)
 
         for item in list(conditionals):
             if item(responses):
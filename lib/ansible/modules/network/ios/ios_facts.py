@@ -157,7 +157,7 @@ class FactsBase(object):
         self.responses = None
 
     def populate(self):
-        self.responses = run_commands(self.module, commands=self.COMMANDS, check_rc=False)
+        self.responses = run_commands(self.module, commands=self.COMMANDS, check_rc=False, batch=True)
 
     def run(self, cmd):
         return run_commands(self.module, commands=cmd, check_rc=False)
@@ -23,6 +23,9 @@ description:
     read from the device.  This module includes an
     argument that will cause the module to wait for a specific condition
     before returning or timing out if the condition is not met.
+notes:
+  - With C(connection=network_cli), the commands which expect no prompt are sent to the device together. When one of
+    them fails, the module fails, but the device still runs the commands after it.
 options:
   commands:
     description:
@@ -208,7 +211,7 @@ def main():
     match = module.params['match']
 
     while retries > 0:
-        responses = run_commands(module, commands)
+        responses = run_commands(module, commands, batch=True)
 
         for item in list(conditionals):
             try:
@@ -24,7 +24,7 @@ import yaml
 from ansible.module_utils.six import PY3
 from ansible.parsing.yaml.objects import AnsibleUnicode, AnsibleSequence, AnsibleMapping, AnsibleVaultEncryptedUnicode
 from ansible.utils.unsafe_proxy import AnsibleUnsafeText
-from ansible.vars.hostvars import HostVars, HostVarsVars
+from ansible.vars.hostvars import HostVars, HostVarsVars, InventoryGroups
 
 
 class AnsibleDumper(yaml.SafeDumper):
@@ -68,6 +68,11 @@ AnsibleDumper.add_representer(
     represent_hostvars,
 )
 
+AnsibleDumper.add_representer(
+    InventoryGroups,
+    represent_hostvars,
+)
+
 AnsibleDumper.add_representer(
     AnsibleSequence,
     yaml.representer.SafeRepresenter.represent_list,
@@ -301,6 +301,14 @@ class FieldAttributeBase(with_metaclass(BaseMeta, object)):
                 self._attributes[name] = getattr(self, name)
             self._squashed = True
 
+    def __getstate__(self):
+        # the variable manager is only needed while loading, and pickling it
+        # would drag along the inventory and all facts, so leave it behind
+        # when sending objects to pool workers
+        state = self.__dict__.copy()
+        state['_variable_manager'] = None
+        return state
+
     def copy(self):
         '''
         Create a copy of this object and return it.
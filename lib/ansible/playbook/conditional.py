@@ -26,9 +26,10 @@ from jinja2.compiler import generate
 from jinja2.exceptions import UndefinedError
 
 from ansible.errors import AnsibleError, AnsibleUndefinedVariable
-from ansible.module_utils.six import text_type
+from ansible.module_utils.six import string_types, text_type
 from ansible.module_utils._text import to_native
 from ansible.playbook.attribute import FieldAttribute
+from ansible.template import REFERENCE_REGEX
 
 try:
     from __main__ import display
@@ -40,6 +41,51 @@ except ImportError:
 DEFINED_REGEX = re.compile(r'(hostvars\[.+\]|[\w_]+)\s+(not\s+is|is|is\s+not)\s+(defined|undefined)')
 LOOKUP_REGEX = re.compile(r'lookup\s*\(')
 VALID_VAR_REGEX = re.compile("^[_A-Za-z][_a-zA-Z0-9]*$")
+REFERENCE_CONDITIONAL_REGEX = re.compile(r'^(not\s+)?(%s)$' % REFERENCE_REGEX)
+DEFINED_TEST_REGEX = re.compile(r'^(%s)\s+is\s+(not\s+)?(defined|undefined)$' % REFERENCE_REGEX)
+CONSTANT_CONDITIONALS = {'True': True, 'true': True, 'False': False, 'false': False}
+
+# conditional -> how it is evaluated, see classify_conditional()
+_CLASSIFIED = {}
+_CLASSIFIED_MAX = 10000
+
+# conditionals which went through the checks for unsafe syntax, with
+# whether lookups were disabled when they did
+_VALIDATED = set()
+
+
+def classify_conditional(conditional):
+    '''
+    Tells how a conditional can be evaluated, as a tuple of:
+    - ('constant', value) for True and False
+    - ('reference', reference, negated) for foo.bar or not foo
+    - ('defined', reference, expected) for tests like foo is defined
+    - ('template', ) for anything else, which needs jinja2
+    The results are kept, so the conditionals of tasks are only classified
+    once, when the tasks are loaded.
+    '''
+
+    kind = _CLASSIFIED.get(conditional)
+    if kind is None:
+        stripped = conditional.strip()
+        m = DEFINED_TEST_REGEX.match(stripped)
+        if stripped in CONSTANT_CONDITIONALS:
+            kind = ('constant', CONSTANT_CONDITIONALS[stripped])
+        elif m:
+            kind = ('defined', m.group(1), (m.group(2) is None) == (m.group(3) == 'defined'))
+        else:
+            m = REFERENCE_CONDITIONAL_REGEX.match(stripped)
+            # bare variables are evaluated as conditionals themselves, see _check_conditional()
+            if m and (m.group(1) or '.' in m.group(2)):
+                kind = ('reference', m.group(2), m.group(1) is not None)
+            else:
+                kind = ('template', )
+
+        if len(_CLASSIFIED) >= _CLASSIFIED_MAX:
+            _CLASSIFIED.clear()
+        _CLASSIFIED[conditional] = kind
+
+    return kind
 
 
 class Conditional:
@@ -65,6 +111,11 @@ class Conditional:
     def _validate_when(self, attr, name, value):
         if not isinstance(value, list):
             setattr(self, name, [value])
+            value = [value]
+
+        for conditional in value:
+            if isinstance(conditional, string_types):
+                classify_conditional(conditional)
 
     def extract_defined_undefined(self, conditional):
         results = []
@@ -106,6 +157,32 @@ class Conditional:
 
         return True
 
+    def _evaluate_simple_conditional(self, conditional, templar, all_vars):
+        '''
+        Evaluates the conditionals which are a constant, a reference to a
+        variable or a defined test on one without going through jinja2.
+        Returns None if the conditional needs it after all.
+        '''
+
+        kind = classify_conditional(conditional)
+        if kind[0] == 'constant':
+            return kind[1]
+        elif kind[0] == 'template':
+            return None
+
+        templar.set_available_variables(variables=all_vars)
+        resolved = templar._resolve_reference(kind[1])
+        if resolved is None:
+            return None
+
+        (defined, value) = resolved
+        if kind[0] == 'defined':
+            return defined == kind[2]
+        elif not defined:
+            # leave the error about the undefined variable to jinja2
+            return None
+        return bool(value) != kind[2]
+
     def _check_conditional(self, conditional, templar, all_vars):
         '''
         This method does the low-level evaluation of each conditional
@@ -117,7 +194,12 @@ class Conditional:
         if conditional is None or conditional == '':
             return True
 
-        if templar.is_template(conditional):
+        if isinstance(conditional, string_types) and conditional not in all_vars:
+            result = self._evaluate_simple_conditional(conditional, templar, all_vars)
+            if result is not None:
+                return result
+
+        if templar._contains_vars(conditional) and templar.is_template(conditional):
             display.warning('when statements should not include jinja2 '
                             'templating delimiters such as {{ }} or {%% %%}. '
                             'Found: %s' % conditional)
@@ -174,19 +256,24 @@ class Conditional:
                             inside_call=inside_call,
                             inside_yield=inside_yield
                         )
-            try:
-                e = templar.environment.overlay()
-                e.filters.update(templar._get_filters(e.filters))
-                e.tests.update(templar._get_tests())
-
-                res = e._parse(conditional, None, None)
-                res = generate(res, e, None, None)
-                parsed = ast.parse(res, mode='exec')
-
-                cnv = CleansingNodeVisitor()
-                cnv.visit(parsed)
-            except Exception as e:
-                raise AnsibleError("Invalid conditional detected: %s" % to_native(e))
+            if (conditional, disable_lookups) not in _VALIDATED:
+                try:
+                    e = templar.environment.overlay()
+                    e.filters.update(templar._get_filters(e.filters))
+                    e.tests.update(templar._get_tests())
+
+                    res = e._parse(conditional, None, None)
+                    res = generate(res, e, None, None)
+                    parsed = ast.parse(res, mode='exec')
+
+                    cnv = CleansingNodeVisitor()
+                    cnv.visit(parsed)
+                except Exception as e:
+                    raise AnsibleError("Invalid conditional detected: %s" % to_native(e))
+
+                if len(_VALIDATED) >= _CLASSIFIED_MAX:
+                    _VALIDATED.clear()
+                _VALIDATED.add((conditional, disable_lookups))
 
             # and finally we generate and template the presented string and look at the resulting string
             presented = "{%% if %s %%} True {%% else %%} False {%% endif %%}" % conditional
@@ -8,6 +8,7 @@ __metaclass__ = type
 
 import base64
 import json
+import ntpath
 import os
 import random
 import re
@@ -18,7 +19,7 @@ from abc import ABCMeta, abstractmethod
 
 from ansible import constants as C
 from ansible.errors import AnsibleError, AnsibleConnectionFailure, AnsibleActionSkip, AnsibleActionFail
-from ansible.executor.module_common import modify_module
+from ansible.executor.module_common import build_module_batch, modify_module
 from ansible.module_utils.json_utils import _filter_non_json_lines
 from ansible.module_utils.six import binary_type, string_types, text_type, iteritems, with_metaclass
 from ansible.module_utils.six.moves import shlex_quote
@@ -54,6 +55,11 @@ class ActionBase(with_metaclass(ABCMeta, object)):
         self._shared_loader_obj = shared_loader_obj
         self._cleanup_remote_tmp = False
 
+        # the tmpdirs kept on the host for the play, by (transport,
+        # remote_user, system tmpdir), set by the TaskExecutor with
+        # REMOTE_TMP_PER_PLAY
+        self._host_tmpdirs = None
+
         self._supports_check_mode = True
         self._supports_async = False
 
@@ -105,7 +111,7 @@ class ActionBase(with_metaclass(ABCMeta, object)):
             return True
         return False
 
-    def _configure_module(self, module_name, module_args, task_vars=None):
+    def _configure_module(self, module_name, module_args, task_vars=None, remote_cache_stub=False):
         '''
         Handles the loading and templating of the module code through the
         modify_module() function.
@@ -162,7 +168,9 @@ class ActionBase(with_metaclass(ABCMeta, object)):
                                                                     become_user=self._play_context.become_user,
                                                                     become_password=self._play_context.become_pass,
                                                                     become_flags=self._play_context.become_flags,
-                                                                    environment=final_environment)
+                                                                    environment=final_environment,
+                                                                    remote_cache_dir=C.ANSIBALLZ_REMOTE_CACHE_DIR if C.ANSIBALLZ_REMOTE_CACHE else None,
+                                                                    remote_cache_stub=remote_cache_stub)
 
         return (module_style, module_shebang, module_data, module_path)
 
@@ -226,6 +234,31 @@ class ActionBase(with_metaclass(ABCMeta, object)):
 
         return True
 
+    def _is_single_command_enabled(self, module_style, wrap_async=False):
+        '''
+        Determines if a module can be written to a new temporary directory,
+        run and cleaned up after in a single remote command, see
+        SINGLE_COMMAND_MODULES.
+        '''
+
+        if not C.SINGLE_COMMAND_MODULES:
+            return False
+
+        # any of these require a true
+        for condition in [
+            self._connection.has_pipelining,             # the module is sent on the command's stdin
+            module_style == "new",                       # other modules need their arguments in a file of their own
+            not C.DEFAULT_KEEP_REMOTE_FILES,             # user wants remote files
+            not wrap_async,                              # async_wrapper outlives the command
+            self._play_context.become_method != 'su',    # su does not work with data on stdin
+            self._connection._shell.SHELL_FAMILY == 'sh',
+            self._connection._shell.tmpdir is None,      # the action already made a tmpdir the module should use
+        ]:
+            if not condition:
+                return False
+
+        return not self._is_pipelining_enabled(module_style, wrap_async)
+
     def _make_tmp_path(self, remote_user=None):
         '''
         Create and return a temporary path on a remote box.
@@ -246,6 +279,19 @@ class ActionBase(with_metaclass(ABCMeta, object)):
         # deal with tmpdir creation
         basefile = 'ansible-tmp-%s-%s' % (time.time(), random.randint(0, 2**48))
         use_system_tmp = bool(self._play_context.become and self._play_context.become_user not in admin_users)
+
+        # reuse the tmpdir an earlier task of the play made for the same user,
+        # only its files are removed after the task, the strategy removes the
+        # directory at the end of the play
+        keep_tmpdir = self._host_tmpdirs is not None and not getattr(self._connection, '_remote_is_local', False)
+        tmpdir_key = (self._connection.transport, remote_user, use_system_tmp)
+        if keep_tmpdir and tmpdir_key in self._host_tmpdirs:
+            self._cleanup_remote_tmp = True
+            self._connection._shell.tmpdir = self._host_tmpdirs[tmpdir_key]
+            if not use_system_tmp:
+                self._connection._shell.env.update({'ANSIBLE_REMOTE_TMP': self._connection._shell.tmpdir})
+            return self._connection._shell.tmpdir
+
         # Network connection plugins (network_cli, netconf, etc.) execute on the controller, rather than the remote host.
         # As such, we want to avoid using remote_user for paths  as remote_user may not line up with the local user
         # This is a hack and should be solved by more intelligent handling of remote_tmp in 2.7
@@ -296,15 +342,53 @@ class ActionBase(with_metaclass(ABCMeta, object)):
             raise AnsibleError('failed to resolve remote temporary directory from %s: `%s` returned empty string' % (basefile, cmd))
 
         self._connection._shell.tmpdir = rc
+        if keep_tmpdir:
+            self._host_tmpdirs[tmpdir_key] = rc
 
         if not use_system_tmp:
             self._connection._shell.env.update({'ANSIBLE_REMOTE_TMP': self._connection._shell.tmpdir})
         return rc
 
+    def _build_single_command(self, module_path, environment_string, shebang):
+        '''
+        Returns the command creating a temporary directory, writing the module
+        it is sent on stdin to it, running it and removing the directory.
+
+        The whole command runs as the become user, so unlike with
+        _make_tmp_path() and _fixup_perms2() the files need no permission
+        changes, but the directory is made in a system tmpdir whenever become
+        is used.
+        '''
+
+        shell = self._connection._shell
+        basefile = 'ansible-tmp-%s-%s' % (time.time(), random.randint(0, 2**48))
+        if self._play_context.become:
+            tmpdir = shell.get_option('system_tmpdirs')[0]
+        elif getattr(self._connection, '_remote_is_local', False):
+            tmpdir = C.DEFAULT_LOCAL_TMP
+        else:
+            # expanded on the target, by the same shell the module runs from
+            tmpdir = shell.get_option('remote_tmp')
+        basetmp = shell.join_path(tmpdir, basefile)
+
+        remote_module_filename = shell.get_remote_filename(module_path)
+        remote_module_path = '%s echo %s %s' % (shell._SHELL_SUB_LEFT, shell.join_path(basetmp, remote_module_filename), shell._SHELL_SUB_RIGHT)
+
+        cmd = '%s > /dev/null %s cat > %s' % (shell.mkdtemp(basefile=basefile, system=bool(self._play_context.become), tmpdir=tmpdir),
+                                              shell._SHELL_AND, remote_module_path)
+        cmd = shell.append_command(cmd, '%s %s' % (shell.build_module_command(environment_string, shebang, '').strip(), remote_module_path))
+        # keep the module's exit code once the directory is gone
+        cmd += '; rc=$?; rm -f -r %s echo %s %s %s; (exit $rc)' % (shell._SHELL_SUB_LEFT, basetmp, shell._SHELL_SUB_RIGHT, shell._SHELL_REDIRECT_ALLNULL)
+        return cmd
+
     def _should_remove_tmp_path(self, tmp_path):
         '''Determine if temporary path should be deleted or kept by user request/config'''
         return tmp_path and self._cleanup_remote_tmp and not C.DEFAULT_KEEP_REMOTE_FILES and "-tmp-" in tmp_path
 
+    def _is_kept_tmp_path(self, tmp_path):
+        '''Determine if temporary path is kept on the host for the play, see REMOTE_TMP_PER_PLAY'''
+        return self._host_tmpdirs is not None and tmp_path in self._host_tmpdirs.values()
+
     def _remove_tmp_path(self, tmp_path):
         '''Remove a temporary path we created. '''
 
@@ -312,7 +396,12 @@ class ActionBase(with_metaclass(ABCMeta, object)):
             tmp_path = self._connection._shell.tmpdir
 
         if self._should_remove_tmp_path(tmp_path):
-            cmd = self._connection._shell.remove(tmp_path, recurse=True)
+            if self._is_kept_tmp_path(tmp_path):
+                # the files of the task, such as the module and its arguments,
+                # go, the directory stays for the next tasks
+                cmd = self._connection._shell.remove_contents(tmp_path)
+            else:
+                cmd = self._connection._shell.remove(tmp_path, recurse=True)
             # If we have gotten here we have a working ssh configuration.
             # If ssh breaks we could leave tmp directories out on the remote system.
             tmp_rm_res = self._low_level_execute_command(cmd, sudoable=False)
@@ -325,9 +414,39 @@ class ActionBase(with_metaclass(ABCMeta, object)):
                 self._connection._shell.tmpdir = None
 
     def _transfer_file(self, local_path, remote_path):
-        self._connection.put_file(local_path, remote_path)
+        try:
+            self._connection.put_file(local_path, remote_path)
+        except AnsibleError:
+            # the tmpdir kept for the play may be gone, e.g. when the host
+            # rebooted with its tmpdirs on a tmpfs
+            tmpdir = self._connection._shell.tmpdir
+            if not (self._is_kept_tmp_path(tmpdir) and remote_path.startswith(tmpdir) and self._remake_tmp_path(tmpdir)):
+                raise
+            self._connection.put_file(local_path, remote_path)
         return remote_path
 
+    def _remake_tmp_path(self, tmp_path):
+        '''
+        Makes a tmpdir kept for the play again at the same path, if it no
+        longer exists. When it cannot be made, it is dropped so the next
+        tasks make a new one. Returns whether it was made again.
+        '''
+
+        result = self._low_level_execute_command(self._connection._shell.exists(tmp_path), sudoable=False)
+        if result['rc'] == 0:
+            return False
+
+        tmpdir_key = [key for (key, path) in iteritems(self._host_tmpdirs) if path == tmp_path][0]
+        (tmpdir, basefile) = ntpath.split(tmp_path.rstrip('/\\'))
+        display.vvv("The temporary directory %s kept for the play is gone, making it again" % tmp_path)
+        cmd = self._connection._shell.mkdtemp(basefile=basefile, system=tmpdir_key[2], tmpdir=tmpdir)
+        result = self._low_level_execute_command(cmd, sudoable=False)
+        if result['rc'] != 0:
+            del self._host_tmpdirs[tmpdir_key]
+            return False
+
+        return True
+
     def _transfer_data(self, remote_path, data):
         '''
         Copies the module data out to the temporary module path.
@@ -493,9 +612,12 @@ class ActionBase(with_metaclass(ABCMeta, object)):
         res = self._low_level_execute_command(cmd, sudoable=sudoable)
         return res
 
-    def _execute_remote_stat(self, path, all_vars, follow, tmp=None, checksum=True):
+    def _execute_remote_stat(self, path, all_vars, follow, tmp=None, checksum=True, checksum_block_size=None):
         '''
         Get information from remote file.
+
+        With checksum_block_size, the checksums of the blocks of the file are
+        returned too, as 'block_checksums', to send a delta of it.
         '''
         if tmp is not None:
             display.warning('_execute_remote_stat no longer honors the tmp parameter. Action'
@@ -509,6 +631,8 @@ class ActionBase(with_metaclass(ABCMeta, object)):
             get_checksum=checksum,
             checksum_algo='sha1',
         )
+        if checksum_block_size:
+            module_args['_checksum_block_size'] = checksum_block_size
         mystat = self._execute_module(module_name='stat', module_args=module_args, task_vars=all_vars,
                                       wrap_async=False)
 
@@ -689,7 +813,8 @@ class ActionBase(with_metaclass(ABCMeta, object)):
         update.update(options)
         self.connection.set_options(update)
 
-    def _execute_module(self, module_name=None, module_args=None, tmp=None, task_vars=None, persist_files=False, delete_remote_tmp=None, wrap_async=False):
+    def _execute_module(self, module_name=None, module_args=None, tmp=None, task_vars=None, persist_files=False, delete_remote_tmp=None, wrap_async=False,
+                        remote_cache_stub=None):
         '''
         Transfer and run a module along with its arguments.
         '''
@@ -712,7 +837,7 @@ class ActionBase(with_metaclass(ABCMeta, object)):
         # remote tmp here, it will still be created. This must be done before
         # calling self._update_module_args() so the module wrapper has the
         # correct remote_tmp value set
-        if not self._is_pipelining_enabled("new", wrap_async) and tmpdir is None:
+        if not self._is_pipelining_enabled("new", wrap_async) and not self._is_single_command_enabled("new", wrap_async) and tmpdir is None:
             self._make_tmp_path()
             tmpdir = self._connection._shell.tmpdir
 
@@ -727,15 +852,22 @@ class ActionBase(with_metaclass(ABCMeta, object)):
 
         self._update_module_args(module_name, module_args, task_vars)
 
+        # With ANSIBALLZ_REMOTE_CACHE python modules are first sent without
+        # their zip data, async_wrapper runs them too late to resend it
+        if remote_cache_stub is None:
+            remote_cache_stub = C.ANSIBALLZ_REMOTE_CACHE and not wrap_async
+
         # FUTURE: refactor this along with module build process to better encapsulate "smart wrapper" functionality
-        (module_style, shebang, module_data, module_path) = self._configure_module(module_name=module_name, module_args=module_args, task_vars=task_vars)
+        (module_style, shebang, module_data, module_path) = self._configure_module(module_name=module_name, module_args=module_args, task_vars=task_vars,
+                                                                                   remote_cache_stub=remote_cache_stub)
         display.vvv("Using module file %s" % module_path)
         if not shebang and module_style != 'binary':
             raise AnsibleError("module (%s) is missing interpreter line" % module_name)
 
         remote_module_path = None
+        single_command = self._is_single_command_enabled(module_style, wrap_async)
 
-        if not self._is_pipelining_enabled(module_style, wrap_async):
+        if not self._is_pipelining_enabled(module_style, wrap_async) and not single_command:
             # we might need remote tmp dir
             if tmpdir is None:
                 self._make_tmp_path()
@@ -806,19 +938,24 @@ class ActionBase(with_metaclass(ABCMeta, object)):
                 # maintain a fixed number of positional parameters for async_wrapper
                 async_cmd.append('_')
 
-            if not self._should_remove_tmp_path(tmpdir):
+            # a tmpdir kept for the play may be used by the next tasks while the job runs
+            if not self._should_remove_tmp_path(tmpdir) or self._is_kept_tmp_path(tmpdir):
                 async_cmd.append("-preserve_tmp")
 
             cmd = " ".join(to_text(x) for x in async_cmd)
 
         else:
 
-            if self._is_pipelining_enabled(module_style):
+            if single_command:
                 in_data = module_data
+                cmd = self._build_single_command(module_path, environment_string, shebang)
             else:
-                cmd = remote_module_path
+                if self._is_pipelining_enabled(module_style):
+                    in_data = module_data
+                else:
+                    cmd = remote_module_path
 
-            cmd = self._connection._shell.build_module_command(environment_string, shebang, cmd, arg_path=args_file_path).strip()
+                cmd = self._connection._shell.build_module_command(environment_string, shebang, cmd, arg_path=args_file_path).strip()
 
         # Fix permissions of the tmpdir path and tmpdir files. This should be called after all
         # files have been transferred.
@@ -833,13 +970,12 @@ class ActionBase(with_metaclass(ABCMeta, object)):
         # parse the main result
         data = self._parse_returned_data(res)
 
-        # NOTE: INTERNAL KEYS ONLY ACCESSIBLE HERE
-        # get internal info before cleaning
-        if data.pop("_ansible_suppress_tmpdir_delete", False):
-            self._cleanup_remote_tmp = False
+        if remote_cache_stub and data.get('_ansible_ansiballz_cache_miss'):
+            display.vvv("AnsiballZ payload for %s is not cached on the target, sending it in full" % module_name)
+            return self._execute_module(module_name=module_name, module_args=module_args, task_vars=task_vars, persist_files=persist_files,
+                                        wrap_async=wrap_async, remote_cache_stub=False)
 
-        # remove internal keys
-        remove_internal_keys(data)
+        self._clean_module_result(data)
 
         if wrap_async:
             # async_wrapper will clean up its tmpdir on its own so we want the controller side to
@@ -849,6 +985,23 @@ class ActionBase(with_metaclass(ABCMeta, object)):
             # FIXME: for backwards compat, figure out if still makes sense
             data['changed'] = True
 
+        display.debug("done with _execute_module (%s, %s)" % (module_name, module_args))
+        return data
+
+    def _clean_module_result(self, data):
+        '''
+        Removes the internal keys from a parsed module result, and splits its
+        stdout and stderr into lines.
+        '''
+
+        # NOTE: INTERNAL KEYS ONLY ACCESSIBLE HERE
+        # get internal info before cleaning
+        if data.pop("_ansible_suppress_tmpdir_delete", False):
+            self._cleanup_remote_tmp = False
+
+        # remove internal keys
+        remove_internal_keys(data)
+
         # pre-split stdout/stderr into lines if needed
         if 'stdout' in data and 'stdout_lines' not in data:
             # if the value is 'False', a default won't catch it.
@@ -859,8 +1012,71 @@ class ActionBase(with_metaclass(ABCMeta, object)):
             txt = data.get('stderr', None) or u''
             data['stderr_lines'] = txt.splitlines()
 
-        display.debug("done with _execute_module (%s, %s)" % (module_name, module_args))
-        return data
+    def _execute_module_batch(self, modules, task_vars=None):
+        '''
+        Runs several (module_name, module_args) pairs on the target in one
+        remote command, one after the other, stopping at the first module that
+        fails.  Returns the result of each module that ran, in order.
+
+        Only new style python modules using the same interpreter are batched,
+        the batch is cut short before the first one that is not.  A batch of a
+        single module is run with _execute_module().
+        '''
+
+        if task_vars is None:
+            task_vars = dict()
+
+        # as in _execute_module(), the tmpdir has to exist before the module
+        # args are built
+        tmpdir = self._connection._shell.tmpdir
+        if not self._is_pipelining_enabled("new") and tmpdir is None:
+            self._make_tmp_path()
+            tmpdir = self._connection._shell.tmpdir
+
+        payloads = []
+        shebang = None
+        for (module_name, module_args) in modules:
+            module_args = module_args.copy()
+            self._update_module_args(module_name, module_args, task_vars)
+            (module_style, module_shebang, module_data, module_path) = self._configure_module(module_name=module_name, module_args=module_args,
+                                                                                              task_vars=task_vars)
+            if module_style != 'new' or not module_path.endswith('.py') or shebang not in (None, module_shebang):
+                break
+            display.vvv("Using module file %s" % module_path)
+            shebang = module_shebang
+            payloads.append(module_data)
+
+        if len(payloads) < 2:
+            (module_name, module_args) = modules[0]
+            return [self._execute_module(module_name=module_name, module_args=module_args, task_vars=task_vars)]
+
+        batch_data = build_module_batch(shebang, payloads)
+
+        in_data = None
+        cmd = ''
+        if self._is_pipelining_enabled("new"):
+            in_data = batch_data
+        else:
+            cmd = self._connection._shell.join_path(tmpdir, 'AnsiballZ_batch.py')
+            self._transfer_data(cmd, batch_data)
+            self._fixup_perms2([tmpdir, cmd], self._play_context.remote_user)
+
+        cmd = self._connection._shell.build_module_command(self._compute_environment_string(), shebang, cmd).strip()
+        res = self._low_level_execute_command(cmd, sudoable=True, in_data=in_data)
+        data = self._parse_returned_data(res)
+        if not isinstance(data.get('batch_results'), list):
+            # the batch did not run, report it as the failure of its first module
+            self._clean_module_result(data)
+            return [data]
+
+        results = []
+        for module_res in data['batch_results']:
+            module_data = self._parse_returned_data(module_res)
+            self._clean_module_result(module_data)
+            results.append(module_data)
+
+        display.debug("done with _execute_module_batch (%s)" % ', '.join(name for (name, args) in modules[:len(results)]))
+        return results
 
     def _parse_returned_data(self, res):
         try:
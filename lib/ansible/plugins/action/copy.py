@@ -23,18 +23,27 @@ __metaclass__ = type
 import json
 import os
 import os.path
+import re
 import stat
+import tarfile
 import tempfile
+import time
 import traceback
 
 from ansible import constants as C
 from ansible.errors import AnsibleError, AnsibleFileNotFound
 from ansible.module_utils.basic import FILE_COMMON_ARGUMENTS
 from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.common.delta import delta_block_size, write_delta
 from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.plugins.action import ActionBase
 from ansible.utils.hashing import checksum
 
+try:
+    from __main__ import display
+except ImportError:
+    from ansible.utils.display import Display
+    display = Display()
 
 # Supplement the FILE_COMMON_ARGUMENTS with arguments that are specific to file
 # FILE_COMMON_ARGUMENTS contains things that are not arguments of file so remove those as well
@@ -44,6 +53,14 @@ REAL_FILE_ARGS = frozenset(FILE_COMMON_ARGUMENTS.keys()).union(
                           ('content', 'decrypt', 'backup', 'remote_src', 'regexp', 'delimiter',
                            'directory_mode', 'unsafe_writes'))
 
+# The attributes which unarchive applies to the files sent in bulk, mode being
+# set on the archive members instead so directories can be given their own
+BULK_ATTRIBUTE_ARGS = frozenset(('owner', 'group', 'unsafe_writes'))
+
+# The attributes which can not be checked on the files already at dest from
+# the output of find, so directories are not copied in bulk when they are set
+NO_BULK_ATTRIBUTE_ARGS = frozenset(('seuser', 'serole', 'selevel', 'setype', 'attributes', 'attr'))
+
 
 def _create_remote_file_args(module_args):
     """remove keys that are not relevant to file"""
@@ -55,6 +72,16 @@ def _create_remote_copy_args(module_args):
     return dict((k, v) for k, v in module_args.items() if k not in ('content', 'decrypt'))
 
 
+def _octal_mode(mode):
+    """return an octal mode as an int, or None if it is not one (eg. symbolic)"""
+    if isinstance(mode, int):
+        return mode
+    try:
+        return int(mode, 8)
+    except (TypeError, ValueError):
+        return None
+
+
 def _walk_dirs(topdir, base_path=None, local_follow=False, trailing_slash_detector=None):
     """
     Walk a filesystem tree returning enough information to copy the files
@@ -246,6 +273,14 @@ class ActionModule(ActionBase):
         if self._task.args.get('mode', None) == 'preserve':
             lmode = '0%03o' % stat.S_IMODE(os.stat(source_full).st_mode)
 
+        # Files at least COPY_DELTA_MIN_SIZE large are sent as a delta against
+        # the blocks of the file at dest, which are checksummed along with it
+        block_size = None
+        if C.COPY_DELTA_MIN_SIZE and not raw and self._connection._shell.SHELL_FAMILY != 'powershell':
+            local_size = os.path.getsize(source_full)
+            if local_size >= C.COPY_DELTA_MIN_SIZE:
+                block_size = delta_block_size(local_size)
+
         # This is kind of optimization - if user told us destination is
         # dir, do path manipulation right away, otherwise we still check
         # for dest being a dir via remote call below.
@@ -255,7 +290,8 @@ class ActionModule(ActionBase):
             dest_file = dest
 
         # Attempt to get remote file info
-        dest_status = self._execute_remote_stat(dest_file, all_vars=task_vars, follow=follow, checksum=force)
+        dest_status = self._execute_remote_stat(dest_file, all_vars=task_vars, follow=follow, checksum=force,
+                                                checksum_block_size=block_size)
 
         if dest_status['exists'] and dest_status['isdir']:
             # The dest is a directory.
@@ -268,7 +304,8 @@ class ActionModule(ActionBase):
             else:
                 # Append the relative source location to the destination and get remote stats again
                 dest_file = self._connection._shell.join_path(dest, source_rel)
-                dest_status = self._execute_remote_stat(dest_file, all_vars=task_vars, follow=follow, checksum=force)
+                dest_status = self._execute_remote_stat(dest_file, all_vars=task_vars, follow=follow, checksum=force,
+                                                        checksum_block_size=block_size)
 
         if dest_status['exists'] and not force:
             # remote_file exists so continue to next iteration.
@@ -292,22 +329,25 @@ class ActionModule(ActionBase):
             tmp_src = self._connection._shell.join_path(self._connection._shell.tmpdir, 'source')
 
             remote_path = None
+            delta_sent = False
 
             if not raw:
-                remote_path = self._transfer_file(source_full, tmp_src)
+                if dest_status.get('block_checksums'):
+                    remote_path = self._transfer_delta(source_full, dest_status['block_checksums'], block_size, tmp_src)
+                    delta_sent = remote_path is not None
+                if not delta_sent:
+                    remote_path = self._transfer_file(source_full, tmp_src)
             else:
                 self._transfer_file(source_full, dest_file)
 
-            # We have copied the file remotely and no longer require our content_tempfile
-            self._remove_tempfile_if_content_defined(content, content_tempfile)
-            self._loader.cleanup_tmp_file(source_full)
-
             # fix file permissions when the copy is done as a different user
             if remote_path:
                 self._fixup_perms2((self._connection._shell.tmpdir, remote_path))
 
             if raw:
                 # Continue to next iteration if raw is defined.
+                self._remove_tempfile_if_content_defined(content, content_tempfile)
+                self._loader.cleanup_tmp_file(source_full)
                 return None
 
             # Run the copy module
@@ -329,8 +369,24 @@ class ActionModule(ActionBase):
             if lmode:
                 new_module_args['mode'] = lmode
 
+            if delta_sent:
+                new_module_args['_delta_basis'] = dest_file
+
             module_return = self._execute_module(module_name='copy', module_args=new_module_args, task_vars=task_vars)
 
+            if delta_sent and module_return.get('failed') and \
+                    module_return.get('msg', '').startswith(('Copied file does not match', 'Failed to apply the delta')):
+                # dest changed since its blocks were checksummed, send all of the file
+                display.vvv("Sending all of %s, its delta could not be applied: %s" % (source_rel, module_return['msg']))
+                remote_path = self._transfer_file(source_full, tmp_src)
+                self._fixup_perms2((self._connection._shell.tmpdir, remote_path))
+                del new_module_args['_delta_basis']
+                module_return = self._execute_module(module_name='copy', module_args=new_module_args, task_vars=task_vars)
+
+            # We have copied the file remotely and no longer require our content_tempfile
+            self._remove_tempfile_if_content_defined(content, content_tempfile)
+            self._loader.cleanup_tmp_file(source_full)
+
         else:
             # no need to transfer the file, already correct hash, but still need to call
             # the file module in case we want to change attributes
@@ -376,6 +432,234 @@ class ActionModule(ActionBase):
         result.update(module_return)
         return result
 
+    def _transfer_delta(self, source_full, block_checksums, block_size, tmp_src):
+        '''
+        Transfers a delta of source_full against the remote file with the
+        given block checksums, returning None if it is no smaller than the file.
+        '''
+        fd, delta_tempfile = tempfile.mkstemp(dir=C.DEFAULT_LOCAL_TMP)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write_delta(source_full, block_checksums, block_size, f)
+            if os.path.getsize(delta_tempfile) >= os.path.getsize(source_full):
+                return None
+            return self._transfer_file(delta_tempfile, tmp_src)
+        finally:
+            os.remove(delta_tempfile)
+
+    def _can_copy_in_bulk(self):
+        ''' Determines if a directory can be copied with COPY_BULK_TRANSFER '''
+        if not C.COPY_BULK_TRANSFER or self._play_context.diff:
+            return False
+
+        for option in ('raw', 'validate', 'backup'):
+            if boolean(self._task.args.get(option, False), strict=False):
+                return False
+
+        for option in NO_BULK_ATTRIBUTE_ARGS:
+            if self._task.args.get(option, None) is not None:
+                return False
+
+        # modes are set on the archive members, so symbolic ones can not be used
+        mode = self._task.args.get('mode', None)
+        if mode not in (None, 'preserve') and _octal_mode(mode) is None:
+            return False
+        directory_mode = self._task.args.get('directory_mode', None)
+        return directory_mode is None or _octal_mode(directory_mode) is not None
+
+    def _build_bulk_archive(self, files, directories, symlinks):
+        ''' Creates a local tar archive of the files, directories and symlinks to send in bulk '''
+        mode = _octal_mode(self._task.args.get('mode', None))
+        directory_mode = _octal_mode(self._task.args.get('directory_mode', None))
+
+        fd, archive = tempfile.mkstemp(dir=C.DEFAULT_LOCAL_TMP, suffix='.tar.gz')
+        os.close(fd)
+        try:
+            tar = tarfile.open(archive, 'w:gz')
+            try:
+                # members are owned by root so that extracting them as root
+                # gives files owned by the remote user, as copying them would
+                for source_full, source_rel in directories:
+                    info = tarfile.TarInfo(source_rel)
+                    info.type = tarfile.DIRTYPE
+                    st = os.stat(source_full)
+                    info.mode = stat.S_IMODE(st.st_mode) if directory_mode is None else directory_mode
+                    info.mtime = st.st_mtime
+                    info.uname = info.gname = 'root'
+                    tar.addfile(info)
+
+                for source_full, source_rel in files:
+                    info = tarfile.TarInfo(source_rel)
+                    st = os.stat(source_full)
+                    info.size = st.st_size
+                    info.mode = stat.S_IMODE(st.st_mode) if mode is None else mode
+                    info.mtime = st.st_mtime
+                    info.uname = info.gname = 'root'
+                    with open(source_full, 'rb') as f:
+                        tar.addfile(info, f)
+
+                for target_path, source_rel in symlinks:
+                    info = tarfile.TarInfo(source_rel)
+                    info.type = tarfile.SYMTYPE
+                    info.linkname = target_path
+                    info.mode = 0o777
+                    info.mtime = time.time()
+                    info.uname = info.gname = 'root'
+                    tar.addfile(info)
+            finally:
+                tar.close()
+        except Exception:
+            os.remove(archive)
+            raise
+
+        return archive
+
+    def _bulk_attributes_differ(self, remote_stat, mode):
+        '''
+        Tells if the mode, owner or group of a path found at dest by find
+        differ from those the task sets, mode being None when it sets none.
+        '''
+        if mode is not None and remote_stat.get('mode') != '%04o' % mode:
+            return True
+
+        for (option, name_key, id_key) in (('owner', 'pw_name', 'uid'), ('group', 'gr_name', 'gid')):
+            wanted = self._task.args.get(option, None)
+            if wanted is not None and to_text(wanted) not in (remote_stat.get(name_key), to_text(remote_stat.get(id_key))):
+                return True
+        return False
+
+    def _copy_in_bulk(self, source_files, dest, task_vars):
+        '''
+        Copies a directory with one remote find for the checksums of the files
+        already at dest and one archive of those which differ, extracted by
+        unarchive, instead of stat and copy module runs for every file.
+
+        The files and directories at dest whose mode, owner or group differ
+        from those of the task are sent again, so that unarchive sets them.
+
+        Returns None when the target can not extract the archive, so that the
+        files are copied one at a time instead.
+        '''
+        decrypt = boolean(self._task.args.get('decrypt', True), strict=False)
+        force = boolean(self._task.args.get('force', 'yes'), strict=False)
+        mode = self._task.args.get('mode', None)
+        directory_mode = _octal_mode(self._task.args.get('directory_mode', None))
+
+        # only the directories being copied to are looked at, not recursively,
+        # and only for the names of the files being copied, so that nothing
+        # else at dest is walked or checksummed
+        remote_paths = [dest] + [os.path.join(dest, source_rel) for source_full, source_rel in source_files['directories']]
+        file_names = set(os.path.basename(source_rel) for source_full, source_rel in source_files['files'])
+        find_args = dict(paths=remote_paths, recurse=False, hidden=True, file_type='file', get_checksum=force,
+                         patterns=['(?:%s)$' % '|'.join(re.escape(name) for name in sorted(file_names))], use_regex=True)
+        finds = [('find', find_args)]
+
+        # the directories already at dest are only looked at when the task
+        # sets attributes for them
+        dir_names = set(os.path.basename(source_rel) for source_full, source_rel in source_files['directories'])
+        check_dirs = bool(dir_names) and any(self._task.args.get(option, None) is not None for option in ('directory_mode', 'owner', 'group'))
+        if check_dirs:
+            dir_find_args = dict(find_args, file_type='directory', get_checksum=False,
+                                 patterns=['(?:%s)$' % '|'.join(re.escape(name) for name in sorted(dir_names))])
+            finds.append(('find', dir_find_args))
+            find_returns = self._execute_module_batch(finds, task_vars=task_vars)
+        else:
+            find_returns = [self._execute_module(module_name='find', module_args=find_args, task_vars=task_vars)]
+
+        for find_return in find_returns:
+            if find_return.get('failed'):
+                return find_return
+        find_return = find_returns[0]
+
+        remote_files = {}
+        for remote_file in find_return['files']:
+            remote_files[os.path.relpath(remote_file['path'], dest)] = remote_file
+
+        # directories find did not report are sent again
+        remote_dir_stats = {}
+        for remote_dir in (find_returns[1]['files'] if len(find_returns) > 1 else []):
+            remote_dir_stats[os.path.relpath(remote_dir['path'], dest)] = remote_dir
+
+        # find reports the paths which are not directories, the others exist,
+        # including the empty ones
+        skipped_paths = set(line.split(' was skipped ', 1)[0] for line in find_return.get('msg', '').splitlines())
+        remote_dirs = set()
+        if dest not in skipped_paths:
+            remote_dirs.update(source_rel for source_full, source_rel in source_files['directories']
+                               if os.path.join(dest, source_rel) not in skipped_paths)
+        else:
+            if self._play_context.check_mode:
+                return dict(changed=True)
+
+            new_module_args = _create_remote_file_args(self._task.args)
+            new_module_args['path'] = dest
+            new_module_args['state'] = 'directory'
+            new_module_args['mode'] = self._task.args.get('directory_mode', None)
+            new_module_args['recurse'] = False
+            new_module_args.pop('src', None)
+            module_return = self._execute_module(module_name='file', module_args=new_module_args, task_vars=task_vars)
+            if module_return.get('failed'):
+                return module_return
+
+        real_files = []
+        changed_files = []
+        try:
+            for source_full, source_rel in source_files['files']:
+                remote_file = remote_files.get(source_rel)
+                if not force and remote_file is not None:
+                    continue
+
+                try:
+                    real_file = self._loader.get_real_file(source_full, decrypt=decrypt)
+                except AnsibleFileNotFound as e:
+                    return dict(failed=True, msg="could not find src=%s, %s" % (source_full, to_text(e)))
+                real_files.append(real_file)
+
+                if mode == 'preserve':
+                    file_mode = stat.S_IMODE(os.stat(source_full).st_mode)
+                else:
+                    file_mode = _octal_mode(mode)
+
+                if remote_file is None or checksum(real_file) != remote_file.get('checksum') or \
+                        self._bulk_attributes_differ(remote_file, file_mode):
+                    changed_files.append((real_file, source_rel))
+
+            changed_dirs = [(source_full, source_rel) for source_full, source_rel in source_files['directories']
+                            if source_rel not in remote_dirs or
+                            check_dirs and self._bulk_attributes_differ(remote_dir_stats.get(source_rel, {}), directory_mode)]
+
+            # unarchive does not support check mode with tar, symlinks are
+            # then left to the file module
+            if self._play_context.check_mode:
+                return dict(changed=bool(changed_files or changed_dirs))
+
+            if not (changed_files or changed_dirs or source_files['symlinks']):
+                return dict(changed=False)
+
+            archive = self._build_bulk_archive(changed_files, changed_dirs, source_files['symlinks'])
+        finally:
+            for real_file in real_files:
+                self._loader.cleanup_tmp_file(real_file)
+
+        try:
+            tmp_src = self._connection._shell.join_path(self._connection._shell.tmpdir, 'source.tar.gz')
+            remote_path = self._transfer_file(archive, tmp_src)
+        finally:
+            os.remove(archive)
+        self._fixup_perms2((self._connection._shell.tmpdir, remote_path))
+
+        new_module_args = dict((k, v) for k, v in self._task.args.items() if k in BULK_ATTRIBUTE_ARGS)
+        new_module_args.update(dict(src=tmp_src, dest=dest, remote_src=True))
+        module_return = self._execute_module(module_name='unarchive', module_args=new_module_args, task_vars=task_vars)
+
+        if module_return.get('failed') and 'Failed to find handler' in module_return.get('msg', ''):
+            display.vvv("Copying %s one file at a time, the target can not extract it: %s" % (dest, module_return['msg']))
+            return None
+
+        if module_return.get('failed'):
+            return module_return
+        return dict(changed=module_return.get('changed', False) or bool(changed_files))
+
     def _create_content_tempfile(self, content):
         ''' Create a tempfile containing defined content '''
         fd, content_tempfile = tempfile.mkstemp(dir=C.DEFAULT_LOCAL_TMP)
@@ -471,7 +755,8 @@ class ActionModule(ActionBase):
         source_files = {'files': [], 'directories': [], 'symlinks': []}
 
         # If source is a directory populate our list else source is a file and translate it to a tuple.
-        if os.path.isdir(to_bytes(source, errors='surrogate_or_strict')):
+        source_is_dir = os.path.isdir(to_bytes(source, errors='surrogate_or_strict'))
+        if source_is_dir:
             # Get a list of the files we want to replicate on the remote side
             source_files = _walk_dirs(source, local_follow=local_follow,
                                       trailing_slash_detector=self._connection._shell.path_has_trailing_slash)
@@ -496,6 +781,18 @@ class ActionModule(ActionBase):
         # expand any user home dir specifier
         dest = self._remote_expand_user(dest)
 
+        if source_is_dir and self._can_copy_in_bulk():
+            module_return = self._copy_in_bulk(source_files, dest, task_vars)
+            if module_return is not None:
+                if module_return.get('failed'):
+                    result.update(module_return)
+                    return self._ensure_invocation(result)
+
+                module_executed = True
+                changed = module_return['changed']
+                symlinks = source_files['symlinks'] if self._play_context.check_mode else []
+                source_files = {'files': [], 'directories': [], 'symlinks': symlinks}
+
         implicit_directories = set()
         for source_full, source_rel in source_files['files']:
             # copy files over.  This happens first as directories that have
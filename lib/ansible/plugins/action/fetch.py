@@ -19,9 +19,12 @@ __metaclass__ = type
 
 import os
 import base64
+import binascii
+from hashlib import sha1
 
+from ansible import constants as C
 from ansible.errors import AnsibleError
-from ansible.module_utils._text import to_bytes
+from ansible.module_utils._text import to_bytes, to_native
 from ansible.module_utils.six import string_types
 from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.plugins.action import ActionBase
@@ -37,6 +40,35 @@ except ImportError:
 
 class ActionModule(ActionBase):
 
+    def _fetch_chunks(self, source, dest):
+        '''
+        Streams source to dest with commands run with become, a chunk at a
+        time, returning the checksum of the fetched data.
+        '''
+        chunk_size = C.FETCH_CHUNK_SIZE
+        hasher = sha1()
+        offset = 0
+        try:
+            with open(to_bytes(dest, errors='surrogate_or_strict'), 'wb') as f:
+                while True:
+                    cmd = self._connection._shell.read_chunk(source, offset, chunk_size)
+                    res = self._low_level_execute_command(cmd)
+                    if res['rc'] != 0:
+                        raise AnsibleError("Failed to fetch the file, reading it at offset %d returned %d: %s" % (offset, res['rc'], res['stderr']))
+                    try:
+                        data = base64.b64decode(res['stdout'])
+                    except (TypeError, binascii.Error) as e:
+                        raise AnsibleError("Failed to fetch the file, reading it at offset %d returned invalid data: %s" % (offset, to_native(e)))
+                    f.write(data)
+                    hasher.update(data)
+                    offset += len(data)
+                    # head only returns less than asked for at the end of the file
+                    if len(data) < chunk_size:
+                        break
+        except (IOError, OSError) as e:
+            raise AnsibleError("Failed to fetch the file: %s" % e)
+        return hasher.hexdigest()
+
     def run(self, tmp=None, task_vars=None):
         ''' handler for fetch operations '''
         if task_vars is None:
@@ -83,8 +115,13 @@ class ActionModule(ActionBase):
             source = self._connection._shell.join_path(source)
             source = self._remote_expand_user(source)
 
+            # with become, files are streamed in chunks by commands run with
+            # become when FETCH_CHUNK_SIZE is set, or else slurped
+            stream = (self._play_context.become and C.FETCH_CHUNK_SIZE > 0 and
+                      self._connection._shell.SHELL_FAMILY != 'powershell')
+
             remote_checksum = None
-            if not self._play_context.become:
+            if not self._play_context.become or stream:
                 # calculate checksum for the remote file, don't bother if using become as slurp will be used
                 # Force remote_checksum to follow symlinks because fetch always follows symlinks
                 remote_checksum = self._remote_checksum(source, all_vars=task_vars, follow=True)
@@ -180,16 +217,19 @@ class ActionModule(ActionBase):
                 makedirs_safe(os.path.dirname(dest))
 
                 # fetch the file and check for changes
-                if remote_data is None:
-                    self._connection.fetch_file(source, dest)
+                if stream and remote_data is None:
+                    new_checksum = self._fetch_chunks(source, dest)
                 else:
-                    try:
-                        f = open(to_bytes(dest, errors='surrogate_or_strict'), 'wb')
-                        f.write(remote_data)
-                        f.close()
-                    except (IOError, OSError) as e:
-                        raise AnsibleError("Failed to fetch the file: %s" % e)
-                new_checksum = secure_hash(dest)
+                    if remote_data is None:
+                        self._connection.fetch_file(source, dest)
+                    else:
+                        try:
+                            f = open(to_bytes(dest, errors='surrogate_or_strict'), 'wb')
+                            f.write(remote_data)
+                            f.close()
+                        except (IOError, OSError) as e:
+                            raise AnsibleError("Failed to fetch the file: %s" % e)
+                    new_checksum = secure_hash(dest)
                 # For backwards compatibility. We'll return None on FIPS enabled systems
                 try:
                     new_md5 = md5(dest)
@@ -55,3 +55,32 @@ class ActionModule(ActionBase):
             self._remove_tmp_path(self._connection._shell.tmpdir)
 
         return result
+
+    def run_batch(self, tasks, task_vars=None):
+        '''
+        Runs this task's module and then those of the given tasks on the
+        target in a single remote command.  Returns the result of this task
+        followed by those of the tasks which ran, see TASK_BATCH_SIZE.
+        '''
+
+        self._supports_check_mode = True
+        self._supports_async = True
+
+        result = super(ActionModule, self).run(task_vars=task_vars)
+        if result.get('skipped'):
+            return [result]
+
+        if result.get('invocation', {}).get('module_args'):
+            del result['invocation']['module_args']
+
+        modules = [(self._task.action, self._task.args)] + [(task.action, task.args) for task in tasks]
+        results = self._execute_module_batch(modules, task_vars=task_vars)
+        results[0] = merge_hash(result, results[0])
+
+        for ((module_name, module_args), module_result) in zip(modules, results):
+            if module_name == 'setup':
+                module_result['_ansible_verbose_override'] = True
+
+        self._remove_tmp_path(self._connection._shell.tmpdir)
+
+        return results
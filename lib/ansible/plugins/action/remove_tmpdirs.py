@@ -0,0 +1,28 @@
+# Copyright: (c) 2018, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.plugins.action import ActionBase
+
+
+class ActionModule(ActionBase):
+    '''
+    Removes the tmpdirs kept on a host for the length of a play, queued by the
+    strategy at the end of the play with REMOTE_TMP_PER_PLAY.
+    '''
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        # the tmpdirs were made by this action's remote user, without become
+        self._cleanup_remote_tmp = True
+        for path in self._task.args.get('paths', []):
+            self._remove_tmp_path(path)
+
+        return result
@@ -135,6 +135,58 @@ class CliconfBase(AnsiblePlugin):
 
         return resp
 
+    def send_command_batch(self, commands, check_rc=True):
+        """Executes a list of commands over the device connection
+
+        The commands which expect no prompt are sent to the device together,
+        without waiting for the prompt after each of them, the others one at a
+        time with :meth:`send_command`. The device has then read the commands
+        after one that fails and still runs them, the error is only raised
+        once their output has been read.
+
+        :param commands: The list of commands to send, each a dict of the
+                         arguments of :meth:`send_command`
+        :param check_rc: Bool value to raise the error of a failed command
+                         rather than returning it as its output
+
+        :returns: The list of outputs from the device for the commands
+        """
+        responses = list()
+        batch = list()
+
+        def send_batch():
+            if len(batch) == 1:
+                responses.append(self._send_checked({'command': batch[0]}, check_rc))
+            elif batch:
+                resp = self._connection.send_batch(batch, check_rc=check_rc)
+                for command, out in zip(batch, resp):
+                    if not self.response_logging:
+                        self.history.append(('*****', '*****'))
+                    else:
+                        self.history.append((command, out))
+                responses.extend(resp)
+            del batch[:]
+
+        for cmd in commands:
+            if not isinstance(cmd, dict):
+                cmd = {'command': cmd}
+            if any(cmd.get(key) for key in ('prompt', 'answer', 'sendonly', 'prompt_retry_check')) or not cmd.get('newline', True):
+                send_batch()
+                responses.append(self._send_checked(cmd, check_rc))
+            else:
+                batch.append(to_bytes(cmd['command']))
+        send_batch()
+
+        return responses
+
+    def _send_checked(self, cmd, check_rc):
+        try:
+            return self.send_command(**cmd)
+        except AnsibleConnectionFailure as e:
+            if check_rc:
+                raise
+            return getattr(e, 'err', e)
+
     def get_base_rpc(self):
         """Returns list of base rpc method supported by remote device"""
         return self.__rpc__
@@ -396,3 +448,17 @@ class CliconfBase(AnsiblePlugin):
         :return: List of returned response
         """
         pass
+
+    def run_commands_batch(self, commands=None, check_rc=True):
+        """
+        Execute a list of commands on remote host like :meth:`run_commands`, sending the commands
+        which expect no prompt to the device together rather than waiting for its prompt after
+        each of them.  The commands after one that fails are still run by the device, so only
+        commands which can safely run regardless of the ones before them should be batched.
+        Plugins which do not implement it run the commands with :meth:`run_commands`.
+        :param commands: The list of command that needs to be executed on remote host, as for
+                :meth:`run_commands`
+        :param check_rc: Boolean flag to check if returned response should be checked for error or not.
+        :return: List of returned response
+        """
+        return self.run_commands(commands=commands, check_rc=check_rc)
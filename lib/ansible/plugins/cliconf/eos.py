@@ -223,6 +223,32 @@ class Cliconf(CliconfBase):
                 responses.append(out)
         return responses
 
+    def run_commands_batch(self, commands=None, check_rc=True):
+        if commands is None:
+            raise ValueError("'commands' value is required")
+
+        cmds = list()
+        for cmd in to_list(commands):
+            if not isinstance(cmd, collections.Mapping):
+                cmd = {'command': cmd}
+
+            output = cmd.pop('output', None)
+            if output:
+                cmd['command'] = self._get_command_with_output(cmd['command'], output)
+
+            cmds.append(cmd)
+
+        responses = list()
+        for out in self.send_command_batch(cmds, check_rc=check_rc):
+            if out is not None:
+                try:
+                    out = json.loads(out)
+                except ValueError:
+                    out = to_text(out, errors='surrogate_or_strict').strip()
+
+                responses.append(out)
+        return responses
+
     def get_diff(self, candidate=None, running=None, match='line', diff_ignore_lines=None, path=None, replace='line'):
         diff = {}
         device_operations = self.get_device_operations()
@@ -314,7 +340,7 @@ class Cliconf(CliconfBase):
 
     def get_capabilities(self):
         result = {}
-        result['rpc'] = self.get_base_rpc()
+        result['rpc'] = self.get_base_rpc() + ['run_commands_batch']
         result['device_info'] = self.get_device_info()
         result['network_api'] = self.network_api
         result['device_info'] = self.get_device_info()
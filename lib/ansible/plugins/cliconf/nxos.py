@@ -123,7 +123,7 @@ class Cliconf(CliconfBase):
 
     def get_capabilities(self):
         result = {}
-        result['rpc'] = self.get_base_rpc()
+        result['rpc'] = self.get_base_rpc() + ['run_commands_batch']
         result['device_info'] = self.get_device_info()
         if isinstance(self._connection, NetworkCli):
             result['network_api'] = 'cliconf'
@@ -164,3 +164,35 @@ class Cliconf(CliconfBase):
 
             responses.append(out)
         return responses
+
+    def run_commands_batch(self, commands, check_rc=True):
+        """Run list of commands on remote device without waiting for the
+        prompt after each of them and return results
+        """
+        if not isinstance(self._connection, NetworkCli):
+            return self.run_commands(commands, check_rc)
+
+        cmds = list()
+        for item in to_list(commands):
+            if item['output'] == 'json' and not item['command'].endswith('| json'):
+                cmd = '%s | json' % item['command']
+            elif item['output'] == 'text' and item['command'].endswith('| json'):
+                cmd = item['command'].rsplit('|', 1)[0]
+            else:
+                cmd = item['command']
+            cmds.append(cmd)
+
+        responses = list()
+        for cmd, out in zip(cmds, self.send_command_batch(cmds, check_rc=check_rc)):
+            try:
+                out = to_text(out, errors='surrogate_or_strict').strip()
+            except UnicodeError:
+                raise ConnectionError(msg=u'Failed to decode output from %s: %s' % (cmd, to_text(out)))
+
+            try:
+                out = json.loads(out)
+            except ValueError:
+                pass
+
+            responses.append(out)
+        return responses
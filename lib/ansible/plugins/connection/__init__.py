@@ -61,6 +61,10 @@ class ConnectionBase(AnsiblePlugin):
     supports_persistence = False
     force_persistence = False
 
+    # whether a pool worker may keep the connection open for the later tasks
+    # on the same host, see WORKER_POOL_HOST_AFFINITY
+    reusable_across_tasks = False
+
     default_user = None
 
     def __init__(self, play_context, new_stdin, shell=None, *args, **kwargs):
@@ -389,6 +389,95 @@ class Connection(NetworkConnectionBase):
             display.vvvv(traceback.format_exc(), host=self._play_context.remote_addr)
             raise AnsibleConnectionFailure("timeout trying to send command: %s" % command.strip())
 
+    def send_batch(self, commands, check_rc=True):
+        '''
+        Sends all the commands to the device in the opened shell at once,
+        rather than waiting for the prompt after each of them, and returns
+        their responses in the same order.  If check_rc is False, the output
+        of a command which failed is returned in place of its response,
+        otherwise the first one is raised once all the output was received.
+        '''
+        try:
+            self._history.extend(commands)
+            self._ssh_shell.sendall(b''.join(b'%s\r' % command for command in commands))
+            responses = self._receive_batch(commands)
+        except (socket.timeout, AttributeError):
+            display.vvvv(traceback.format_exc(), host=self._play_context.remote_addr)
+            raise AnsibleConnectionFailure("timeout trying to send commands: %s" % ', '.join(to_text(c.strip()) for c in commands))
+
+        results = []
+        for (response, errored) in responses:
+            if errored and check_rc:
+                raise AnsibleConnectionFailure(errored)
+            results.append(to_text(errored or response, errors='surrogate_or_strict'))
+        return results
+
+    def _receive_batch(self, commands):
+        '''
+        Splits the output of the commands sent at once by send_batch.  The
+        device prints its prompt when done with a command and then echoes the
+        next one it reads, so the output of a command ends at the line made of
+        a prompt followed by the next command, and the last one at the prompt.
+
+        :returns: a list of (response, errored) tuples, errored being the
+            output of the command if it matched an error pattern of the terminal
+        '''
+        recv = []
+        responses = []
+        lines = []
+        partial = b''
+
+        while len(responses) < len(commands):
+            data = self._ssh_shell.recv(4096)
+
+            # when a channel stream is closed, received data will be empty
+            if not data:
+                raise AnsibleConnectionFailure('the shell was closed while receiving the output of: %s' % commands[len(responses)].strip())
+
+            recv.append(data)
+            split = (partial + data).split(b'\n')
+            partial = split.pop()
+
+            for line in split:
+                index = len(responses)
+                if index + 1 < len(commands) and self._is_prompt(line, commands[index + 1]):
+                    responses.append(self._batch_response(lines, commands[index]))
+                    lines = []
+                lines.append(line)
+
+            if len(responses) + 1 == len(commands) and self._is_prompt(partial):
+                responses.append(self._batch_response(lines + [partial], commands[-1]))
+
+        self._last_response = b''.join(recv)
+        return responses
+
+    def _is_prompt(self, line, command=None):
+        '''
+        Returns True if line is a prompt, followed by the echo of command if
+        it is given, and keeps the prompt found as the matched one
+        '''
+        line = self._strip(line).rstrip(b'\r')
+        if command is not None:
+            command = command.strip()
+            if not command or not line.endswith(command):
+                return False
+            line = line[:-len(command)]
+
+        for regex in self._terminal.terminal_stdout_re:
+            match = regex.search(line)
+            if match:
+                self._matched_pattern = regex.pattern
+                self._matched_prompt = match.group()
+                return True
+        return False
+
+    def _batch_response(self, lines, command):
+        resp = self._strip(b'\n'.join(line.rstrip(b'\r') for line in lines))
+        for regex in self._terminal.terminal_stderr_re:
+            if regex.search(resp):
+                return (None, resp)
+        return (self._sanitize(resp, command), None)
+
     def _strip(self, data):
         '''
         Removes ANSI codes from device response
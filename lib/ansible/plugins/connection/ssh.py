@@ -759,8 +759,11 @@ class Connection(ConnectionBase):
         # Output is accumulated into tmp_*, complete lines are extracted into
         # an array, then checked and removed or copied to stdout or stderr. We
         # set any flags based on examining the output in self._flags.
+        # The output is kept as lists of chunks, joined once the process has
+        # exited, so that large outputs are not copied again for every chunk.
 
-        b_stdout = b_stderr = b''
+        b_stdout_chunks = []
+        b_stderr_chunks = []
         b_tmp_stdout = b_tmp_stderr = b''
 
         self._flags = dict(
@@ -803,7 +806,7 @@ class Connection(ConnectionBase):
                         if poll is not None:
                             break
                         self._terminate_process(p)
-                        raise AnsibleError('Timeout (%ds) waiting for privilege escalation prompt: %s' % (timeout, to_native(b_stdout)))
+                        raise AnsibleError('Timeout (%ds) waiting for privilege escalation prompt: %s' % (timeout, to_native(b''.join(b_stdout_chunks))))
 
                 # Read whatever output is available on stdout and stderr, and stop
                 # listening to the pipe if it's been closed.
@@ -823,14 +826,16 @@ class Connection(ConnectionBase):
                             # not going to arrive until the persisted connection closes.
                             timeout = 1
                         b_tmp_stdout += b_chunk
-                        display.debug("stdout chunk (state=%s):\n>>>%s<<<\n" % (state, to_text(b_chunk)))
+                        if C.DEFAULT_DEBUG:
+                            display.debug("stdout chunk (state=%s):\n>>>%s<<<\n" % (state, to_text(b_chunk)))
                     elif key.fileobj == p.stderr:
                         b_chunk = p.stderr.read()
                         if b_chunk == b'':
                             # stderr has been closed, stop watching it
                             selector.unregister(p.stderr)
                         b_tmp_stderr += b_chunk
-                        display.debug("stderr chunk (state=%s):\n>>>%s<<<\n" % (state, to_text(b_chunk)))
+                        if C.DEFAULT_DEBUG:
+                            display.debug("stderr chunk (state=%s):\n>>>%s<<<\n" % (state, to_text(b_chunk)))
 
                 # We examine the output line-by-line until we have negotiated any
                 # privilege escalation prompt and subsequent success/error message.
@@ -839,16 +844,16 @@ class Connection(ConnectionBase):
                 if state < states.index('ready_to_send'):
                     if b_tmp_stdout:
                         b_output, b_unprocessed = self._examine_output('stdout', states[state], b_tmp_stdout, sudoable)
-                        b_stdout += b_output
+                        b_stdout_chunks.append(b_output)
                         b_tmp_stdout = b_unprocessed
 
                     if b_tmp_stderr:
                         b_output, b_unprocessed = self._examine_output('stderr', states[state], b_tmp_stderr, sudoable)
-                        b_stderr += b_output
+                        b_stderr_chunks.append(b_output)
                         b_tmp_stderr = b_unprocessed
                 else:
-                    b_stdout += b_tmp_stdout
-                    b_stderr += b_tmp_stderr
+                    b_stdout_chunks.append(b_tmp_stdout)
+                    b_stderr_chunks.append(b_tmp_stderr)
                     b_tmp_stdout = b_tmp_stderr = b''
 
                 # If we see a privilege escalation prompt, we send the password.
@@ -929,6 +934,9 @@ class Connection(ConnectionBase):
             # completely (see also issue #848)
             stdin.close()
 
+        b_stdout = b''.join(b_stdout_chunks)
+        b_stderr = b''.join(b_stderr_chunks)
+
         if C.HOST_KEY_CHECKING:
             if cmd[0] == b"sshpass" and p.returncode == 6:
                 raise AnsibleError('Using a SSH password instead of a key is not possible because Host Key checking is enabled and sshpass does not support '
@@ -168,6 +168,7 @@ class Connection(ConnectionBase):
     allow_executable = False
     has_pipelining = True
     allow_extras = True
+    reusable_across_tasks = True
 
     def __init__(self, *args, **kwargs):
 
@@ -119,10 +119,24 @@ class ShellBase(AnsiblePlugin):
             cmd += '-r '
         return cmd + "%s %s" % (path, self._SHELL_REDIRECT_ALLNULL)
 
+    def remove_contents(self, path):
+        ''' removes what is in the directory path, but not path itself '''
+        return 'rm -f -r %s/* %s' % (shlex_quote(path.rstrip('/')), self._SHELL_REDIRECT_ALLNULL)
+
     def exists(self, path):
         cmd = ['test', '-e', shlex_quote(path)]
         return ' '.join(cmd)
 
+    def read_chunk(self, path, offset, size):
+        '''
+        base64 encodes at most size bytes of path, starting at offset. The
+        command fails when tail does, as it would with pipefail, which not
+        every sh has. tail being stopped by SIGPIPE once head has read enough
+        is not a failure.
+        '''
+        return ('{ rc=$( { { tail -c +%d %s; echo $? >&4; } | head -c %d | base64 >&3; } 4>&1 ) && '
+                '{ [ "$rc" = 0 ] || [ "$(kill -l "$rc")" = PIPE ]; }; } 3>&1' % (offset + 1, shlex_quote(path), size))
+
     def mkdtemp(self, basefile=None, system=False, mode=0o700, tmpdir=None):
         if not basefile:
             basefile = 'ansible-tmp-%s-%s' % (time.time(), random.randint(0, 2**48))
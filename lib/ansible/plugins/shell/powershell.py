@@ -1502,6 +1502,9 @@ class ShellModule(ShellBase):
     def set_user_facl(self, paths, user, mode):
         raise NotImplementedError('set_user_facl is not implemented for Powershell')
 
+    def read_chunk(self, path, offset, size):
+        raise NotImplementedError('read_chunk is not implemented for Powershell')
+
     def remove(self, path, recurse=False):
         path = self._escape(self._unquote(path))
         if recurse:
@@ -1509,6 +1512,10 @@ class ShellModule(ShellBase):
         else:
             return self._encode_script('''Remove-Item "%s" -Force;''' % path)
 
+    def remove_contents(self, path):
+        path = self._escape(self._unquote(path.rstrip('\\')))
+        return self._encode_script('''Remove-Item "%s\\*" -Force -Recurse;''' % path)
+
     def mkdtemp(self, basefile=None, system=False, mode=None, tmpdir=None):
         # Windows does not have an equivalent for the system temp files, so
         # the param is ignored
@@ -29,10 +29,11 @@ import time
 
 from collections import deque
 from multiprocessing import Lock
+from multiprocessing.pool import ThreadPool
 from jinja2.exceptions import UndefinedError
 
 from ansible import constants as C
-from ansible.errors import AnsibleError, AnsibleParserError, AnsibleUndefinedVariable
+from ansible.errors import AnsibleConnectionFailure, AnsibleError, AnsibleParserError, AnsibleUndefinedVariable
 from ansible.executor import action_write_locks
 from ansible.executor.process.worker import WorkerProcess
 from ansible.executor.task_result import TaskResult
@@ -41,10 +42,12 @@ from ansible.module_utils.six.moves import queue as Queue
 from ansible.module_utils.six import iteritems, itervalues, string_types
 from ansible.module_utils._text import to_text
 from ansible.module_utils.connection import Connection, ConnectionError
+from ansible.playbook.block import Block
 from ansible.playbook.helpers import load_list_of_blocks
 from ansible.playbook.included_file import IncludedFile
 from ansible.playbook.task_include import TaskInclude
 from ansible.playbook.role_include import IncludeRole
+from ansible.playbook.task import Task
 from ansible.plugins.loader import action_loader, connection_loader, filter_loader, lookup_loader, module_loader, test_loader
 from ansible.template import Templar
 from ansible.utils.vars import combine_vars
@@ -93,6 +96,7 @@ def results_thread_main(strategy):
             else:
                 strategy._results_lock.acquire()
                 strategy._results.append(result)
+                strategy._results_lock.notify()
                 strategy._results_lock.release()
         except (IOError, EOFError):
             break
@@ -172,6 +176,7 @@ class StrategyBase:
         self._tqm = tqm
         self._inventory = tqm.get_inventory()
         self._workers = tqm.get_workers()
+        self._worker_pool = C.WORKER_POOL
         self._notified_handlers = tqm._notified_handlers
         self._listening_handlers = tqm._listening_handlers
         self._variable_manager = tqm.get_variable_manager()
@@ -186,6 +191,23 @@ class StrategyBase:
         # the task args/vars and play context info used to queue the task.
         self._queued_task_cache = {}
 
+        # the results of tasks which already ran on a host along with an
+        # earlier task, by (host.name, task._uuid), see TASK_BATCH_SIZE
+        self._batch_results = {}
+
+        # the tmpdirs kept on each host for the play by host.name, and the
+        # _uuid of the tasks removing them, see REMOTE_TMP_PER_PLAY
+        self._host_tmpdirs = {}
+        self._tmpdir_removal_tasks = set()
+
+        # the pool worker slot running each host's tasks by host.name,
+        # see WORKER_POOL_HOST_AFFINITY
+        self._host_slots = {}
+
+        # the state add_tqm_variables() last ran in and the lists it built,
+        # which are handed to every host until the state changes
+        self._tqm_variables = (None, None)
+
         # Backwards compat: self._display isn't really needed, just import the global display and use that.
         self._display = display
 
@@ -242,6 +264,8 @@ class StrategyBase:
         elif not handler_result:
             result |= handler_result
 
+        self._remove_host_tmpdirs(iterator, play_context)
+
         # now update with the hosts (if any) that failed or were
         # unreachable during the handler execution phase
         failed_hosts = set(failed_hosts).union(iterator.get_failed_hosts())
@@ -257,6 +281,113 @@ class StrategyBase:
         else:
             return self._tqm.RUN_OK
 
+    def prewarm_connections(self, iterator, play_context):
+        '''
+        Opens the ssh connections to the hosts left in the batch in parallel,
+        so the ControlPersist masters are up before the first task, see
+        ANSIBLE_SSH_PREWARM. Hosts which cannot be reached are marked
+        unreachable.
+        '''
+
+        block = Block(play=iterator._play)
+        task = Task(block=block)
+        task.action = 'ssh_prewarm'
+        task.name = 'Opening SSH connections'
+        task.set_loader(self._loader)
+
+        # the play context and options of the connections are templated here,
+        # only the connections are opened in threads
+        connections = []
+        for host in self.get_hosts_left(iterator):
+            all_vars = self._variable_manager.get_vars(play=iterator._play, host=host, task=task)
+            templar = Templar(loader=self._loader, variables=all_vars)
+            host_play_context = play_context.set_task_and_variable_override(task=task, variables=all_vars, templar=templar)
+            host_play_context.post_validate(templar=templar)
+            if not host_play_context.remote_addr:
+                host_play_context.remote_addr = host.address
+            if host_play_context.connection != 'ssh':
+                continue
+
+            connection = connection_loader.get('ssh', host_play_context, os.devnull)
+            host_play_context.set_options_from_plugin(connection)
+            option_vars = C.config.get_plugin_vars('connection', connection._load_name)
+            connection.set_options(var_options=dict((k, templar.template(all_vars[k])) for k in option_vars if k in all_vars))
+            connections.append((host, connection))
+
+        if not connections:
+            return
+
+        def _connect(job):
+            (host, connection) = job
+            start = time.time()
+            try:
+                connection.exec_command('exit 0', sudoable=False)
+                result = dict(changed=False)
+            except AnsibleConnectionFailure as e:
+                result = dict(unreachable=True, msg=to_text(e))
+            except AnsibleError as e:
+                # left for the first task on the host to report
+                display.debug("could not open a ssh connection to %s: %s" % (host.name, to_text(e)))
+                result = None
+            finally:
+                connection.close()
+            return (host, result, time.time() - start)
+
+        self._tqm.send_callback('v2_playbook_on_task_start', task, is_conditional=False)
+        pool = ThreadPool(min(C.ANSIBLE_SSH_PREWARM_FORKS, len(connections)))
+        try:
+            for (host, result, elapsed) in pool.imap_unordered(_connect, connections):
+                if result is None:
+                    continue
+
+                result['connect_time'] = round(elapsed, 3)
+                display.vv("ssh connection attempt took %.3fs" % elapsed, host=host.name)
+                if result.get('unreachable'):
+                    self._tqm._unreachable_hosts[host.name] = True
+                    iterator._play._removed_hosts.append(host.name)
+                    self._tqm._stats.increment('dark', host.name)
+                    self._tqm.send_callback('v2_runner_on_unreachable', TaskResult(host, task, result))
+                else:
+                    self._tqm.send_callback('v2_runner_on_ok', TaskResult(host, task, result))
+        finally:
+            pool.close()
+            pool.join()
+
+    def _remove_host_tmpdirs(self, iterator, play_context):
+        '''
+        Removes the tmpdirs the hosts kept for the play, see
+        REMOTE_TMP_PER_PLAY. The results of the tasks removing them are not
+        sent to callbacks.
+        '''
+
+        if not self._host_tmpdirs or self._tqm._terminated:
+            return
+
+        for host in self._inventory.get_hosts(iterator._play.hosts):
+            if host.name in self._tqm._unreachable_hosts:
+                continue
+
+            # the tmpdirs are removed as the user which made them
+            paths_by_user = {}
+            for ((transport, remote_user, system_tmp), path) in iteritems(self._host_tmpdirs.pop(host.name, {})):
+                paths_by_user.setdefault((transport, remote_user), []).append(path)
+
+            for ((transport, remote_user), paths) in iteritems(paths_by_user):
+                block = Block(play=iterator._play)
+                task = Task(block=block)
+                task.action = 'remove_tmpdirs'
+                task.args = dict(paths=paths)
+                task.connection = transport
+                task.remote_user = remote_user
+                task.set_loader(self._loader)
+                self._tmpdir_removal_tasks.add(task._uuid)
+
+                task_vars = self._variable_manager.get_vars(play=iterator._play, host=host, task=task)
+                self.add_tqm_variables(task_vars, play=iterator._play)
+                self._queue_task(host, task, task_vars, play_context)
+
+        self._wait_on_pending_results(iterator)
+
     def get_hosts_remaining(self, play):
         return [host for host in self._inventory.get_hosts(play.hosts)
                 if host.name not in self._tqm._failed_hosts and host.name not in self._tqm._unreachable_hosts]
@@ -269,14 +400,95 @@ class StrategyBase:
         Base class method to add extra variables/information to the list of task
         vars sent through the executor engine regarding the task queue manager state.
         '''
-        vars['ansible_current_hosts'] = [h.name for h in self.get_hosts_remaining(play)]
-        vars['ansible_failed_hosts'] = [h.name for h in self.get_failed_hosts(play)]
+        state = (play._uuid, self._inventory._hosts_version,
+                 frozenset(self._tqm._failed_hosts), frozenset(self._tqm._unreachable_hosts))
+        (cached_state, tqm_vars) = self._tqm_variables
+        if state != cached_state:
+            tqm_vars = dict(
+                ansible_current_hosts=[h.name for h in self.get_hosts_remaining(play)],
+                ansible_failed_hosts=[h.name for h in self.get_failed_hosts(play)],
+            )
+            self._tqm_variables = (state, tqm_vars)
+        vars.update(tqm_vars)
 
-    def _queue_task(self, host, task, task_vars, play_context):
-        ''' handles queueing the task up to be sent to a worker '''
+    def _can_batch_task(self, task, first_task, templar):
+        '''
+        Returns True if the task can run in the same remote command as
+        first_task, or when first_task is the task itself, if other tasks
+        can run along with it.
+        '''
+
+        if isinstance(task, TaskInclude) or task.action == 'meta' or task.action in action_loader:
+            return False
+
+        module_prefix = task.action.split('_')[0]
+        if module_prefix in C.NETWORK_GROUP_MODULES and module_prefix in action_loader:
+            return False
+
+        if task.loop or task.loop_with or task.until or task.failed_when or task.async_val or task.delegate_to or task.run_once or task.any_errors_fatal:
+            return False
+
+        if task is not first_task:
+            # the arguments of the first task are templated by its worker,
+            # the other tasks' are sent as they are
+            if task.when or task.vars or task.module_defaults or task._role is not first_task._role or self._has_templates(templar, task.args):
+                return False
+            for attr in ('connection', 'port', 'remote_user', 'become', 'become_method', 'become_user', 'become_flags', 'check_mode', 'diff',
+                         'environment', 'no_log'):
+                if getattr(task, attr) != getattr(first_task, attr):
+                    return False
+
+        return module_loader.find_plugin(task.action, mod_type='.py') is not None
+
+    def _has_templates(self, templar, data):
+        if isinstance(data, dict):
+            return any(self._has_templates(templar, k) or self._has_templates(templar, v) for (k, v) in iteritems(data))
+        elif isinstance(data, (list, tuple)):
+            return any(self._has_templates(templar, v) for v in data)
+        return templar._contains_vars(data)
+
+    def _get_task_batch(self, iterator, host, task):
+        '''
+        Returns the tasks the host runs after the given one which can be run
+        along with it in a single remote command, with TASK_BATCH_SIZE.
+        '''
+
+        batch = []
+        if C.TASK_BATCH_SIZE < 2 or self._step:
+            return batch
+
+        templar = Templar(loader=self._loader)
+        if not self._can_batch_task(task, task, templar):
+            return batch
+
+        # the host's state is already past the given task
+        state = iterator.get_host_state(host)
+        while len(batch) < C.TASK_BATCH_SIZE - 1:
+            (state, next_task) = iterator._get_next_task_from_state(state, host=host, peek=True)
+            if next_task is None or not self._can_batch_task(next_task, task, templar):
+                break
+            batch.append(next_task)
+
+        return batch
+
+    def _queue_task(self, host, task, task_vars, play_context, batch_tasks=None):
+        '''
+        handles queueing the task up to be sent to a worker. batch_tasks are
+        the tasks to run along with it, see _get_task_batch().
+        '''
 
         display.debug("entering _queue_task() for %s/%s" % (host.name, task.action))
 
+        # tasks which already ran with an earlier one are only handed their result
+        batch_result = self._batch_results.pop((host.name, task._uuid), None)
+        if batch_result is not None:
+            batch_tasks = None
+
+        # tmpdirs are reused by the host's later tasks until the end of the play
+        host_tmpdirs = None
+        if C.REMOTE_TMP_PER_PLAY and task._uuid not in self._tmpdir_removal_tasks:
+            host_tmpdirs = self._host_tmpdirs.get(host.name, {})
+
         # Add a write lock for tasks.
         # Maybe this should be added somewhere further up the call stack but
         # this is the earliest in the code where we have task (1) extracted
@@ -299,30 +511,56 @@ class StrategyBase:
             # way to share them with the forked processes
             shared_loader_obj = SharedPluginLoaderObj()
 
+            self._queued_task_cache[(host.name, task._uuid)] = {
+                'host': host,
+                'task': task,
+                'task_vars': task_vars,
+                'play_context': play_context
+            }
+
             queued = False
+            if self._worker_pool and C.WORKER_POOL_HOST_AFFINITY:
+                # the host's tasks all go to the same worker, which keeps its
+                # connection open between them
+                if host.name not in self._host_slots:
+                    self._host_slots[host.name] = len(self._host_slots) % len(self._workers)
+                slot = self._host_slots[host.name]
+                while not self._tqm.queue_pool_job(slot, host, task, task_vars, play_context, batch_tasks=batch_tasks,
+                                                   batch_result=batch_result, host_tmpdirs=host_tmpdirs):
+                    with self._results_lock:
+                        self._results_lock.wait(C.DEFAULT_INTERNAL_POLL_INTERVAL)
+                display.debug("worker is %d (out of %d available)" % (slot + 1, len(self._workers)))
+                queued = True
+
             starting_worker = self._cur_worker
-            while True:
-                (worker_prc, rslt_q) = self._workers[self._cur_worker]
-                if worker_prc is None or not worker_prc.is_alive():
-                    self._queued_task_cache[(host.name, task._uuid)] = {
-                        'host': host,
-                        'task': task,
-                        'task_vars': task_vars,
-                        'play_context': play_context
-                    }
-
-                    worker_prc = WorkerProcess(self._final_q, task_vars, host, task, play_context, self._loader, self._variable_manager, shared_loader_obj)
-                    self._workers[self._cur_worker][0] = worker_prc
-                    worker_prc.start()
+            while not queued:
+                if self._worker_pool:
+                    queued = self._tqm.queue_pool_job(self._cur_worker, host, task, task_vars, play_context, batch_tasks=batch_tasks,
+                                                      batch_result=batch_result, host_tmpdirs=host_tmpdirs)
+                else:
+                    (worker_prc, rslt_q) = self._workers[self._cur_worker]
+                    if worker_prc is None or not worker_prc.is_alive():
+                        worker_prc = WorkerProcess(self._final_q, task_vars, host, task, play_context, self._loader, self._variable_manager, shared_loader_obj,
+                                                   batch_tasks=batch_tasks, batch_result=batch_result, host_tmpdirs=host_tmpdirs)
+                        self._workers[self._cur_worker][0] = worker_prc
+                        worker_prc.start()
+                        queued = True
+
+                if queued:
                     display.debug("worker is %d (out of %d available)" % (self._cur_worker + 1, len(self._workers)))
-                    queued = True
                 self._cur_worker += 1
                 if self._cur_worker >= len(self._workers):
                     self._cur_worker = 0
                 if queued:
                     break
                 elif self._cur_worker == starting_worker:
-                    time.sleep(0.0001)
+                    if self._worker_pool:
+                        # pool workers free up as their results come in, so
+                        # wait for the results thread rather than spinning
+                        with self._results_lock:
+                            self._results_lock.wait(C.DEFAULT_INTERNAL_POLL_INTERVAL)
+                    else:
+                        time.sleep(0.0001)
 
             self._pending_results += 1
         except (EOFError, IOError, AssertionError) as e:
@@ -439,6 +677,19 @@ class StrategyBase:
             task_result._host = original_host
             task_result._task = original_task
 
+            for (task_uuid, batch_result) in iteritems(task_result._result.pop('_ansible_batch_results', {})):
+                self._batch_results[(original_host.name, task_uuid)] = batch_result
+
+            host_tmpdirs = task_result._result.pop('_ansible_host_tmpdirs', None)
+            if host_tmpdirs is not None:
+                self._host_tmpdirs[original_host.name] = host_tmpdirs
+
+            if found_task._uuid in self._tmpdir_removal_tasks:
+                if task_result.is_failed() or task_result.is_unreachable():
+                    display.warning("Failed to remove the temporary directories kept on %s: %s" % (original_host.name, task_result._result.get('msg')))
+                self._pending_results -= 1
+                continue
+
             # send callbacks for 'non final' results
             if '_ansible_retry' in task_result._result:
                 self._tqm.send_callback('v2_runner_retry', task_result)
@@ -705,6 +956,7 @@ class StrategyBase:
 
             # reconcile inventory, ensures inventory rules are followed
             self._inventory.reconcile_inventory()
+            self._variable_manager.mark_inventory_changed()
 
     def _add_group(self, host, result_item):
         '''
@@ -746,6 +998,7 @@ class StrategyBase:
 
         if changed:
             self._inventory.reconcile_inventory()
+            self._variable_manager.mark_inventory_changed()
 
         return changed
 
@@ -980,6 +1233,7 @@ class StrategyBase:
             if task.when:
                 self._cond_not_supported_warn(meta_action)
             self._inventory.refresh_inventory()
+            self._variable_manager.mark_inventory_changed()
             msg = "inventory successfully refreshed"
         elif meta_action == 'clear_facts':
             if _evaluate_conditional(target_host):
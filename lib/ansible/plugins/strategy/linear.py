@@ -307,7 +307,7 @@ class StrategyModule(StrategyBase):
                             display.debug("sending task start callback")
 
                         self._blocked_hosts[host.get_name()] = True
-                        self._queue_task(host, task, task_vars, play_context)
+                        self._queue_task(host, task, task_vars, play_context, batch_tasks=self._get_task_batch(iterator, host, task))
                         del task_vars
 
                     # if we're bypassing the host loop, break out now
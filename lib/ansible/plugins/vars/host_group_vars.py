@@ -53,10 +53,72 @@ from ansible.inventory.group import Group
 from ansible.utils.vars import combine_vars
 
 FOUND = {}
+# directory -> set of the names of its entries, listed once
+INDEX = {}
+# (basedir, subdir) -> real path of the subdir
+REALPATHS = {}
 
 
 class VarsModule(BaseVarsPlugin):
 
+    def _get_index(self, loader, opath, cache=True):
+        ''' lists the entries of a group_vars/host_vars directory, None if there is no such directory '''
+
+        if cache and opath in INDEX:
+            return INDEX[opath]
+
+        index = None
+        b_opath = to_bytes(opath)
+        # no need to do much if path does not exist for basedir
+        if os.path.exists(b_opath):
+            if os.path.isdir(b_opath):
+                self._display.debug("\tindexing dir %s" % opath)
+                index = set(loader.list_directory(opath))
+            else:
+                self._display.warning("Found %s that is not a directory, skipping: %s" % (os.path.basename(opath), opath))
+
+        INDEX[opath] = index
+        return index
+
+    def _find_entity_files(self, loader, opath, name, cache=True):
+        ''' returns the vars files for a host or group name, looking them up in the directory index '''
+
+        key = '%s.%s' % (name, opath)
+        if cache and key in FOUND:
+            return FOUND[key]
+
+        found_files = []
+        index = self._get_index(loader, opath, cache)
+        if index is not None:
+            # only look for the files if the directory has an entry for the
+            # name, names with a path separator point into subdirectories
+            # which are not indexed
+            candidates = [name]
+            for ext in C.YAML_FILENAME_EXTENSIONS:
+                if '.' in ext:
+                    candidates.append(name + ext)
+                elif ext:
+                    candidates.append('%s.%s' % (name, ext))
+
+            if os.path.sep in name or any(candidate in index for candidate in candidates):
+                found_files = loader.find_vars_files(opath, name)
+            FOUND[key] = found_files
+
+        return found_files
+
+    def get_vars_for_entities(self, loader, path, entities, cache=True):
+        '''
+        returns a dict with the vars of each of the entities, keyed by name,
+        which is the same as calling get_vars for each one of them
+        '''
+
+        super(VarsModule, self).get_vars(loader, path, entities)
+
+        data = {}
+        for entity in entities:
+            data[entity.name] = self._get_entity_vars(loader, entity, {}, cache)
+        return data
+
     def get_vars(self, loader, path, entities, cache=True):
         ''' parses the inventory file '''
 
@@ -67,38 +129,32 @@ class VarsModule(BaseVarsPlugin):
 
         data = {}
         for entity in entities:
-            if isinstance(entity, Host):
-                subdir = 'host_vars'
-            elif isinstance(entity, Group):
-                subdir = 'group_vars'
-            else:
-                raise AnsibleParserError("Supplied entity must be Host or Group, got %s instead" % (type(entity)))
-
-            # avoid 'chroot' type inventory hostnames /path/to/chroot
-            if not entity.name.startswith(os.path.sep):
-                try:
-                    found_files = []
-                    # load vars
-                    opath = os.path.realpath(os.path.join(self._basedir, subdir))
-                    key = '%s.%s' % (entity.name, opath)
-                    if cache and key in FOUND:
-                        found_files = FOUND[key]
-                    else:
-                        b_opath = to_bytes(opath)
-                        # no need to do much if path does not exist for basedir
-                        if os.path.exists(b_opath):
-                            if os.path.isdir(b_opath):
-                                self._display.debug("\tprocessing dir %s" % opath)
-                                found_files = loader.find_vars_files(opath, entity.name)
-                                FOUND[key] = found_files
-                            else:
-                                self._display.warning("Found %s that is not a directory, skipping: %s" % (subdir, opath))
-
-                    for found in found_files:
-                        new_data = loader.load_from_file(found, cache=True, unsafe=True)
-                        if new_data:  # ignore empty files
-                            data = combine_vars(data, new_data)
-
-                except Exception as e:
-                    raise AnsibleParserError(to_native(e))
+            data = self._get_entity_vars(loader, entity, data, cache)
+        return data
+
+    def _get_entity_vars(self, loader, entity, data, cache=True):
+        ''' combines the vars of the entity into data, the basedir must be set '''
+
+        if isinstance(entity, Host):
+            subdir = 'host_vars'
+        elif isinstance(entity, Group):
+            subdir = 'group_vars'
+        else:
+            raise AnsibleParserError("Supplied entity must be Host or Group, got %s instead" % (type(entity)))
+
+        # avoid 'chroot' type inventory hostnames /path/to/chroot
+        if not entity.name.startswith(os.path.sep):
+            try:
+                # load vars
+                key = (self._basedir, subdir)
+                if not cache or key not in REALPATHS:
+                    REALPATHS[key] = os.path.realpath(os.path.join(self._basedir, subdir))
+                opath = REALPATHS[key]
+                for found in self._find_entity_files(loader, opath, entity.name, cache):
+                    new_data = loader.load_from_file(found, cache=True, unsafe=True)
+                    if new_data:  # ignore empty files
+                        data = combine_vars(data, new_data)
+
+            except Exception as e:
+                raise AnsibleParserError(to_native(e))
         return data
@@ -27,7 +27,7 @@ import pwd
 import re
 import time
 
-from collections import Sequence, Mapping
+from collections import Sequence, Mapping, OrderedDict
 from functools import wraps
 from io import StringIO
 from numbers import Number
@@ -37,6 +37,12 @@ try:
 except ImportError:
     from sha import sha as sha1
 
+try:
+    RecursionError
+except NameError:
+    # Python 2 raises a RuntimeError when the recursion limit is exceeded
+    RecursionError = RuntimeError
+
 from jinja2.exceptions import TemplateSyntaxError, UndefinedError
 from jinja2.loaders import FileSystemLoader
 from jinja2.runtime import Context, StrictUndefined
@@ -68,6 +74,12 @@ NON_TEMPLATED_TYPES = (bool, Number)
 
 JINJA2_OVERRIDE = '#jinja2:'
 
+# a plain reference to a variable or to keys of a variable, such as foo.bar
+REFERENCE_REGEX = r'[_A-Za-z]\w*(?:\.[_A-Za-z]\w*)*'
+
+# names jinja2 does not read as variables
+JINJA2_KEYWORDS = frozenset(('and', 'or', 'not', 'in', 'is', 'if', 'else', 'true', 'false', 'none', 'True', 'False', 'None'))
+
 USE_JINJA2_NATIVE = False
 if C.DEFAULT_JINJA2_NATIVE:
     try:
@@ -238,6 +250,67 @@ class AnsibleContext(Context):
         return val
 
 
+class TemplateCache:
+    '''
+    A bounded cache of compiled template code, which drops the least recently
+    used templates first, shared by all the Templar instances of a process.
+    '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+
+    # the environment settings the compiled code depends on, which the
+    # template action and the template header overrides change
+    ENVIRONMENT_SETTINGS = ('block_start_string', 'block_end_string', 'variable_start_string', 'variable_end_string',
+                            'comment_start_string', 'comment_end_string', 'line_statement_prefix', 'line_comment_prefix',
+                            'trim_blocks', 'lstrip_blocks', 'newline_sequence', 'keep_trailing_newline', 'optimized', 'autoescape')
+
+    @classmethod
+    def make_key(cls, data, escape_backslashes, environment):
+        '''
+        Returns the key of a template, or None if it cannot be cached. The
+        settings and extensions of the environment are part of the key as
+        they change how the source is parsed.
+        '''
+        settings = tuple(getattr(environment, name, None) for name in cls.ENVIRONMENT_SETTINGS)
+        key = (data, escape_backslashes, settings, tuple(sorted(environment.extensions)))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key):
+        if key is None or not self.max_size:
+            return None
+
+        compiled = self._templates.pop(key, None)
+        if compiled is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._templates[key] = compiled
+        return compiled
+
+    def set(self, key, compiled):
+        if key is None or not self.max_size:
+            return
+
+        self._templates[key] = compiled
+        while len(self._templates) > self.max_size:
+            self._templates.popitem(last=False)
+
+    def clear(self):
+        self._templates.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        return dict(hits=self.hits, misses=self.misses, size=len(self._templates), max_size=self.max_size)
+
+
 class AnsibleEnvironment(Environment):
     '''
     Our custom environment, which simply allows us to override the class-level
@@ -252,6 +325,10 @@ class Templar:
     The main class for templating, with the main entry-point of template().
     '''
 
+    # the compiled code of the templates seen by this process, keyed by their
+    # source, see do_template()
+    template_cache = TemplateCache(C.TEMPLATE_CACHE_SIZE)
+
     def __init__(self, loader, shared_loader_obj=None, variables=None):
         variables = {} if variables is None else variables
 
@@ -293,6 +370,8 @@ class Templar:
         self.cur_context = None
 
         self.SINGLE_VAR = re.compile(r"^%s\s*(\w*)\s*%s$" % (self.environment.variable_start_string, self.environment.variable_end_string))
+        self._single_reference_regex = re.compile(r"^%s\s*(%s)\s*%s\Z" % (self.environment.variable_start_string, REFERENCE_REGEX,
+                                                                          self.environment.variable_end_string))
 
         self._clean_regex = re.compile(r'(?:%s|%s|%s|%s)' % (
             self.environment.variable_start_string,
@@ -465,6 +544,15 @@ class Templar:
                             elif resolved_val is None:
                                 return C.DEFAULT_NULL_REPRESENTATION
 
+                    # a reference to a string which would come out of jinja2 unchanged does not need it
+                    if not USE_JINJA2_NATIVE:
+                        only_one = self._single_reference_regex.match(variable)
+                        if only_one:
+                            resolved = self._resolve_reference(only_one.group(1))
+                            if resolved is not None and isinstance(resolved[1], text_type) and \
+                                    not resolved[1].startswith(("{", "[")) and resolved[1] not in ("True", "False"):
+                                return resolved[1]
+
                     # Using a cache in order to prevent template calls with already templated variables
                     sha1_hash = None
                     if cache:
@@ -587,6 +675,98 @@ class Templar:
                     return True
         return False
 
+    def compile_templates(self, data):
+        '''
+        Compiles the templates found in data into the template cache without
+        rendering them, so processes forked afterwards find them there.
+        Errors are ignored, they are reported when the templates are rendered.
+        '''
+
+        if not self.template_cache.max_size:
+            return
+
+        myenv = self.environment.overlay()
+        myenv.filters.update(self._get_filters(myenv.filters))
+        myenv.tests.update(self._get_tests())
+
+        pending = [data]
+        while pending:
+            data = pending.pop()
+            if isinstance(data, string_types):
+                if self._contains_vars(data) and not data.startswith(JINJA2_OVERRIDE):
+                    try:
+                        self._compile(myenv, data, True, self.template_cache.make_key(data, True, myenv))
+                    except Exception:
+                        pass
+            elif isinstance(data, (list, tuple)):
+                pending.extend(data)
+            elif isinstance(data, dict):
+                pending.extend(data.values())
+
+    def _compile(self, myenv, data, escape_backslashes, cache_key):
+        '''
+        Returns the source as given to jinja2 and the compiled code of a
+        template, from the template cache if it was compiled before.
+        '''
+
+        compiled = self.template_cache.get(cache_key)
+        if compiled is None:
+            if escape_backslashes:
+                # Allow users to specify backslashes in playbooks as "\\" instead of as "\\\\".
+                data = _escape_backslashes(data, myenv)
+            compiled = (data, myenv.compile(data))
+            self.template_cache.set(cache_key, compiled)
+        return compiled
+
+    def _resolve_reference(self, reference):
+        '''
+        Resolves a reference such as foo or foo.bar against the available
+        variables the way jinja2 would, without it. Returns a tuple of
+        (defined, value), or None when only jinja2 can tell, such as when the
+        variable still has to be templated.
+        '''
+
+        names = reference.split('.')
+        if names[0] in JINJA2_KEYWORDS:
+            return None
+
+        if names[0] not in self._available_variables:
+            if len(names) == 1 and names[0] not in self.environment.globals:
+                return (False, None)
+            return None
+
+        value = self._available_variables[names[0]]
+        if not self._is_plain(value):
+            return None
+
+        for name in names[1:]:
+            # jinja2 looks for an attribute first, then for a key
+            if not isinstance(value, dict) or hasattr(value, name):
+                return None
+            if name not in value:
+                if name == names[-1]:
+                    return (False, None)
+                return None
+            value = value[name]
+
+        return (True, value)
+
+    def _is_plain(self, data):
+        '''
+        returns True if the data would come out of templating unchanged and
+        is not marked unsafe, which jinja2 would carry over to the result
+        '''
+        if hasattr(data, '__UNSAFE__'):
+            return False
+        elif isinstance(data, string_types):
+            return not self._contains_vars(data)
+        elif isinstance(data, (list, tuple)):
+            return all(self._is_plain(v) for v in data)
+        elif isinstance(data, dict):
+            return all(self._is_plain(v) for v in data.values())
+        # mappings like hostvars are rebuilt as dicts
+        return not isinstance(data, Mapping)
+
     def _convert_bare_variable(self, variable, bare_deprecated):
         '''
         Wraps a bare string, which may have an attribute portion (ie. foo.bar)
@@ -700,6 +880,9 @@ class Templar:
             else:
                 myenv = self.environment.overlay(overrides)
 
+            # the header overrides are part of the source, so of the key
+            cache_key = self.template_cache.make_key(data, escape_backslashes, myenv)
+
             # Get jinja env overrides from template
             if hasattr(data, 'startswith') and data.startswith(JINJA2_OVERRIDE):
                 eol = data.find('\n')
@@ -714,19 +897,15 @@ class Templar:
             myenv.filters.update(self._get_filters(myenv.filters))
             myenv.tests.update(self._get_tests())
 
-            if escape_backslashes:
-                # Allow users to specify backslashes in playbooks as "\\" instead of as "\\\\".
-                data = _escape_backslashes(data, myenv)
-
             try:
-                t = myenv.from_string(data)
+                (data, code) = self._compile(myenv, data, escape_backslashes, cache_key)
+                t = myenv.template_class.from_code(myenv, code, myenv.make_globals(None), None)
             except TemplateSyntaxError as e:
                 raise AnsibleError("template error while templating string: %s. String: %s" % (to_native(e), to_native(data)))
-            except Exception as e:
-                if 'recursion' in to_native(e):
-                    raise AnsibleError("recursive loop detected in template string: %s" % to_native(data))
-                else:
-                    return data
+            except RecursionError:
+                raise AnsibleError("recursive loop detected in template string: %s" % to_native(data))
+            except Exception:
+                return data
 
             if disable_lookups:
                 t.globals['query'] = t.globals['q'] = t.globals['lookup'] = self._fail_lookup
@@ -753,6 +932,10 @@ class Templar:
                 else:
                     display.debug("failing because of a type error, template data is: %s" % to_native(data))
                     raise AnsibleError("Unexpected templating type error occurred on (%s): %s" % (to_native(data), to_native(te)))
+            except RecursionError:
+                # with the compiled template cached, recursive variables are
+                # caught rendering them rather than compiling them
+                raise AnsibleError("recursive loop detected in template string: %s" % to_native(data))
 
             if USE_JINJA2_NATIVE:
                 return res
@@ -96,10 +96,10 @@ class AnsibleJ2Vars(Mapping):
 
         variable = self._templar._available_variables[varname]
 
-        # HostVars is special, return it as-is, as is the special variable
-        # 'vars', which contains the vars structure
-        from ansible.vars.hostvars import HostVars
-        if isinstance(variable, dict) and varname == "vars" or isinstance(variable, HostVars) or hasattr(variable, '__UNSAFE__'):
+        # HostVars and the groups view are special, return them as-is, as is
+        # the special variable 'vars', which contains the vars structure
+        from ansible.vars.hostvars import HostVars, InventoryGroups
+        if isinstance(variable, dict) and varname == "vars" or isinstance(variable, (HostVars, InventoryGroups)) or hasattr(variable, '__UNSAFE__'):
             return variable
         else:
             value = None
@@ -108,7 +108,7 @@ class AnsibleJ2Vars(Mapping):
             except AnsibleUndefinedVariable:
                 raise
             except Exception as e:
-                msg = getattr(e, 'message') or to_native(e)
+                msg = getattr(e, 'message', None) or to_native(e)
                 raise AnsibleError("An unhandled exception occurred while templating '%s'. "
                                    "Error was a %s, original message: %s" % (to_native(variable), type(e), msg))
 
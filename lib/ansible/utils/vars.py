@@ -104,19 +104,76 @@ def merge_hash(a, b):
 
     # if b is empty the below unfolds quickly
     result = a.copy()
+    _merge_hash_into(result, b, {id(result): result})
+    return result
+
+
+def _merge_hash_into(result, b, owned):
+    """
+    Recursively merges hash b into result, which is modified in place.
 
-    # next, iterate over b keys and values
+    Nested hashes of result which are listed in owned were created by the
+    merge and are modified in place as well, any other nested hash which
+    needs to be merged into is copied first and the copy added to owned.
+    """
+
+    # iterate over b keys and values
     for k, v in iteritems(b):
-        # if there's already such key in a
+        # if there's already such key in result
         # and that key contains a MutableMapping
         if k in result and isinstance(result[k], MutableMapping) and isinstance(v, MutableMapping):
             # merge those dicts recursively
-            result[k] = merge_hash(result[k], v)
+            x = result[k]
+            if x == {} or x == v:
+                result[k] = v.copy()
+                owned[id(result[k])] = result[k]
+            elif id(x) in owned:
+                _merge_hash_into(x, v, owned)
+            else:
+                x = result[k] = x.copy()
+                owned[id(x)] = x
+                _merge_hash_into(x, v, owned)
         else:
             # otherwise, just copy the value from b to a
             result[k] = v
 
-    return result
+
+class VarsCombiner:
+    """
+    Combines several dictionaries of variables into one, giving the same
+    result as repeated calls to combine_vars() but without copying the
+    combined variables for every dictionary added.
+
+    Nested dictionaries are shared with the dictionaries they come from and
+    only copied when something has to be merged into them, so none of the
+    added dictionaries is ever modified.
+    """
+
+    def __init__(self, data=None):
+        self.vars = dict()
+        # the nested dicts created by merges, keyed by id, which can be
+        # modified in place. The values keep the ids from being reused.
+        self._owned = dict()
+        if data is not None:
+            self.combine(data)
+
+    def combine(self, b):
+        """
+        Adds the variables in b, which take precedence over the ones added
+        before.
+        """
+
+        _validate_mutable_mappings(self.vars, b)
+
+        if C.DEFAULT_HASH_BEHAVIOUR != "merge":
+            self.vars.update(b)
+        elif not self.vars or self.vars == b:
+            self.vars.clear()
+            self.vars.update(b)
+        else:
+            _merge_hash_into(self.vars, b, self._owned)
+
+        return self.vars
 
 
 def load_extra_vars(loader, options):
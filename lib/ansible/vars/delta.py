@@ -0,0 +1,109 @@
+# Copyright (c) 2018 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.module_utils.six import binary_type, integer_types, iteritems, text_type
+
+__all__ = ['vars_equal', 'diff_vars', 'apply_vars_delta']
+
+# values of these types are compared with ==, anything else which is not a
+# dict, list or tuple is only considered equal to the very same object
+_SCALAR_TYPES = (text_type, binary_type, float, bool, type(None)) + integer_types
+
+
+def vars_equal(a, b, memo=None):
+    '''
+    Strict equality for variable values. Unlike ==, the types must match at
+    every level, so an AnsibleUnsafeText is never considered equal to the
+    plain string with the same content.
+    '''
+
+    if a is b:
+        return True
+
+    if type(a) is not type(b):
+        return False
+
+    if isinstance(a, _SCALAR_TYPES):
+        return a == b
+
+    if not isinstance(a, (dict, list, tuple)):
+        return False
+
+    if memo is None:
+        memo = {}
+
+    key = (id(a), id(b))
+    if key not in memo:
+        if isinstance(a, dict):
+            memo[key] = len(a) == len(b) and all(k in b and vars_equal(v, b[k], memo) for (k, v) in iteritems(a))
+        else:
+            memo[key] = len(a) == len(b) and all(vars_equal(x, y, memo) for (x, y) in zip(a, b))
+    return memo[key]
+
+
+def diff_vars(old, new, skip=()):
+    '''
+    Returns the delta between two variable dicts as a tuple of
+    (changed, removed, filled, vars_view), which apply_vars_delta() uses to
+    turn a copy of old into new.
+
+    The values of keys listed in skip are left out of the delta, only their
+    presence is recorded and they are filled in by whoever applies it. The
+    nested 'vars' magic variable, which is mostly a copy of the top level, is
+    described by the keys it is missing and the values which differ from the
+    top level rather than shipped whole.
+    '''
+
+    memo = {}
+    changed = dict()
+    for (k, v) in iteritems(new):
+        if k in skip or k == 'vars':
+            continue
+        if k not in old or not vars_equal(old[k], v, memo):
+            changed[k] = v
+
+    removed = [k for k in old if k not in new]
+    filled = [k for k in skip if k in new]
+
+    vars_view = None
+    if isinstance(new.get('vars'), dict):
+        missing = [k for k in new if k != 'vars' and k not in new['vars']]
+        extra = dict()
+        for (k, v) in iteritems(new['vars']):
+            if k not in new or new[k] is not v:
+                extra[k] = v
+        vars_view = (missing, extra)
+
+    return (changed, removed, filled, vars_view)
+
+
+def apply_vars_delta(old, delta, fill=None):
+    '''
+    Applies a delta created by diff_vars() to the old variables, returning
+    the new variables. The old dict is not modified. The values for keys
+    which were skipped when creating the delta are taken from fill.
+    '''
+
+    (changed, removed, filled, vars_view) = delta
+
+    new = old.copy()
+    new.pop('vars', None)
+    for k in removed:
+        new.pop(k, None)
+    new.update(changed)
+    for k in filled:
+        new[k] = fill[k]
+
+    if vars_view is not None:
+        (missing, extra) = vars_view
+        new_vars = new.copy()
+        for k in missing:
+            del new_vars[k]
+        new_vars.update(extra)
+        new['vars'] = new_vars
+
+    return new
@@ -47,7 +47,7 @@ try:
 except ImportError:
     from sha import sha as sha1
 
-__all__ = ['HostVars', 'HostVarsVars']
+__all__ = ['HostVars', 'HostVarsVars', 'InventoryGroups']
 
 
 # Note -- this is a Mapping, not a MutableMapping
@@ -62,6 +62,16 @@ class HostVars(collections.Mapping):
         variable_manager._hostvars = self
         self._cached_result = dict()
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        # VariableManager does not pickle its loader and hostvars, so link the
+        # ones we hold back up, as pool workers get HostVars through pickling
+        if self._variable_manager._loader is None:
+            self._variable_manager._loader = self._loader
+        if self._variable_manager._hostvars is None:
+            self._variable_manager._hostvars = self
+
     def set_variable_manager(self, variable_manager):
         self._variable_manager = variable_manager
         variable_manager._hostvars = self
@@ -140,3 +150,12 @@ class HostVarsVars(collections.Mapping):
 
     def __repr__(self):
         return repr(self._vars)
+
+
+class InventoryGroups(dict):
+    '''
+    The 'groups' magic variable, the names of the hosts of every group of the
+    inventory. It is a plain dict, so that filters and modules handle it like
+    any other dict, but it is built once and shared by all hosts until the
+    groups change, so the templating proxy returns it as-is.
+    '''
@@ -41,9 +41,10 @@ from ansible.plugins.loader import lookup_loader, vars_loader
 from ansible.plugins.cache import FactCache
 from ansible.template import Templar
 from ansible.utils.listify import listify_lookup_plugin_terms
-from ansible.utils.vars import combine_vars
+from ansible.utils.vars import combine_vars, VarsCombiner
 from ansible.utils.unsafe_proxy import wrap_var
 from ansible.vars.clean import namespace_facts
+from ansible.vars.hostvars import InventoryGroups
 
 try:
     from __main__ import display
@@ -86,12 +87,29 @@ class VariableManager:
         self._host_vars_files = defaultdict(dict)
         self._group_vars_files = defaultdict(dict)
         self._inventory = inventory
+        self._groups = None
         self._loader = loader
         self._hostvars = None
         self._omit_token = '__omit_place_holder__%s' % sha1(os.urandom(64)).hexdigest()
         self._options_vars = defaultdict(dict)
         self.safe_basedir = False
 
+        # names of the hosts whose facts or cached vars changed, in order of
+        # the changes, with None marking a change to the inventory itself,
+        # kept from version _changes_start on and only once track_changes()
+        # was called
+        self._changes = []
+        self._changes_start = 0
+        self._track_changes = False
+
+        # layers of get_vars() which do not depend on the task, computed once
+        # and reused until invalidated, see _get_play_layers() and friends
+        self._play_layers = dict()
+        self._inventory_layers = dict()
+        self._plugin_host_vars = dict()
+        self._fact_layers = dict()
+        self._play_hosts = dict()
+
         # bad cache plugin is not fatal error
         try:
             self._fact_cache = FactCache()
@@ -124,8 +142,19 @@ class VariableManager:
         self._group_vars_files = data.get('group_vars_files', defaultdict(dict))
         self._omit_token = data.get('omit_token', '__omit_place_holder__%s' % sha1(os.urandom(64)).hexdigest())
         self._inventory = data.get('inventory', None)
+        self._groups = None
         self._options_vars = data.get('options_vars', dict())
         self.safe_basedir = data.get('safe_basedir', False)
+        self._loader = None
+        self._hostvars = None
+        self._changes = []
+        self._changes_start = 0
+        self._track_changes = False
+        self._play_layers = dict()
+        self._inventory_layers = dict()
+        self._plugin_host_vars = dict()
+        self._fact_layers = dict()
+        self._play_hosts = dict()
 
     @property
     def extra_vars(self):
@@ -141,6 +170,10 @@ class VariableManager:
 
     def set_inventory(self, inventory):
         self._inventory = inventory
+        self._groups = None
+        self._inventory_layers = dict()
+        self._plugin_host_vars = dict()
+        self._play_hosts = dict()
 
     @property
     def options_vars(self):
@@ -172,17 +205,24 @@ class VariableManager:
         - task->get_vars (if there is a task context)
         - vars_cache[host] (if there is a host context)
         - extra vars
+
+        The layers which do not depend on the task (play, role and inventory
+        vars and facts) are cached between calls unless use_cache is False,
+        see mark_inventory_changed() for when they are invalidated.
         '''
 
         display.debug("in VariableManager get_vars()")
 
-        all_vars = dict()
+        # all_vars is updated in place by the combiner as layers are added
+        combiner = VarsCombiner()
+        all_vars = combiner.vars
         magic_variables = self._get_magic_variables(
             play=play,
             host=host,
             task=task,
             include_hostvars=include_hostvars,
             include_delegate_to=include_delegate_to,
+            use_cache=use_cache,
         )
 
         # default for all cases
@@ -191,10 +231,12 @@ class VariableManager:
             basedirs = [self._loader.get_basedir()]
 
         if play:
+            play_layers = self._get_play_layers(play, use_cache)
+
             # first we compile any vars specified in defaults/main.yml
             # for all roles within the specified play
-            for role in play.get_roles():
-                all_vars = combine_vars(all_vars, role.get_default_vars())
+            for layer in play_layers['role_defaults']:
+                combiner.combine(layer)
 
         if task:
             # set basedirs
@@ -210,118 +252,20 @@ class VariableManager:
             # sure it sees its defaults above any other roles, as we previously
             # (v1) made sure each task had a copy of its roles default vars
             if task._role is not None and (play or task.action == 'include_role'):
-                all_vars = combine_vars(all_vars, task._role.get_default_vars(dep_chain=task.get_dep_chain()))
+                combiner.combine(task._role.get_default_vars(dep_chain=task.get_dep_chain()))
 
         if host:
-            # THE 'all' group and the rest of groups for a host, used below
-            all_group = self._inventory.groups.get('all')
-            host_groups = sort_groups([g for g in host.get_groups() if g.name not in ['all']])
-
-            def _get_plugin_vars(plugin, path, entities):
-                data = {}
-                try:
-                    data = plugin.get_vars(self._loader, path, entities)
-                except AttributeError:
-                    try:
-                        for entity in entities:
-                            if isinstance(entity, Host):
-                                data.update(plugin.get_host_vars(entity.name))
-                            else:
-                                data.update(plugin.get_group_vars(entity.name))
-                    except AttributeError:
-                        if hasattr(plugin, 'run'):
-                            raise AnsibleError("Cannot use v1 type vars plugin %s from %s" % (plugin._load_name, plugin._original_path))
-                        else:
-                            raise AnsibleError("Invalid vars plugin %s from %s" % (plugin._load_name, plugin._original_path))
-                return data
-
-            # internal fuctions that actually do the work
-            def _plugins_inventory(entities):
-                ''' merges all entities by inventory source '''
-                data = {}
-                for inventory_dir in self._inventory._sources:
-                    if ',' in inventory_dir and not os.path.exists(inventory_dir):  # skip host lists
-                        continue
-                    elif not os.path.isdir(inventory_dir):  # always pass 'inventory directory'
-                        inventory_dir = os.path.dirname(inventory_dir)
-
-                    for plugin in vars_loader.all():
-
-                        data = combine_vars(data, _get_plugin_vars(plugin, inventory_dir, entities))
-                return data
-
-            def _plugins_play(entities):
-                ''' merges all entities adjacent to play '''
-                data = {}
-                for plugin in vars_loader.all():
-
-                    for path in basedirs:
-                        data = combine_vars(data, _get_plugin_vars(plugin, path, entities))
-                return data
-
-            # configurable functions that are sortable via config, rememer to add to _ALLOWED if expanding this list
-            def all_inventory():
-                return all_group.get_vars()
-
-            def all_plugins_inventory():
-                return _plugins_inventory([all_group])
-
-            def all_plugins_play():
-                return _plugins_play([all_group])
-
-            def groups_inventory():
-                ''' gets group vars from inventory '''
-                return get_group_vars(host_groups)
-
-            def groups_plugins_inventory():
-                ''' gets plugin sources from inventory for groups '''
-                return _plugins_inventory(host_groups)
-
-            def groups_plugins_play():
-                ''' gets plugin sources from play for groups '''
-                return _plugins_play(host_groups)
-
-            def plugins_by_groups():
-                '''
-                    merges all plugin sources by group,
-                    This should be used instead, NOT in combination with the other groups_plugins* functions
-                '''
-                data = {}
-                for group in host_groups:
-                    data[group] = combine_vars(data[group], _plugins_inventory(group))
-                    data[group] = combine_vars(data[group], _plugins_play(group))
-                return data
-
-            # Merge groups as per precedence config
-            # only allow to call the functions we want exposed
-            for entry in C.VARIABLE_PRECEDENCE:
-                if entry in self._ALLOWED:
-                    display.debug('Calling %s to load vars for %s' % (entry, host.name))
-                    all_vars = combine_vars(all_vars, locals()[entry]())
-                else:
-                    display.warning('Ignoring unknown variable precedence entry: %s' % (entry))
-
-            # host vars, from inventory, inventory adjacent and play adjacent via plugins
-            all_vars = combine_vars(all_vars, host.get_vars())
-            all_vars = combine_vars(all_vars, _plugins_inventory([host]))
-            all_vars = combine_vars(all_vars, _plugins_play([host]))
+            for layer in self._get_inventory_layers(host, basedirs, use_cache, play=play):
+                combiner.combine(layer)
 
             # finally, the facts caches for this host, if it exists
-            try:
-                facts = self._fact_cache.get(host.name, {})
-                all_vars.update(namespace_facts(facts))
-
-                # push facts to main namespace
-                if C.INJECT_FACTS_AS_VARS:
-                    all_vars = combine_vars(all_vars, wrap_var(facts))
-                else:
-                    # always 'promote' ansible_local
-                    all_vars = combine_vars(all_vars, wrap_var({'ansible_local': facts.get('ansible_local', {})}))
-            except KeyError:
-                pass
+            (namespaced_facts, promoted_facts) = self._get_fact_layers(host, use_cache)
+            all_vars.update(namespaced_facts)
+            combiner.combine(promoted_facts)
 
         if play:
-            all_vars = combine_vars(all_vars, play.get_vars())
+            for layer in play_layers['play_vars']:
+                combiner.combine(layer)
 
             vars_files = play.get_vars_files()
             try:
@@ -355,7 +299,7 @@ class VariableManager:
                                 data = preprocess_vars(self._loader.load_from_file(vars_file, unsafe=True))
                                 if data is not None:
                                     for item in data:
-                                        all_vars = combine_vars(all_vars, item)
+                                        combiner.combine(item)
                                 break
                             except AnsibleFileNotFound:
                                 # we continue on loader failures
@@ -384,41 +328,40 @@ class VariableManager:
 
             # By default, we now merge in all vars from all roles in the play,
             # unless the user has disabled this via a config option
-            if not C.DEFAULT_PRIVATE_ROLE_VARS:
-                for role in play.get_roles():
-                    all_vars = combine_vars(all_vars, role.get_vars(include_params=False))
+            for layer in play_layers['role_vars']:
+                combiner.combine(layer)
 
         # next, we merge in the vars from the role, which will specifically
         # follow the role dependency chain, and then we merge in the tasks
         # vars (which will look at parent blocks/task includes)
         if task:
             if task._role:
-                all_vars = combine_vars(all_vars, task._role.get_vars(task.get_dep_chain(), include_params=False))
-            all_vars = combine_vars(all_vars, task.get_vars())
+                combiner.combine(task._role.get_vars(task.get_dep_chain(), include_params=False))
+            combiner.combine(task.get_vars())
 
         # next, we merge in the vars cache (include vars) and nonpersistent
         # facts cache (set_fact/register), in that order
         if host:
             # include_vars non-persistent cache
-            all_vars = combine_vars(all_vars, self._vars_cache.get(host.get_name(), dict()))
+            combiner.combine(self._vars_cache.get(host.get_name(), dict()))
             # fact non-persistent cache
-            all_vars = combine_vars(all_vars, self._nonpersistent_fact_cache.get(host.name, dict()))
+            combiner.combine(self._nonpersistent_fact_cache.get(host.name, dict()))
 
         # next, we merge in role params and task include params
         if task:
             if task._role:
-                all_vars = combine_vars(all_vars, task._role.get_role_params(task.get_dep_chain()))
+                combiner.combine(task._role.get_role_params(task.get_dep_chain()))
 
             # special case for include tasks, where the include params
             # may be specified in the vars field for the task, which should
             # have higher precedence than the vars/np facts above
-            all_vars = combine_vars(all_vars, task.get_include_params())
+            combiner.combine(task.get_include_params())
 
         # extra vars
-        all_vars = combine_vars(all_vars, self._extra_vars)
+        combiner.combine(self._extra_vars)
 
         # magic variables
-        all_vars = combine_vars(all_vars, magic_variables)
+        combiner.combine(magic_variables)
 
         # special case for the 'environment' magic variable, as someone
         # may have set it as a variable and we don't want to stomp on it
@@ -438,7 +381,292 @@ class VariableManager:
         display.debug("done with get_vars()")
         return all_vars
 
-    def _get_magic_variables(self, play, host, task, include_hostvars, include_delegate_to):
+    @staticmethod
+    def _collapse_layers(layers):
+        '''
+        Combines consecutive layers ahead of time where that gives the same
+        result as combining them one by one into the vars, which is only the
+        case when hashes are replaced rather than merged.
+        '''
+        if C.DEFAULT_HASH_BEHAVIOUR == "merge" or len(layers) < 2:
+            return layers
+
+        combiner = VarsCombiner()
+        for layer in layers:
+            combiner.combine(layer)
+        return [combiner.vars]
+
+    def _get_play_layers(self, play, use_cache=True):
+        '''
+        Returns the layers of vars which only depend on the play: the defaults
+        and vars of all of its roles and the play vars, along with the host
+        pattern used for the play hosts magic vars.
+        '''
+
+        key = (play._uuid, len(play.roles))
+        if use_cache and key in self._play_layers:
+            return self._play_layers[key]
+
+        templar = Templar(loader=self._loader)
+        if templar.is_template(play.hosts):
+            hosts_pattern = 'all'
+        else:
+            hosts_pattern = play.hosts or 'all'
+
+        roles = play.get_roles()
+        layers = dict(
+            hosts_pattern=hosts_pattern,
+            role_defaults=self._collapse_layers([role.get_default_vars() for role in roles]),
+            play_vars=[play.get_vars()],
+            role_vars=[],
+        )
+        if not C.DEFAULT_PRIVATE_ROLE_VARS:
+            layers['role_vars'] = self._collapse_layers([role.get_vars(include_params=False) for role in roles])
+
+        if use_cache:
+            self._play_layers[key] = layers
+        return layers
+
+    def _get_fact_layers(self, host, use_cache=True):
+        '''
+        Returns the facts for the host, namespaced under ansible_facts and
+        the ones injected as top level vars.
+        '''
+
+        if use_cache and host.name in self._fact_layers:
+            return self._fact_layers[host.name]
+
+        namespaced = promoted = {}
+        try:
+            facts = self._fact_cache.get(host.name, {})
+            namespaced = namespace_facts(facts)
+
+            # push facts to main namespace
+            if C.INJECT_FACTS_AS_VARS:
+                promoted = wrap_var(facts)
+            else:
+                # always 'promote' ansible_local
+                promoted = wrap_var({'ansible_local': facts.get('ansible_local', {})})
+        except KeyError:
+            pass
+
+        if use_cache:
+            self._fact_layers[host.name] = (namespaced, promoted)
+        return (namespaced, promoted)
+
+    def _get_inventory_layers(self, host, basedirs, use_cache=True, play=None):
+        '''
+        Returns the layers of vars for the host coming from inventory and vars
+        plugins, for its groups as per the configured precedence and then for
+        the host itself.
+
+        Vars plugins which can load the vars of many entities at once are
+        asked for the vars of all the hosts of the play the first time one
+        of them is needed.
+        '''
+
+        key = (host.name, tuple(basedirs))
+        if use_cache and key in self._inventory_layers:
+            return self._inventory_layers[key]
+
+        layers = []
+
+        # THE 'all' group and the rest of groups for a host, used below
+        all_group = self._inventory.groups.get('all')
+        host_groups = sort_groups([g for g in host.get_groups() if g.name not in ['all']])
+
+        def _get_plugin_vars(plugin, path, entities):
+            data = {}
+            if use_cache and entities == [host] and hasattr(plugin, 'get_vars_for_entities'):
+                key = (plugin._load_name, path)
+                loaded = self._plugin_host_vars.setdefault(key, {})
+                if host.name not in loaded:
+                    hosts = [host]
+                    if play:
+                        pattern = self._get_play_layers(play)['hosts_pattern']
+                        for play_host in self._inventory.get_hosts(pattern=pattern, ignore_restrictions=True):
+                            if play_host.name != host.name and play_host.name not in loaded:
+                                hosts.append(play_host)
+                    loaded.update(plugin.get_vars_for_entities(self._loader, path, hosts))
+                return loaded.get(host.name, data)
+
+            try:
+                data = plugin.get_vars(self._loader, path, entities)
+            except AttributeError:
+                try:
+                    for entity in entities:
+                        if isinstance(entity, Host):
+                            data.update(plugin.get_host_vars(entity.name))
+                        else:
+                            data.update(plugin.get_group_vars(entity.name))
+                except AttributeError:
+                    if hasattr(plugin, 'run'):
+                        raise AnsibleError("Cannot use v1 type vars plugin %s from %s" % (plugin._load_name, plugin._original_path))
+                    else:
+                        raise AnsibleError("Invalid vars plugin %s from %s" % (plugin._load_name, plugin._original_path))
+            return data
+
+        # internal fuctions that actually do the work
+        def _plugins_inventory(entities):
+            ''' merges all entities by inventory source '''
+            data = {}
+            for inventory_dir in self._inventory._sources:
+                if ',' in inventory_dir and not os.path.exists(inventory_dir):  # skip host lists
+                    continue
+                elif not os.path.isdir(inventory_dir):  # always pass 'inventory directory'
+                    inventory_dir = os.path.dirname(inventory_dir)
+
+                for plugin in vars_loader.all():
+
+                    data = combine_vars(data, _get_plugin_vars(plugin, inventory_dir, entities))
+            return data
+
+        def _plugins_play(entities):
+            ''' merges all entities adjacent to play '''
+            data = {}
+            for plugin in vars_loader.all():
+
+                for path in basedirs:
+                    data = combine_vars(data, _get_plugin_vars(plugin, path, entities))
+            return data
+
+        # configurable functions that are sortable via config, rememer to add to _ALLOWED if expanding this list
+        def all_inventory():
+            return all_group.get_vars()
+
+        def all_plugins_inventory():
+            return _plugins_inventory([all_group])
+
+        def all_plugins_play():
+            return _plugins_play([all_group])
+
+        def groups_inventory():
+            ''' gets group vars from inventory '''
+            return get_group_vars(host_groups)
+
+        def groups_plugins_inventory():
+            ''' gets plugin sources from inventory for groups '''
+            return _plugins_inventory(host_groups)
+
+        def groups_plugins_play():
+            ''' gets plugin sources from play for groups '''
+            return _plugins_play(host_groups)
+
+        def plugins_by_groups():
+            '''
+                merges all plugin sources by group,
+                This should be used instead, NOT in combination with the other groups_plugins* functions
+            '''
+            data = {}
+            for group in host_groups:
+                data[group] = combine_vars(data[group], _plugins_inventory(group))
+                data[group] = combine_vars(data[group], _plugins_play(group))
+            return data
+
+        # Merge groups as per precedence config
+        # only allow to call the functions we want exposed
+        for entry in C.VARIABLE_PRECEDENCE:
+            if entry in self._ALLOWED:
+                display.debug('Calling %s to load vars for %s' % (entry, host.name))
+                layers.append(locals()[entry]())
+            else:
+                display.warning('Ignoring unknown variable precedence entry: %s' % (entry))
+
+        # host vars, from inventory, inventory adjacent and play adjacent via plugins
+        layers.append(host.get_vars())
+        layers.append(_plugins_inventory([host]))
+        layers.append(_plugins_play([host]))
+
+        layers = self._collapse_layers(layers)
+        if use_cache:
+            self._inventory_layers[key] = layers
+        return layers
+
+    def get_changes(self, since=None):
+        '''
+        Returns a tuple of (version, host_state, inventory) describing what
+        changed after the given version, so a copy of this variable manager
+        (for instance the one held by a pool worker) can be brought up to date.
+
+        host_state maps the name of every host whose facts, non-persistent facts
+        or vars cache changed to a tuple of their current values. inventory is
+        only set if the inventory itself changed. Pass the returned version back
+        in to get the changes after this call, or pass None to only get the
+        current version.
+        '''
+
+        host_state = dict()
+        inventory = None
+        version = self._changes_start + len(self._changes)
+        if since is None:
+            since = version
+        elif since < self._changes_start:
+            raise AnsibleError("the changes to the variables after version %d were dropped, the oldest kept is %d" % (since, self._changes_start))
+
+        for host_name in set(self._changes[since - self._changes_start:]):
+            if host_name is None:
+                inventory = self._inventory
+            else:
+                host_state[host_name] = (
+                    self._fact_cache.get(host_name),
+                    self._nonpersistent_fact_cache.get(host_name),
+                    self._vars_cache.get(host_name),
+                )
+
+        return (version, host_state, inventory)
+
+    def track_changes(self):
+        '''
+        Starts recording the hosts whose facts or vars change, for get_changes().
+        '''
+        self._track_changes = True
+
+    def drop_changes(self, before):
+        '''
+        Forgets the changes older than the given version, once every consumer
+        of get_changes() has seen them.
+        '''
+        if before > self._changes_start:
+            del self._changes[:before - self._changes_start]
+            self._changes_start = before
+
+    def _record_change(self, host_name):
+        if self._track_changes:
+            self._changes.append(host_name)
+
+    def apply_changes(self, host_state, inventory=None):
+        '''
+        Updates this variable manager with the changes returned by the
+        get_changes() method of another one.
+        '''
+
+        if inventory is not None:
+            self.set_inventory(inventory)
+            if self._hostvars is not None:
+                self._hostvars.set_inventory(inventory)
+
+        for (host_name, (facts, nonpersistent_facts, host_vars_cache)) in iteritems(host_state):
+            for (cache, value) in ((self._fact_cache, facts),
+                                   (self._nonpersistent_fact_cache, nonpersistent_facts),
+                                   (self._vars_cache, host_vars_cache)):
+                if value is None:
+                    cache.pop(host_name, None)
+                else:
+                    cache[host_name] = value
+            self._fact_layers.pop(host_name, None)
+
+    def mark_inventory_changed(self):
+        '''
+        Records that hosts or groups were added to the inventory, or that it
+        was refreshed, for consumers of get_changes(), and drops the cached
+        inventory vars of all hosts.
+        '''
+        self._inventory_layers = dict()
+        self._plugin_host_vars = dict()
+        self._play_hosts = dict()
+        self._record_change(None)
+
+    def _get_magic_variables(self, play, host, task, include_hostvars, include_delegate_to, use_cache=True):
         '''
         Returns a dictionary of so-called "magic" variables in Ansible,
         which are special variables we set internally for use.
@@ -458,21 +686,9 @@ class VariableManager:
                 variables['role_uuid'] = text_type(task._role._uuid)
 
         if self._inventory is not None:
-            variables['groups'] = self._inventory.get_groups_dict()
+            variables['groups'] = self._get_groups()
             if play:
-                templar = Templar(loader=self._loader)
-                if templar.is_template(play.hosts):
-                    pattern = 'all'
-                else:
-                    pattern = play.hosts or 'all'
-                # add the list of hosts in the play, as adjusted for limit/filters
-                variables['ansible_play_hosts_all'] = [x.name for x in self._inventory.get_hosts(pattern=pattern, ignore_restrictions=True)]
-                variables['ansible_play_hosts'] = [x for x in variables['ansible_play_hosts_all'] if x not in play._removed_hosts]
-                variables['ansible_play_batch'] = [x.name for x in self._inventory.get_hosts() if x.name not in play._removed_hosts]
-
-                # DEPRECATED: play_hosts should be deprecated in favor of ansible_play_batch,
-                # however this would take work in the templating engine, so for now we'll add both
-                variables['play_hosts'] = variables['ansible_play_batch']
+                variables.update(self._get_play_hosts(play, use_cache))
 
         # the 'omit' value alows params to be left out if the variable they are based on is undefined
         variables['omit'] = self._omit_token
@@ -485,6 +701,44 @@ class VariableManager:
 
         return variables
 
+    def _get_groups(self):
+        '''
+        Returns the 'groups' magic variable, copied from the inventory only
+        when its groups changed, so the same dict is shared by all hosts.
+        '''
+
+        groups_dict = self._inventory.get_groups_dict()
+        if self._groups is None or self._groups[0] is not groups_dict:
+            self._groups = (groups_dict, InventoryGroups(groups_dict))
+        return self._groups[1]
+
+    def _get_play_hosts(self, play, use_cache=True):
+        '''
+        Returns the magic variables listing the hosts of the play. The lists
+        are built once and shared by all hosts until the hosts removed from
+        the play or the inventory selection (limit, serial batch, new hosts)
+        change.
+        '''
+
+        pattern = self._get_play_layers(play, use_cache)['hosts_pattern']
+        state = (pattern, self._inventory._hosts_version, tuple(play._removed_hosts))
+        (cached_state, variables) = self._play_hosts.get(play._uuid, (None, None))
+        if use_cache and state == cached_state:
+            return variables
+
+        variables = dict()
+        # add the list of hosts in the play, as adjusted for limit/filters
+        variables['ansible_play_hosts_all'] = [x.name for x in self._inventory.get_hosts(pattern=pattern, ignore_restrictions=True)]
+        variables['ansible_play_hosts'] = [x for x in variables['ansible_play_hosts_all'] if x not in play._removed_hosts]
+        variables['ansible_play_batch'] = [x.name for x in self._inventory.get_hosts() if x.name not in play._removed_hosts]
+
+        # DEPRECATED: play_hosts should be deprecated in favor of ansible_play_batch,
+        # however this would take work in the templating engine, so for now we'll add both
+        variables['play_hosts'] = variables['ansible_play_batch']
+
+        self._play_hosts[play._uuid] = (state, variables)
+        return variables
+
     def _get_delegated_vars(self, play, task, existing_variables):
         # we unfortunately need to template the delegate_to field here,
         # as we're fetching vars before post_validate has been called on
@@ -591,6 +845,8 @@ class VariableManager:
         '''
         if hostname in self._fact_cache:
             del self._fact_cache[hostname]
+            self._record_change(hostname)
+        self._fact_layers.pop(hostname, None)
 
     def set_host_facts(self, host, facts):
         '''
@@ -608,6 +864,9 @@ class VariableManager:
             except KeyError:
                 self._fact_cache[host.name] = facts
 
+        self._fact_layers.pop(host.name, None)
+        self._record_change(host.name)
+
     def set_nonpersistent_facts(self, host, facts):
         '''
         Sets or updates the given facts for a host in the fact cache.
@@ -624,6 +883,8 @@ class VariableManager:
             except KeyError:
                 self._nonpersistent_fact_cache[host.name] = facts
 
+        self._record_change(host.name)
+
     def set_host_variable(self, host, varname, value):
         '''
         Sets a value in the vars_cache for a host.
@@ -635,3 +896,5 @@ class VariableManager:
             self._vars_cache[host_name] = combine_vars(self._vars_cache[host_name], {varname: value})
         else:
             self._vars_cache[host_name][varname] = value
+
+        self._record_change(host_name)
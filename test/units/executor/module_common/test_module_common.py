@@ -19,6 +19,13 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
 import pytest
 
 import ansible.errors
@@ -125,3 +132,195 @@ class TestGetShebang(object):
     def test_python_via_env(self, templar):
         assert amc._get_shebang(u'/usr/bin/python', {u'ansible_python_interpreter': u'/usr/bin/env python'}, templar) == \
             (u'#!/usr/bin/env python', u'/usr/bin/env python')
+
+
+class TestRemoteCache(object):
+    module_path = os.path.join(os.path.dirname(amc.__file__), '..', 'modules', 'system', 'ping.py')
+
+    def build(self, templar, cache_dir, stub):
+        task_vars = {u'ansible_python_interpreter': sys.executable}
+        return amc.modify_module('ping', self.module_path, {'data': 'cached'}, templar, task_vars=task_vars,
+                                 remote_cache_dir=cache_dir, remote_cache_stub=stub)[0]
+
+    def run(self, b_module_data):
+        p = subprocess.Popen([sys.executable, '-'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout = p.communicate(b_module_data)[0]
+        return (p.returncode, json.loads(stdout.decode('utf-8')))
+
+    def test_stub(self, templar, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        full = self.build(templar, cache_dir, False)
+        stub = self.build(templar, cache_dir, True)
+        assert len(stub) < len(full) / 2
+
+        (rc, result) = self.run(stub)
+        assert rc == 1
+        assert result['_ansible_ansiballz_cache_miss']
+
+        # the full payload stores its zip data for the stub
+        assert self.run(full) == (0, {'ping': 'cached', 'invocation': {'module_args': {'data': 'cached'}}})
+        assert self.run(stub) == (0, {'ping': 'cached', 'invocation': {'module_args': {'data': 'cached'}}})
+        assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+
+    def test_corrupted_cache(self, templar, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        self.run(self.build(templar, cache_dir, False))
+        for name in os.listdir(cache_dir):
+            with open(os.path.join(cache_dir, name), 'ab') as f:
+                f.write(b'AAAA')
+
+        assert self.run(self.build(templar, cache_dir, True))[1]['_ansible_ansiballz_cache_miss']
+
+    def test_disabled(self, templar):
+        assert b'ANSIBALLZ_CACHE = None' in self.build(templar, None, True)
+
+
+class TestAnsiballZCache(object):
+    module_path = os.path.join(os.path.dirname(amc.__file__), '..', 'modules', 'system', 'ping.py')
+
+    @pytest.fixture(autouse=True)
+    def cache(self, mocker, tmpdir):
+        mocker.patch.object(amc.C, 'DEFAULT_LOCAL_TMP', str(tmpdir))
+        mocker.patch.object(amc, '_ANSIBALLZ_ZIPDATA', OrderedDict())
+        mocker.patch.object(amc, '_ANSIBALLZ_DEPS', {})
+        self.recursive_finder = mocker.spy(amc, 'recursive_finder')
+        self.lookup_path = str(tmpdir.join('ansiballz_cache'))
+
+    @property
+    def builds(self):
+        # recursive_finder() also calls itself for the module_utils files
+        return len([c for c in self.recursive_finder.call_args_list if c[0][0] == 'ping'])
+
+    def get_zipdata(self):
+        with open(self.module_path, 'rb') as f:
+            return amc._get_ansiballz_zipdata('ping', f.read(), 'ZIP_DEFLATED')
+
+    def test_cached(self):
+        zipdata = self.get_zipdata()
+        assert self.get_zipdata() == zipdata
+        assert self.builds == 1
+
+        # other processes use the copy on disk
+        amc._ANSIBALLZ_ZIPDATA.clear()
+        amc._ANSIBALLZ_DEPS.clear()
+        assert self.get_zipdata() == zipdata
+        assert self.builds == 1
+
+    def test_module_utils_changed(self, mocker):
+        self.get_zipdata()
+        mocker.patch.object(amc, '_file_checksum', return_value='changed')
+        self.get_zipdata()
+        assert self.builds == 2
+
+    def test_preload_module(self):
+        amc.preload_module('ping', self.module_path, 'ZIP_DEFLATED')
+        assert len(amc._ANSIBALLZ_ZIPDATA) == 1
+        self.get_zipdata()
+        assert self.builds == 1
+
+    def test_evict(self, mocker):
+        mocker.patch.object(amc.C, 'ANSIBALLZ_CACHE_MAX_SIZE', 1)
+        os.makedirs(self.lookup_path)
+        for (mtime, name) in enumerate(('c', 'a', 'b')):
+            path = os.path.join(self.lookup_path, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 400 * 1024)
+            os.utime(path, (mtime, mtime))
+
+        amc._evict_ansiballz_cache(self.lookup_path)
+        assert sorted(os.listdir(self.lookup_path)) == ['a', 'b']
+
+
+class TestModuleServer(object):
+    module = b"""#!/usr/bin/python
+import os
+from ansible.module_utils.basic import AnsibleModule
+module = AnsibleModule(argument_spec=dict(data=dict()))
+module.exit_json(data=module.params['data'], ppid=os.getppid())
+"""
+
+    def wait_for(self, condition):
+        deadline = time.time() + 10
+        while not condition() and time.time() < deadline:
+            time.sleep(0.1)
+        return condition()
+
+    def test_module_server(self, templar, tmpdir, mocker):
+        server_dir = str(tmpdir.join('server'))
+        mocker.patch.multiple(amc.C, ANSIBALLZ_MODULE_SERVER=True, ANSIBALLZ_MODULE_SERVER_DIR=server_dir, ANSIBALLZ_MODULE_SERVER_TIMEOUT=1)
+        module_path = str(tmpdir.join('server_test.py'))
+        with open(module_path, 'wb') as f:
+            f.write(self.module)
+        b_module_data = amc.modify_module('server_test', module_path, {'data': 'served'}, templar,
+                                          task_vars={u'ansible_python_interpreter': sys.executable})[0]
+
+        def run():
+            p = subprocess.Popen([sys.executable, '-'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            result = json.loads(p.communicate(b_module_data)[0].decode('utf-8'))
+            assert p.returncode == 0
+            assert result['data'] == 'served'
+            return (p.pid, result['ppid'])
+
+        def sockets():
+            return [name for name in os.listdir(server_dir) if name.endswith('.sock')]
+
+        # the first run starts the server and runs the module itself
+        (pid, ppid) = run()
+        assert pid == ppid
+        assert self.wait_for(sockets)
+
+        (pid, ppid) = run()
+        assert pid != ppid
+        assert os.stat(server_dir).st_mode & 0o777 == 0o700
+
+        # idle servers go away
+        assert self.wait_for(lambda: not sockets())
+
+    def test_excepthook(self, templar, tmpdir, mocker):
+        server_dir = str(tmpdir.join('server'))
+        mocker.patch.multiple(amc.C, ANSIBALLZ_MODULE_SERVER=True, ANSIBALLZ_MODULE_SERVER_DIR=server_dir, ANSIBALLZ_MODULE_SERVER_TIMEOUT=1)
+        module_path = str(tmpdir.join('server_hook.py'))
+        with open(module_path, 'wb') as f:
+            f.write(b"""#!/usr/bin/python
+import sys
+from ansible.module_utils.basic import AnsibleModule
+module = AnsibleModule(argument_spec=dict())
+sys.excepthook = lambda exc_type, exc_value, tb: module.fail_json(msg=str(exc_value))
+raise Exception('hooked')
+""")
+        b_module_data = amc.modify_module('server_hook', module_path, {}, templar, task_vars={u'ansible_python_interpreter': sys.executable})[0]
+
+        # the exceptions of modules run by the server go through their hook too
+        for i in range(2):
+            p = subprocess.Popen([sys.executable, '-'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            result = json.loads(p.communicate(b_module_data)[0].decode('utf-8'))
+            assert p.returncode == 1
+            assert result['msg'] == 'hooked'
+            assert self.wait_for(lambda: [name for name in os.listdir(server_dir) if name.endswith('.sock')])
+
+
+class TestModuleBatch(object):
+    def run(self, payloads):
+        b_batch = amc.build_module_batch(u'#!%s' % sys.executable, payloads)
+        p = subprocess.Popen([sys.executable, '-'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout = p.communicate(b_batch)[0]
+        assert p.returncode == 0
+        return json.loads(stdout.decode('utf-8'))['batch_results']
+
+    def test_batch(self):
+        results = self.run([b'print("noise")\nprint(\'{"changed": true}\')\n',
+                            b'import sys\nsys.stderr.write("warning")\nprint(\'{"msg": "\\\\u00e9"}\')\n'])
+        assert [r['rc'] for r in results] == [0, 0]
+        assert results[0]['stdout'] == u'noise\n{"changed": true}\n'
+        assert json.loads(results[1]['stdout']) == {'msg': u'\xe9'}
+        assert results[1]['stderr'] == u'warning'
+
+    def test_stops_at_failure(self):
+        results = self.run([b'import sys\nprint(\'{"failed": true}\')\nsys.exit(1)\n', b'print("{}")\n'])
+        assert len(results) == 1
+        assert results[0]['rc'] == 1
+
+        # modules exiting cleanly with a failed result stop the batch too
+        results = self.run([b'print(\'{"failed": true}\')\n', b'print("{}")\n'])
+        assert len(results) == 1
+        assert results[0]['rc'] == 0
@@ -132,3 +132,14 @@ class TestRecursiveFinder(object):
         assert finder_containers.py_module_names == set((('six', '__init__'),))
         assert finder_containers.py_module_cache == {}
         assert frozenset(finder_containers.zf.namelist()) == frozenset(('ansible/module_utils/six/__init__.py',))
+
+    def test_imports_cached(self, finder_containers, mocker):
+        name = 'ping'
+        data = b'#!/usr/bin/python\nfrom ansible.module_utils import six'
+        recursive_finder(name, data, *finder_containers)
+
+        parse = mocker.patch('ast.parse')
+        zf = zipfile.ZipFile(BytesIO(), mode='w', compression=zipfile.ZIP_STORED)
+        recursive_finder(name, data, set(), {}, zf)
+        assert frozenset(zf.namelist()) == frozenset(('ansible/module_utils/six/__init__.py',))
+        assert parse.call_count == 0
@@ -425,6 +425,64 @@ class TestTaskExecutor(unittest.TestCase):
         mock_task.action = 'include'
         res = te._execute()
 
+    def test_task_executor_connection_cache(self):
+        fake_loader = DictDataLoader({})
+
+        mock_task = MagicMock()
+        mock_task.args = dict()
+        mock_task.retries = 0
+        mock_task.delay = -1
+        mock_task.until = None
+        mock_task.changed_when = None
+        mock_task.failed_when = None
+        mock_task.delegate_to = None
+        mock_task.async_val = 1
+        mock_task.poll = 0
+
+        mock_play_context = MagicMock()
+
+        mock_connection = MagicMock()
+        mock_connection.connected = True
+        mock_connection.reusable_across_tasks = True
+        mock_connection._play_context = mock_play_context.set_task_and_variable_override.return_value
+
+        mock_action = MagicMock()
+        mock_action.run.return_value = dict()
+
+        connection_cache = dict()
+
+        def make_executor():
+            te = TaskExecutor(
+                host=MagicMock(),
+                task=mock_task,
+                job_vars=dict(omit="XXXXXXXXXXXXXXXXXXX"),
+                play_context=mock_play_context,
+                new_stdin=None,
+                loader=fake_loader,
+                shared_loader_obj=None,
+                rslt_q=MagicMock(),
+                connection_cache=connection_cache,
+            )
+            te._get_connection = MagicMock(return_value=mock_connection)
+            te._get_action_handler = MagicMock(return_value=mock_action)
+            return te
+
+        # the connection is kept open at the end of the first task
+        te = make_executor()
+        te._execute()
+        te._release_connection(keep=True)
+        te._get_connection.assert_called_once()
+        mock_connection.close.assert_not_called()
+        self.assertEqual([c[0] for c in connection_cache.values()], [mock_connection])
+
+        # and reused by the next one, which drops it when the host is unreachable
+        te = make_executor()
+        te._execute()
+        te._get_connection.assert_not_called()
+        te._release_connection(keep=False)
+        mock_connection.close.assert_called_once()
+        self.assertEqual(connection_cache, dict())
+
     def test_task_executor_poll_async_result(self):
         fake_loader = DictDataLoader({})
 
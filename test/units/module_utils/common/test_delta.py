@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Ansible Project
+# Simplified BSD License (see licenses/simplified_bsd.txt or https://opensource.org/licenses/BSD-2-Clause)
+"""Test the block level deltas of ``module_utils.common.delta``."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import random
+import zlib
+
+import pytest
+
+from ansible.module_utils.common.delta import apply_delta, block_checksums, write_delta
+
+
+def _old_data():
+    rand = random.Random(0)
+    return bytes(bytearray(rand.randint(0, 255) for i in range(20000)))
+
+
+CHANGES = (
+    ('unchanged', lambda data: data),
+    ('replaced', lambda data: data[:5000] + b'x' * 100 + data[5100:]),
+    ('inserted', lambda data: data[:333] + b'inserted' + data[333:]),
+    ('deleted', lambda data: data[:7000] + data[7011:]),
+    ('appended', lambda data: data + b'appended'),
+    ('truncated', lambda data: data[:12345]),
+    ('reordered', lambda data: data[10000:] + data[:10000]),
+    ('emptied', lambda data: b''),
+    ('unrelated', lambda data: b'unrelated' * 1000),
+)
+
+
+@pytest.mark.parametrize('change', (c[1] for c in CHANGES), ids=(c[0] for c in CHANGES))
+def test_delta_rebuilds_file(tmpdir, change):
+    old = _old_data()
+    new = change(old)
+    old_path = tmpdir.join('old')
+    new_path = tmpdir.join('new')
+    delta_path = tmpdir.join('delta')
+    patched_path = tmpdir.join('patched')
+    old_path.write_binary(old)
+    new_path.write_binary(new)
+
+    with open(str(delta_path), 'wb') as f:
+        write_delta(str(new_path), block_checksums(str(old_path), 1024), 1024, f)
+    apply_delta(str(old_path), str(delta_path), str(patched_path))
+
+    assert patched_path.read_binary() == new
+
+
+def test_delta_sends_changed_blocks(tmpdir):
+    old = _old_data()
+    new = old[:5000] + b'x' * 100 + old[5100:]
+    tmpdir.join('old').write_binary(old)
+    tmpdir.join('new').write_binary(new)
+
+    with open(str(tmpdir.join('delta')), 'wb') as f:
+        literal_bytes = write_delta(str(tmpdir.join('new')), block_checksums(str(tmpdir.join('old')), 1024), 1024, f)
+    # the change falls in the fifth block
+    assert literal_bytes == 1024
+    assert tmpdir.join('delta').size() < 1200
+
+
+def test_block_checksums(tmpdir):
+    tmpdir.join('file').write_binary(b'a' * 1500)
+    assert block_checksums(str(tmpdir.join('file')), 1000) == [
+        (zlib.adler32(b'a' * 1000) & 0xffffffff, '291e9a6c66994949b57ba5e650361e98fc36b1ba'),
+        (zlib.adler32(b'a' * 500) & 0xffffffff, 'e62ca5609e96073ffdc80ad480510d6de0a13f3e'),
+    ]
+
+
+def test_apply_delta_rejects_other_files(tmpdir):
+    tmpdir.join('old').write_binary(b'old')
+    tmpdir.join('delta').write_binary(b'not a delta')
+    with pytest.raises(ValueError):
+        apply_delta(str(tmpdir.join('old')), str(tmpdir.join('delta')), str(tmpdir.join('patched')))
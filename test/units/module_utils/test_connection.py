@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import socket
+import threading
+
+import pytest
+
+from ansible.module_utils.connection import Connection, ConnectionError, recv_data, send_data
+
+
+@pytest.fixture
+def server(tmpdir):
+    '''
+    Serves json-rpc requests on a unix socket like ansible-connection,
+    answering with the method name and params, and counts the clients.
+    '''
+
+    socket_path = str(tmpdir.join('socket'))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.listen(5)
+    stats = dict(clients=0, socket_path=socket_path)
+
+    def serve():
+        while True:
+            try:
+                (client, addr) = sock.accept()
+            except socket.error:
+                break
+            stats['clients'] += 1
+            while True:
+                data = recv_data(client)
+                if not data:
+                    break
+                request = json.loads(data.decode('utf-8'))
+                if request['method'] == 'fail':
+                    response = dict(jsonrpc='2.0', id=request['id'], error=dict(code=-32603, message='Internal error', data='failed'))
+                else:
+                    response = dict(jsonrpc='2.0', id=request['id'], result=[request['method'], request.get('params')])
+                send_data(client, json.dumps(response).encode('utf-8'))
+            client.close()
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    yield stats
+    sock.close()
+
+
+def test_connection_reuses_socket(server):
+    connection = Connection(server['socket_path'])
+    assert connection.get('show version') == ['get', ['show version']]
+    assert connection.get_capabilities() == ['get_capabilities', None]
+    assert server['clients'] == 1
+
+
+def test_rpc_batch(server):
+    connection = Connection(server['socket_path'])
+    calls = [('get', ['show %d' % i], {}) for i in range(200)] + [('edit_config', [], dict(candidate='x' * 100000))]
+    results = connection.__rpc_batch__(calls)
+    assert results[:200] == [['get', ['show %d' % i]] for i in range(200)]
+    assert results[200] == ['edit_config', dict(candidate='x' * 100000)]
+    assert server['clients'] == 1
+
+
+def test_rpc_batch_error(server):
+    connection = Connection(server['socket_path'])
+    with pytest.raises(ConnectionError) as exc:
+        connection.__rpc_batch__([('get', ['show version'], {}), ('fail', [], {})])
+    assert str(exc.value) == 'failed'
@@ -1,5 +1,6 @@
 
 from ansible.compat.tests import unittest
+from ansible.compat.tests.mock import patch
 from units.mock.loader import DictDataLoader
 
 from ansible.plugins.strategy import SharedPluginLoaderObj
@@ -221,3 +222,36 @@ class TestConditional(unittest.TestCase):
         when = [u"hostvars['some_undefined_host'] is not defined"]
         ret = self._eval_con(when, variables)
         self.assertTrue(ret)
+
+    def test_classify_conditional(self):
+        self.assertEqual(conditional.classify_conditional(u"True"), ('constant', True))
+        self.assertEqual(conditional.classify_conditional(u"foo.bar"), ('reference', 'foo.bar', False))
+        self.assertEqual(conditional.classify_conditional(u"not foo"), ('reference', 'foo', True))
+        self.assertEqual(conditional.classify_conditional(u"foo is defined"), ('defined', 'foo', True))
+        self.assertEqual(conditional.classify_conditional(u"foo.bar is not defined"), ('defined', 'foo.bar', False))
+        self.assertEqual(conditional.classify_conditional(u"foo is undefined"), ('defined', 'foo', False))
+        # bare variables are evaluated as conditionals themselves
+        self.assertEqual(conditional.classify_conditional(u"foo"), ('template', ))
+        self.assertEqual(conditional.classify_conditional(u"foo == 'bar'"), ('template', ))
+
+    def test_simple_conditionals_skip_jinja2(self):
+        variables = {'some_dict': {'key1': 'value1', 'key2': 0}, 'some_flag': False}
+        with patch.object(self.templar, 'do_template') as mock_do_template:
+            self.assertTrue(self._eval_con([u"some_dict.key1"], variables))
+            self.assertFalse(self._eval_con([u"some_dict.key2"], variables))
+            self.assertTrue(self._eval_con([u"not some_flag"], variables))
+            self.assertTrue(self._eval_con([u"some_dict.key1 is defined"], variables))
+            self.assertFalse(self._eval_con([u"some_dict.key3 is defined"], variables))
+            self.assertTrue(self._eval_con([u"some_undefined_thing is undefined"], variables))
+        self.assertFalse(mock_do_template.called)
+
+    def test_simple_conditionals_needing_jinja2(self):
+        variables = {'dict_value': 1,
+                     'some_defined_dict': {'key1': 'value1',
+                                           'key2': '{{ dict_value }}'}}
+        # values which have to be templated go through jinja2
+        self.assertTrue(self._eval_con([u"some_defined_dict.key2"], variables))
+        self.assertRaisesRegexp(errors.AnsibleError, "some_undefined_thing",
+                                self._eval_con, [u"some_undefined_thing.key1 is defined"], variables)
+        self.assertRaisesRegexp(errors.AnsibleError, "some_undefined_thing",
+                                self._eval_con, [u"not some_undefined_thing"], variables)
@@ -22,6 +22,10 @@ __metaclass__ = type
 
 import os
 import re
+import shutil
+import subprocess
+import sys
+import tempfile
 
 from ansible import constants as C
 from ansible.compat.tests import unittest
@@ -33,6 +37,7 @@ from ansible.module_utils.six.moves import shlex_quote, builtins
 from ansible.module_utils._text import to_bytes
 from ansible.playbook.play_context import PlayContext
 from ansible.plugins.action import ActionBase
+from ansible.plugins.loader import shell_loader
 from ansible.template import Templar
 from ansible.vars.clean import clean_facts
 
@@ -287,6 +292,71 @@ class TestActionBase(unittest.TestCase):
         action_base._low_level_execute_command.return_value = dict(rc=1, stdout='some stuff here', stderr='No space left on device')
         self.assertRaises(AnsibleError, action_base._make_tmp_path, 'root')
 
+    def test_action_base__make_tmp_path_per_play(self):
+        mock_connection = MagicMock()
+        mock_connection.transport = 'ssh'
+        mock_connection._shell.tmpdir = None
+        mock_connection._remote_is_local = False
+        mock_connection._shell.join_path.side_effect = os.path.join
+        mock_connection._shell.get_option.return_value = ['root']
+
+        play_context = PlayContext()
+        play_context.remote_user = 'apo'
+        action_base = DerivedActionBase(MagicMock(), mock_connection, play_context, None, None, None)
+        action_base._remote_expand_user = MagicMock(return_value='/home/apo/.ansible/tmp')
+        action_base._low_level_execute_command = MagicMock(return_value=dict(rc=0, stdout='/some/ansible-tmp-path'))
+
+        # the tmpdir is made once, and kept
+        action_base._host_tmpdirs = {}
+        self.assertEqual(action_base._make_tmp_path(), '/some/ansible-tmp-path/')
+        self.assertEqual(action_base._host_tmpdirs, {('ssh', 'apo', False): '/some/ansible-tmp-path/'})
+
+        mock_connection._shell.tmpdir = None
+        self.assertEqual(action_base._make_tmp_path(), '/some/ansible-tmp-path/')
+        self.assertEqual(action_base._low_level_execute_command.call_count, 1)
+
+        # only the files of the task are removed after it
+        action_base._remove_tmp_path('/some/ansible-tmp-path/')
+        mock_connection._shell.remove_contents.assert_called_once_with('/some/ansible-tmp-path/')
+        self.assertFalse(mock_connection._shell.remove.called)
+        self.assertEqual(action_base._host_tmpdirs, {('ssh', 'apo', False): '/some/ansible-tmp-path/'})
+
+        # becoming another user needs a tmpdir of its own
+        mock_connection._shell.tmpdir = None
+        play_context.become = True
+        play_context.become_user = 'foo'
+        action_base._low_level_execute_command.return_value = dict(rc=0, stdout='/tmp/path')
+        self.assertEqual(action_base._make_tmp_path(), '/tmp/path/')
+        self.assertEqual(action_base._host_tmpdirs[('ssh', 'apo', True)], '/tmp/path/')
+
+    def test_action_base__transfer_file_tmp_path_per_play(self):
+        mock_connection = MagicMock()
+        mock_connection._shell.tmpdir = '/tmp/ansible-tmp-path/'
+        mock_connection.put_file.side_effect = [AnsibleError('No such file or directory'), None]
+
+        action_base = DerivedActionBase(MagicMock(), mock_connection, PlayContext(), None, None, None)
+        action_base._host_tmpdirs = {('ssh', 'apo', True): '/tmp/ansible-tmp-path/'}
+        action_base._low_level_execute_command = MagicMock(side_effect=[dict(rc=1), dict(rc=0)])
+
+        # a kept tmpdir which went missing is made again at the same path
+        self.assertEqual(action_base._transfer_file('/src', '/tmp/ansible-tmp-path/file'), '/tmp/ansible-tmp-path/file')
+        mock_connection._shell.exists.assert_called_once_with('/tmp/ansible-tmp-path/')
+        mock_connection._shell.mkdtemp.assert_called_once_with(basefile='ansible-tmp-path', system=True, tmpdir='/tmp')
+        self.assertEqual(mock_connection.put_file.call_count, 2)
+        self.assertEqual(action_base._host_tmpdirs, {('ssh', 'apo', True): '/tmp/ansible-tmp-path/'})
+
+        # when it cannot be made again, the next tasks make a new one
+        mock_connection.put_file.side_effect = AnsibleError('No such file or directory')
+        action_base._low_level_execute_command.side_effect = [dict(rc=1), dict(rc=1)]
+        self.assertRaises(AnsibleError, action_base._transfer_file, '/src', '/tmp/ansible-tmp-path/file')
+        self.assertEqual(action_base._host_tmpdirs, {})
+
+        # other failures are not about the tmpdir
+        action_base._host_tmpdirs = {('ssh', 'apo', True): '/tmp/ansible-tmp-path/'}
+        action_base._low_level_execute_command.side_effect = [dict(rc=0)]
+        self.assertRaises(AnsibleError, action_base._transfer_file, '/src', '/tmp/ansible-tmp-path/file')
+        self.assertEqual(action_base._host_tmpdirs, {('ssh', 'apo', True): '/tmp/ansible-tmp-path/'})
+
     def test_action_base__remove_tmp_path(self):
         # create our fake task
         mock_task = MagicMock()
@@ -496,6 +566,30 @@ class TestActionBase(unittest.TestCase):
         action_base._supports_check_mode = False
         self.assertRaises(AnsibleError, action_base._execute_module)
 
+    def test_action_base__build_single_command(self):
+        shell = shell_loader.get('sh')
+        shell.set_options()
+        remote_tmp = tempfile.mkdtemp()
+        shell.set_option('remote_tmp', remote_tmp)
+
+        mock_connection = MagicMock()
+        mock_connection._shell = shell
+        action_base = DerivedActionBase(None, mock_connection, PlayContext(), None, None, None)
+
+        try:
+            cmd = action_base._build_single_command('/path/to/AnsiballZ_ping.py', 'FOO=bar', '#!%s' % sys.executable)
+            module = b'import os, sys\nprint(os.environ["FOO"])\nprint(os.path.basename(sys.argv[0]))\nsys.exit(3)\n'
+            p = subprocess.Popen(['/bin/sh', '-c', cmd], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            stdout = p.communicate(module)[0]
+
+            # the module's output and exit code are those of the command
+            self.assertEqual(stdout.splitlines(), [b'bar', b'AnsiballZ_ping.py'])
+            self.assertEqual(p.returncode, 3)
+            # and its tmpdir is gone
+            self.assertEqual(os.listdir(remote_tmp), [])
+        finally:
+            shutil.rmtree(remote_tmp)
+
     def test_action_base_sudo_only_if_user_differs(self):
         fake_loader = MagicMock()
         fake_loader.get_basedir.return_value = os.getcwd()
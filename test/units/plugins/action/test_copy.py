@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import tarfile
+import tempfile
+
+from ansible.compat.tests import unittest
+from ansible.compat.tests.mock import patch, MagicMock
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.action.copy import ActionModule
+from ansible.utils.hashing import checksum
+
+
+class TestCopyInBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.src, 'dir', 'sub'))
+        os.makedirs(os.path.join(self.src, 'dir', 'empty'))
+        with open(os.path.join(self.src, 'top.txt'), 'w') as f:
+            f.write('top')
+        with open(os.path.join(self.src, 'dir', 'sub', 'a.txt'), 'w') as f:
+            f.write('a')
+        os.chmod(os.path.join(self.src, 'dir', 'sub', 'a.txt'), 0o640)
+
+        self.source_files = {
+            'files': [(os.path.join(self.src, 'top.txt'), 'top.txt'), (os.path.join(self.src, 'dir', 'sub', 'a.txt'), 'dir/sub/a.txt')],
+            'directories': [(os.path.join(self.src, 'dir'), 'dir'), (os.path.join(self.src, 'dir', 'sub'), 'dir/sub'),
+                            (os.path.join(self.src, 'dir', 'empty'), 'dir/empty')],
+            'symlinks': [],
+        }
+
+        self.task = MagicMock()
+        self.task.args = dict(src=self.src + '/', dest='/dest/')
+        self.play_context = PlayContext()
+        self.loader = MagicMock()
+        self.loader.get_real_file.side_effect = lambda path, decrypt=True: path
+        self.connection = MagicMock()
+        self.connection._shell.tmpdir = '/tmp/ansible-tmp-path/'
+        self.connection._shell.join_path.side_effect = os.path.join
+
+        self.action = ActionModule(self.task, self.connection, self.play_context, self.loader, None, None)
+        self.action._transfer_file = MagicMock(side_effect=lambda local_path, remote_path: remote_path)
+        self.action._fixup_perms2 = MagicMock()
+
+        self.archive_members = None
+        build_bulk_archive = self.action._build_bulk_archive
+
+        def record_archive(files, directories, symlinks):
+            archive = build_bulk_archive(files, directories, symlinks)
+            with tarfile.open(archive) as tar:
+                self.archive_members = dict((info.name, info) for info in tar.getmembers())
+            return archive
+
+        self.action._build_bulk_archive = record_archive
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+
+    @patch('ansible.plugins.action.copy.C')
+    def test_can_copy_in_bulk(self, mock_constants):
+        mock_constants.COPY_BULK_TRANSFER = True
+        self.assertTrue(self.action._can_copy_in_bulk())
+
+        self.task.args['mode'] = '0644'
+        self.task.args['directory_mode'] = 'preserve'
+        self.assertFalse(self.action._can_copy_in_bulk())
+        self.task.args['directory_mode'] = '0755'
+        self.assertTrue(self.action._can_copy_in_bulk())
+
+        # symbolic modes can not be set on the archive members
+        self.task.args['mode'] = 'u=rw,g=r'
+        self.assertFalse(self.action._can_copy_in_bulk())
+        self.task.args['mode'] = 'preserve'
+        self.assertTrue(self.action._can_copy_in_bulk())
+
+        for option in ('raw', 'validate', 'backup'):
+            self.task.args[option] = 'yes'
+            self.assertFalse(self.action._can_copy_in_bulk())
+            del self.task.args[option]
+
+        # the SELinux context of the files at dest is not known to find
+        self.task.args['setype'] = 'etc_t'
+        self.assertFalse(self.action._can_copy_in_bulk())
+        del self.task.args['setype']
+
+        self.play_context.diff = True
+        self.assertFalse(self.action._can_copy_in_bulk())
+        self.play_context.diff = False
+
+        mock_constants.COPY_BULK_TRANSFER = False
+        self.assertFalse(self.action._can_copy_in_bulk())
+
+    def test_build_bulk_archive(self):
+        os.symlink('top.txt', os.path.join(self.src, 'link'))
+        archive = self.action._build_bulk_archive(self.source_files['files'], self.source_files['directories'], [('top.txt', 'link')])
+        try:
+            with tarfile.open(archive) as tar:
+                members = dict((info.name, info) for info in tar.getmembers())
+                self.assertEqual(tar.extractfile(members['dir/sub/a.txt']).read(), b'a')
+        finally:
+            os.remove(archive)
+
+        self.assertEqual(sorted(members), ['dir', 'dir/empty', 'dir/sub', 'dir/sub/a.txt', 'link', 'top.txt'])
+        self.assertTrue(members['dir/empty'].isdir())
+        self.assertEqual(members['dir/sub/a.txt'].mode, 0o640)
+        self.assertEqual(members['dir/sub/a.txt'].uname, 'root')
+        self.assertTrue(members['link'].issym())
+        self.assertEqual(members['link'].linkname, 'top.txt')
+
+        # the modes of the task are set on the members
+        self.task.args.update(mode='0600', directory_mode='0700')
+        archive = self.action._build_bulk_archive(self.source_files['files'], self.source_files['directories'], [])
+        try:
+            with tarfile.open(archive) as tar:
+                members = dict((info.name, info) for info in tar.getmembers())
+        finally:
+            os.remove(archive)
+        self.assertEqual(members['top.txt'].mode, 0o600)
+        self.assertEqual(members['dir/empty'].mode, 0o700)
+
+    def test_copy_in_bulk(self):
+        find_return = dict(files=[dict(path='/dest/top.txt', checksum=checksum(os.path.join(self.src, 'top.txt')))],
+                           msg='/dest/dir/sub was skipped as it does not seem to be a valid directory or it cannot be accessed\n')
+        self.action._execute_module = MagicMock(side_effect=[find_return, dict(changed=True)])
+
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(changed=True))
+
+        # the lookup is limited to the directories and names being copied
+        find_args = self.action._execute_module.call_args_list[0][1]['module_args']
+        self.assertEqual(find_args['paths'], ['/dest/', '/dest/dir', '/dest/dir/sub', '/dest/dir/empty'])
+        self.assertFalse(find_args['recurse'])
+        self.assertEqual(find_args['patterns'], [r'(?:a\.txt|top\.txt)$'])
+
+        # only what differs is sent, existing directories keep their modes
+        self.assertEqual(sorted(self.archive_members), ['dir/sub', 'dir/sub/a.txt'])
+        unarchive_args = self.action._execute_module.call_args_list[1][1]['module_args']
+        self.assertEqual(unarchive_args, dict(src='/tmp/ansible-tmp-path/source.tar.gz', dest='/dest/', remote_src=True))
+
+    def test_copy_in_bulk_missing_dest(self):
+        find_return = dict(files=[], msg='/dest/ was skipped as it does not seem to be a valid directory or it cannot be accessed\n')
+        self.action._execute_module = MagicMock(side_effect=[find_return, dict(changed=True), dict(changed=True)])
+
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(changed=True))
+        file_args = self.action._execute_module.call_args_list[1][1]['module_args']
+        self.assertEqual((file_args['path'], file_args['state']), ('/dest/', 'directory'))
+        self.assertEqual(sorted(self.archive_members), ['dir', 'dir/empty', 'dir/sub', 'dir/sub/a.txt', 'top.txt'])
+
+    def test_copy_in_bulk_unchanged(self):
+        find_return = dict(files=[dict(path='/dest/top.txt', checksum=checksum(os.path.join(self.src, 'top.txt'))),
+                                  dict(path='/dest/dir/sub/a.txt', checksum=checksum(os.path.join(self.src, 'dir', 'sub', 'a.txt')))],
+                           msg='')
+        self.action._execute_module = MagicMock(side_effect=[find_return])
+
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(changed=False))
+        self.assertEqual(self.action._execute_module.call_count, 1)
+
+    def test_copy_in_bulk_attributes(self):
+        # dest already has the content, but not the mode or owner of the task
+        self.task.args.update(mode='0644', directory_mode='0755', owner='alice')
+        top_stat = dict(path='/dest/top.txt', checksum=checksum(os.path.join(self.src, 'top.txt')), mode='0644', pw_name='bob', uid=1001)
+        a_stat = dict(path='/dest/dir/sub/a.txt', checksum=checksum(os.path.join(self.src, 'dir', 'sub', 'a.txt')), mode='0600',
+                      pw_name='alice', uid=1000)
+        dir_stats = [dict(path='/dest/dir', mode='0755', pw_name='alice', uid=1000), dict(path='/dest/dir/sub', mode='0700', pw_name='alice', uid=1000),
+                     dict(path='/dest/dir/empty', mode='0755', pw_name='', uid=1000)]
+        self.action._execute_module_batch = MagicMock(return_value=[dict(files=[top_stat, a_stat], msg=''), dict(files=dir_stats, msg='')])
+        self.action._execute_module = MagicMock(return_value=dict(changed=True))
+
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(changed=True))
+        (file_find, dir_find) = self.action._execute_module_batch.call_args[0][0]
+        self.assertEqual(file_find[1]['file_type'], 'file')
+        self.assertEqual(dir_find[1]['file_type'], 'directory')
+        self.assertEqual(dir_find[1]['patterns'], [r'(?:dir|empty|sub)$'])
+
+        # the paths which differ are sent again for unarchive to set them
+        self.assertEqual(sorted(self.archive_members), ['dir/empty', 'dir/sub', 'dir/sub/a.txt', 'top.txt'])
+        self.assertEqual(self.archive_members['dir/sub'].mode, 0o755)
+        unarchive_args = self.action._execute_module.call_args[1]['module_args']
+        self.assertEqual(unarchive_args['owner'], 'alice')
+
+        # owners are also matched by id
+        self.task.args['owner'] = '1000'
+        top_stat.update(pw_name='alice', uid=1000)
+        a_stat['mode'] = '0644'
+        dir_stats[1]['mode'] = '0755'
+        self.action._execute_module = MagicMock()
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(changed=False))
+        self.assertFalse(self.action._execute_module.called)
+
+        # the local modes are enforced with mode=preserve
+        self.task.args['mode'] = 'preserve'
+        os.chmod(os.path.join(self.src, 'top.txt'), 0o644)
+        self.action._execute_module = MagicMock(return_value=dict(changed=True))
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(changed=True))
+        self.assertEqual(sorted(self.archive_members), ['dir/sub/a.txt'])
+
+    def test_copy_in_bulk_fallback(self):
+        find_return = dict(files=[], msg='')
+        unarchive_return = dict(failed=True, msg='Failed to find handler for "/tmp/ansible-tmp-path/source.tar.gz". Make sure the required '
+                                                 'command to extract the file is installed.')
+        self.action._execute_module = MagicMock(side_effect=[find_return, unarchive_return])
+
+        # the files are then copied one at a time
+        self.assertIsNone(self.action._copy_in_bulk(self.source_files, '/dest/', {}))
+
+        # other failures are reported
+        self.action._execute_module = MagicMock(side_effect=[find_return, dict(failed=True, msg='boom')])
+        self.assertEqual(self.action._copy_in_bulk(self.source_files, '/dest/', {}), dict(failed=True, msg='boom'))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from ansible.compat.tests import unittest
+from ansible.compat.tests.mock import patch, MagicMock
+from ansible.errors import AnsibleError
+from ansible.module_utils._text import to_text
+from ansible.playbook.play_context import PlayContext
+from ansible.plugins.action.fetch import ActionModule
+from ansible.plugins.loader import shell_loader
+from ansible.utils.hashing import checksum_s
+
+
+def run_locally(cmd):
+    p = subprocess.Popen(['/bin/sh', '-c', cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (stdout, stderr) = p.communicate()
+    return dict(rc=p.returncode, stdout=to_text(stdout), stderr=to_text(stderr))
+
+
+class TestFetchChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dest = os.path.join(self.tmpdir, 'dest')
+
+        connection = MagicMock()
+        connection._shell = shell_loader.get('sh')
+        self.action = ActionModule(MagicMock(), connection, PlayContext(), None, None, None)
+        self.action._low_level_execute_command = MagicMock(side_effect=run_locally)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def fetch(self, data, chunk_size):
+        source = os.path.join(self.tmpdir, 'source')
+        with open(source, 'wb') as f:
+            f.write(data)
+
+        with patch('ansible.plugins.action.fetch.C') as mock_constants:
+            mock_constants.FETCH_CHUNK_SIZE = chunk_size
+            self.assertEqual(self.action._fetch_chunks(source, self.dest), checksum_s(data))
+        with open(self.dest, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_fetch_chunks(self):
+        self.fetch(os.urandom(2500), 1000)
+        self.assertEqual(self.action._low_level_execute_command.call_count, 3)
+
+    def test_fetch_chunks_multiple_of_chunk_size(self):
+        # the end of the file is only known from the empty chunk after it
+        self.fetch(os.urandom(3000), 1000)
+        self.assertEqual(self.action._low_level_execute_command.call_count, 4)
+
+    def test_fetch_chunks_large(self):
+        # tail is stopped by SIGPIPE when head has read a chunk
+        self.fetch(os.urandom(300000), 100000)
+
+    def test_fetch_chunks_empty(self):
+        self.fetch(b'', 1000)
+        self.assertEqual(self.action._low_level_execute_command.call_count, 1)
+
+    def test_fetch_chunks_failure(self):
+        # a failing tail is not mistaken for the end of the file
+        with patch('ansible.plugins.action.fetch.C') as mock_constants:
+            mock_constants.FETCH_CHUNK_SIZE = 1000
+            self.assertRaises(AnsibleError, self.action._fetch_chunks, os.path.join(self.tmpdir, 'missing'), self.dest)
+            self.assertRaises(AnsibleError, self.action._fetch_chunks, self.tmpdir, self.dest)
+
+        self.action._low_level_execute_command = MagicMock(return_value=dict(rc=0, stdout='not base64!', stderr=''))
+        with patch('ansible.plugins.action.fetch.C') as mock_constants:
+            mock_constants.FETCH_CHUNK_SIZE = 1000
+            self.assertRaises(AnsibleError, self.action._fetch_chunks, os.path.join(self.tmpdir, 'source'), self.dest)
@@ -153,3 +153,44 @@ class TestConnectionClass(unittest.TestCase):
         with self.assertRaises(AnsibleConnectionFailure) as exc:
             conn.send(b'command', None, None, None)
         self.assertEqual(str(exc.exception), 'ERROR: error message device#')
+
+    def test_network_cli_send_batch(self):
+        pc = PlayContext()
+        new_stdin = StringIO()
+        conn = network_cli.Connection(pc, new_stdin)
+        mock__terminal = MagicMock()
+        mock__terminal.terminal_stdout_re = [re.compile(br'[\r\n]?\w+# ?$')]
+        mock__terminal.terminal_stderr_re = [re.compile(b'^ERROR', re.M)]
+        conn._terminal = mock__terminal
+
+        mock__shell = MagicMock()
+        conn._ssh_shell = mock__shell
+
+        response = (b"show version\r\nversion 1.0\r\n"
+                    b"device#show clock\r\n12:00:00\r\nsecond line\r\n"
+                    b"device#show hostname\r\ndevice\r\n"
+                    b"device#")
+        # the output is received in chunks which do not end at line boundaries
+        mock__shell.recv.side_effect = [response[i:i + 7] for i in range(0, len(response), 7)]
+
+        output = conn.send_batch([b'show version', b'show clock', b'show hostname'])
+
+        mock__shell.sendall.assert_called_with(b'show version\rshow clock\rshow hostname\r')
+        self.assertEqual(output, ['version 1.0', '12:00:00\nsecond line', 'device'])
+
+        response = (b"show version\r\nversion 1.0\r\n"
+                    b"device#bad command\r\nERROR: invalid command\r\n"
+                    b"device#show hostname\r\ndevice\r\n"
+                    b"device#")
+        mock__shell.recv.side_effect = [response]
+
+        output = conn.send_batch([b'show version', b'bad command', b'show hostname'], check_rc=False)
+        self.assertEqual(output, ['version 1.0', 'device#bad command\nERROR: invalid command', 'device'])
+
+        # all the output is received before the error is raised
+        mock__shell.reset_mock()
+        mock__shell.recv.side_effect = [response, b'']
+        with self.assertRaises(AnsibleConnectionFailure) as exc:
+            conn.send_batch([b'show version', b'bad command', b'show hostname'])
+        self.assertEqual(str(exc.exception), 'device#bad command\nERROR: invalid command')
+        self.assertEqual(mock__shell.recv.call_count, 1)
@@ -0,0 +1,83 @@
+# Copyright (c) 2018 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pickle
+
+from ansible.compat.tests import unittest
+from ansible.inventory.data import InventoryData
+
+
+class TestInventoryDataGroupsDict(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = InventoryData()
+        for group in ('web', 'db', 'prod', 'dc'):
+            self.inventory.add_group(group)
+        self.inventory.add_child('prod', 'web')
+        self.inventory.add_child('prod', 'db')
+        self.inventory.add_child('dc', 'prod')
+        for (host, group) in (('web2', 'web'), ('web1', 'web'), ('db1', 'db'), ('mon1', None)):
+            self.inventory.add_host(host, group)
+        self.inventory.reconcile_inventory()
+
+    def assertMatchesGroups(self):
+        groups = dict((name, [h.name for h in group.get_hosts()]) for (name, group) in self.inventory.groups.items())
+        self.assertEqual(self.inventory.get_groups_dict(), groups)
+
+    def test_get_groups_dict(self):
+        groups = self.inventory.get_groups_dict()
+        self.assertEqual(set(groups['dc']), set(['web2', 'web1', 'db1']))
+        self.assertEqual(set(groups['all']), set(['web2', 'web1', 'db1', 'mon1']))
+        self.assertEqual(groups['ungrouped'], ['mon1'])
+        self.assertEqual(list(groups), list(self.inventory.groups))
+        self.assertMatchesGroups()
+
+    def test_group_order(self):
+        # the hosts of a group keep the order of the group, not the one they were first added to the inventory in
+        self.inventory.add_group('other')
+        self.inventory.add_host('a', 'other')
+        self.inventory.add_host('b', 'web')
+        self.inventory.add_host('a', 'web')
+        self.assertEqual(self.inventory.get_groups_dict()['web'], ['web2', 'web1', 'b', 'a'])
+        self.assertMatchesGroups()
+
+    def test_incremental_updates(self):
+        groups = self.inventory.get_groups_dict()
+
+        self.inventory.add_host('db2', 'db')
+        self.inventory.add_group('cache')
+        self.inventory.add_host('cache1', 'cache')
+        self.inventory.add_child('dc', 'cache')
+        new_groups = self.inventory.get_groups_dict()
+        self.assertEqual(set(new_groups['dc']), set(['web2', 'web1', 'db1', 'db2', 'cache1']))
+        self.assertMatchesGroups()
+
+        # a new dict is returned, only the entries of the changed groups and their ancestors are rebuilt
+        self.assertIsNot(new_groups, groups)
+        self.assertIs(new_groups['web'], groups['web'])
+        self.assertIsNot(new_groups['prod'], groups['prod'])
+        self.assertIs(self.inventory.get_groups_dict(), new_groups)
+
+    def test_direct_group_changes(self):
+        self.inventory.get_groups_dict()
+
+        # groups changed without going through the inventory are picked up too
+        self.inventory.groups['web'].add_host(self.inventory.hosts['mon1'])
+        self.assertIn('mon1', self.inventory.get_groups_dict()['dc'])
+        self.inventory.groups['web'].remove_host(self.inventory.hosts['web1'])
+        self.assertNotIn('web1', self.inventory.get_groups_dict()['prod'])
+        self.assertMatchesGroups()
+
+    def test_implicit_localhost(self):
+        self.inventory.get_host('localhost')
+        self.assertNotIn('localhost', self.inventory.get_groups_dict()['all'])
+
+    def test_pickle(self):
+        self.inventory.get_groups_dict()
+        self.inventory.add_host('db2', 'db')
+        inventory = pickle.loads(pickle.dumps(self.inventory))
+        self.assertEqual(inventory.get_groups_dict(), self.inventory.get_groups_dict())
@@ -112,6 +112,31 @@ class TestInventory(unittest.TestCase):
                 )
             )
 
+    def test_get_hosts_patterns(self):
+        for group in ('web', 'db', 'prod'):
+            self.i.add_group(group)
+        for (host, groups) in (('web1', ('web', 'prod')), ('db1', ('db', 'prod')), ('web2', ('web',)), ('db2', ('db',))):
+            for group in groups:
+                self.i.add_host(host, group)
+        self.i.reconcile_inventory()
+
+        for (pattern, expected) in (
+                ('web:db', ['web1', 'web2', 'db1', 'db2']),
+                ('db2:web', ['db2', 'web1', 'web2']),
+                ('web:db:&prod', ['web1', 'db1']),
+                ('&prod:!web', ['db1']),
+                ('web*:db2:web1', ['web1', 'web2', 'db2']),
+                ('web[1]:&prod', [])):
+            self.assertEqual([h.name for h in self.i.get_hosts(pattern)], expected, pattern)
+
+        # groups with children list the hosts of their descendants in no set order
+        self.assertEqual(set(h.name for h in self.i.get_hosts('all:!prod')), set(['web2', 'db2']))
+
+        self.i.subset('prod:!db')
+        self.assertEqual([h.name for h in self.i.get_hosts('all')], ['web1'])
+        self.i.subset(None)
+        self.assertEqual(len(self.i.get_hosts('all')), 4)
+
 
 class TestInventoryPlugins(unittest.TestCase):
 
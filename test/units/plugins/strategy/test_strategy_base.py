@@ -25,8 +25,8 @@ import uuid
 
 from ansible.compat.tests import unittest
 from ansible.compat.tests.mock import patch, MagicMock
-from ansible.errors import AnsibleError, AnsibleParserError
-from ansible.executor.process.worker import WorkerProcess
+from ansible.errors import AnsibleConnectionFailure, AnsibleError, AnsibleParserError
+from ansible.executor.process.worker import PoolWorkerProcess, WorkerProcess
 from ansible.executor.task_queue_manager import TaskQueueManager
 from ansible.executor.task_result import TaskResult
 from ansible.inventory.host import Host
@@ -225,6 +225,116 @@ class TestStrategyBase(unittest.TestCase):
         finally:
             tqm.cleanup()
 
+    @patch('ansible.executor.task_queue_manager.multiprocessing.Pipe')
+    @patch('ansible.executor.task_queue_manager.PoolWorkerProcess')
+    @patch('ansible.executor.task_queue_manager.C.WORKER_POOL', True)
+    @patch('ansible.plugins.strategy.C.WORKER_POOL', True)
+    def test_strategy_base_queue_task_worker_pool(self, mock_pool_worker, mock_pipe):
+        mock_pipe.side_effect = lambda duplex: (MagicMock(), MagicMock())
+        mock_pool_worker.WORKER_IDLE = PoolWorkerProcess.WORKER_IDLE
+        mock_pool_worker.WORKER_BUSY = PoolWorkerProcess.WORKER_BUSY
+        mock_pool_worker.WORKER_RETIRING = PoolWorkerProcess.WORKER_RETIRING
+
+        fake_loader = DictDataLoader()
+        mock_var_manager = MagicMock()
+        mock_host = MagicMock()
+        mock_host.name = 'host01'
+        mock_inventory = MagicMock()
+        mock_options = MagicMock()
+        mock_options.module_path = None
+
+        tqm = TaskQueueManager(
+            inventory=mock_inventory,
+            variable_manager=mock_var_manager,
+            loader=fake_loader,
+            options=mock_options,
+            passwords=None,
+        )
+        tqm._initialize_processes(2)
+        tqm.hostvars = dict()
+
+        # one worker is started per slot up front
+        self.assertEqual(mock_pool_worker.call_count, 2)
+        self.assertEqual(list(tqm._worker_states), [PoolWorkerProcess.WORKER_IDLE] * 2)
+
+        mock_task = MagicMock()
+        mock_task._uuid = 'abcd'
+
+        try:
+            strategy_base = StrategyBase(tqm=tqm)
+            strategy_base._queue_task(host=mock_host, task=mock_task, task_vars=dict(), play_context=MagicMock())
+            self.assertEqual(strategy_base._cur_worker, 1)
+            self.assertEqual(strategy_base._pending_results, 1)
+            self.assertEqual(list(tqm._worker_states), [PoolWorkerProcess.WORKER_BUSY, PoolWorkerProcess.WORKER_IDLE])
+
+            # busy workers are skipped, and no new processes are started
+            strategy_base._queue_task(host=mock_host, task=mock_task, task_vars=dict(), play_context=MagicMock())
+            self.assertEqual(strategy_base._cur_worker, 0)
+            self.assertEqual(strategy_base._pending_results, 2)
+            self.assertEqual(mock_pool_worker.call_count, 2)
+
+            # a retiring worker is replaced before it is handed the next task
+            tqm._worker_states[0] = PoolWorkerProcess.WORKER_RETIRING
+            strategy_base._queue_task(host=mock_host, task=mock_task, task_vars=dict(), play_context=MagicMock())
+            self.assertEqual(strategy_base._cur_worker, 1)
+            self.assertEqual(strategy_base._pending_results, 3)
+            self.assertEqual(mock_pool_worker.call_count, 3)
+            self.assertEqual(tqm._worker_states[0], PoolWorkerProcess.WORKER_BUSY)
+        finally:
+            tqm.cleanup()
+
+    @patch('ansible.plugins.strategy.connection_loader')
+    def test_strategy_base_prewarm_connections(self, mock_connection_loader):
+        mock_hosts = []
+        for i in range(3):
+            mock_host = MagicMock(Host)
+            mock_host.name = 'host%02d' % i
+            mock_hosts.append(mock_host)
+
+        def _get_connection(name, play_context, new_stdin):
+            connection = MagicMock()
+            connection._load_name = name
+            if play_context.remote_addr == 'host01':
+                connection.exec_command.side_effect = AnsibleConnectionFailure('connection refused')
+            return connection
+        mock_connection_loader.get.side_effect = _get_connection
+
+        def _override(task, variables, templar):
+            host_play_context = MagicMock()
+            host_play_context.connection = 'ssh' if variables['inventory_hostname'] != 'host02' else 'local'
+            host_play_context.remote_addr = variables['inventory_hostname']
+            return host_play_context
+        mock_play_context = MagicMock()
+        mock_play_context.set_task_and_variable_override.side_effect = _override
+
+        mock_var_mgr = MagicMock()
+        mock_var_mgr.get_vars.side_effect = lambda play, host, task: dict(inventory_hostname=host.name)
+
+        mock_iterator = MagicMock()
+        mock_iterator._play._removed_hosts = []
+
+        mock_tqm = MagicMock(TaskQueueManager)
+        mock_tqm._final_q = Queue.Queue()
+        mock_tqm._options = MagicMock()
+        mock_tqm._notified_handlers = {}
+        mock_tqm._listening_handlers = {}
+        mock_tqm._unreachable_hosts = {}
+        mock_tqm._stats = MagicMock()
+        mock_tqm.get_variable_manager.return_value = mock_var_mgr
+        mock_tqm.get_loader.return_value = DictDataLoader()
+
+        strategy_base = StrategyBase(tqm=mock_tqm)
+        strategy_base.get_hosts_left = MagicMock(return_value=mock_hosts)
+        strategy_base.prewarm_connections(mock_iterator, mock_play_context)
+
+        # only the hosts using ssh are connected to, the unreachable one is removed from the play
+        self.assertEqual(mock_connection_loader.get.call_count, 2)
+        self.assertEqual(mock_tqm._unreachable_hosts, {'host01': True})
+        self.assertEqual(mock_iterator._play._removed_hosts, ['host01'])
+        callbacks = sorted((c[1][0], c[1][1]._host.name) for c in mock_tqm.send_callback.mock_calls if c[1][0].startswith('v2_runner'))
+        self.assertEqual(callbacks, [('v2_runner_on_ok', 'host00'), ('v2_runner_on_unreachable', 'host01')])
+        strategy_base.cleanup()
+
     def test_strategy_base_process_pending_results(self):
         mock_tqm = MagicMock()
         mock_tqm._terminated = False
@@ -181,3 +181,85 @@ class TestStrategyLinear(unittest.TestCase):
         host2_task = hosts_tasks[1][1]
         self.assertIsNone(host1_task)
         self.assertIsNone(host2_task)
+
+    @patch('ansible.playbook.role.definition.unfrackpath', mock_unfrackpath_noop)
+    def test_task_batch(self):
+        fake_loader = DictDataLoader({
+            "test_play.yml": """
+            - hosts: all
+              gather_facts: no
+              tasks:
+                - file: path=/tmp/a state=directory
+                - lineinfile: path=/tmp/a/b line=b create=yes
+                - stat: path=/tmp/a/b
+                - command: /bin/true
+                - file: path=/tmp/c state=directory
+                - stat: path=/tmp/c
+                  when: inventory_hostname == 'host00'
+                - file: path=/tmp/d state=directory
+                - stat: path={{ item }}
+            """,
+        })
+
+        mock_var_manager = MagicMock()
+        mock_var_manager._fact_cache = dict()
+        mock_var_manager.get_vars.return_value = dict()
+
+        p = Playbook.load('test_play.yml', loader=fake_loader, variable_manager=mock_var_manager)
+
+        host = MagicMock()
+        host.name = host.get_name.return_value = 'host00'
+
+        inventory = MagicMock()
+        inventory.get_hosts.return_value = [host]
+        inventory.filter_hosts.return_value = [host]
+
+        itr = PlayIterator(
+            inventory=inventory,
+            play=p._entries[0],
+            play_context=PlayContext(play=p._entries[0]),
+            variable_manager=mock_var_manager,
+            all_vars=dict(),
+        )
+
+        mock_options = MagicMock()
+        mock_options.module_path = None
+        mock_options.step = False
+
+        tqm = TaskQueueManager(
+            inventory=inventory,
+            variable_manager=mock_var_manager,
+            loader=fake_loader,
+            options=mock_options,
+            passwords=None,
+        )
+        tqm._initialize_processes(1)
+        strategy = StrategyModule(tqm)
+
+        def next_task():
+            return strategy._get_next_task_lockstep([host], itr)[0][1]
+
+        # implicit meta: flush_handlers
+        self.assertEqual(next_task().action, 'meta')
+
+        task = next_task()
+        self.assertEqual(strategy._get_task_batch(itr, host, task), [])
+
+        with patch('ansible.plugins.strategy.C.TASK_BATCH_SIZE', 5):
+            # command has an action plugin of its own
+            self.assertEqual([t.action for t in strategy._get_task_batch(itr, host, task)], ['lineinfile', 'stat'])
+            # looking ahead does not move the host along
+            self.assertEqual(next_task().action, 'lineinfile')
+            self.assertEqual(next_task().action, 'stat')
+            self.assertEqual(strategy._get_task_batch(itr, host, next_task()), [])
+
+            # conditionals and templated arguments may depend on earlier results
+            self.assertEqual(strategy._get_task_batch(itr, host, next_task()), [])
+            self.assertEqual(next_task().action, 'stat')
+            self.assertEqual(strategy._get_task_batch(itr, host, next_task()), [])
+
+        with patch('ansible.plugins.strategy.C.TASK_BATCH_SIZE', 2):
+            itr = PlayIterator(inventory=inventory, play=p._entries[0], play_context=PlayContext(play=p._entries[0]),
+                               variable_manager=mock_var_manager, all_vars=dict())
+            next_task()
+            self.assertEqual([t.action for t in strategy._get_task_batch(itr, host, next_task())], ['lineinfile'])
@@ -0,0 +1,73 @@
+# Copyright (c) 2018 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import tempfile
+
+from ansible.compat.tests import unittest
+from ansible.compat.tests.mock import patch
+from ansible.inventory.group import Group
+from ansible.inventory.host import Host
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.vars import host_group_vars
+
+
+class TestHostGroupVars(unittest.TestCase):
+
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        self.files = {
+            'group_vars/all.yml': 'from_all: 1\nshared: all\n',
+            'group_vars/web/main.yml': 'from_web: 1\nshared: web\n',
+            'group_vars/web/.hidden.yml': 'hidden: 1\n',
+            'host_vars/host1': 'from_host1: 1\n',
+            'host_vars/host2.json': '{"from_host2": 1}\n',
+        }
+        for (name, content) in self.files.items():
+            path = os.path.join(self.basedir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(content)
+
+        self.loader = DataLoader()
+        self.plugin = host_group_vars.VarsModule()
+
+        patcher = patch.multiple(host_group_vars, FOUND={}, INDEX={}, REALPATHS={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.basedir)
+
+    def test_get_vars(self):
+        groups = [Group('all'), Group('web'), Group('db')]
+        self.assertEqual(self.plugin.get_vars(self.loader, self.basedir, groups),
+                         dict(from_all=1, from_web=1, shared='web'))
+        self.assertEqual(self.plugin.get_vars(self.loader, self.basedir, Host('host1')), dict(from_host1=1))
+        self.assertEqual(self.plugin.get_vars(self.loader, self.basedir, Host('host3')), dict())
+
+    def test_get_vars_for_entities(self):
+        hosts = [Host('host1'), Host('host2'), Host('host3')]
+        self.assertEqual(self.plugin.get_vars_for_entities(self.loader, self.basedir, hosts),
+                         dict(host1=dict(from_host1=1), host2=dict(from_host2=1), host3=dict()))
+
+    def test_directory_listed_once(self):
+        hosts = [Host('host%d' % i) for i in range(10)]
+        with patch.object(self.loader, 'list_directory', wraps=self.loader.list_directory) as list_directory:
+            with patch.object(self.loader, 'find_vars_files', wraps=self.loader.find_vars_files) as find_vars_files:
+                self.plugin.get_vars(self.loader, self.basedir, hosts)
+                self.plugin.get_vars(self.loader, self.basedir, hosts)
+
+        list_directory.assert_called_once_with(os.path.realpath(os.path.join(self.basedir, 'host_vars')))
+        # only the hosts with vars files are looked up
+        self.assertEqual(find_vars_files.call_count, 2)
+
+    def test_missing_directory(self):
+        shutil.rmtree(os.path.join(self.basedir, 'host_vars'))
+        self.assertEqual(self.plugin.get_vars(self.loader, self.basedir, Host('host1')), dict())
@@ -27,7 +27,7 @@ from ansible.compat.tests.mock import patch
 from ansible import constants as C
 from ansible.errors import AnsibleError, AnsibleUndefinedVariable
 from ansible.module_utils.six import string_types
-from ansible.template import Templar, AnsibleContext, AnsibleEnvironment
+from ansible.template import Templar, AnsibleContext, AnsibleEnvironment, TemplateCache
 from ansible.utils.unsafe_proxy import AnsibleUnsafe, wrap_var
 from units.mock.loader import DictDataLoader
 
@@ -201,6 +201,19 @@ class TestTemplarTemplate(BaseTemplar, unittest.TestCase):
                                 self.templar.template,
                                 data)
 
+    def test_template_reference(self):
+        with patch.object(self.templar, 'do_template') as mock_do_template:
+            self.assertEqual(self.templar.template("{{ foo }}"), "bar")
+            self.assertEqual(self.templar.template("{{ var_dict.a }}"), "b")
+        self.assertFalse(mock_do_template.called)
+
+        # anything jinja2 would change still goes through it
+        self.assertEqual(self.templar.template("{{ bam }}"), "bar")
+        self.assertEqual(self.templar.template("{{ foo }}\n"), "bar\n")
+        self.assertEqual(self.templar.template("{{ bad_dict }}"), "{a='b'")
+        self.assertTrue(self.is_unsafe(self.templar.template("{{ some_unsafe_var }}")))
+        self.assertRaises(AnsibleUndefinedVariable, self.templar.template, "{{ var_dict.c }}")
+
 
 class TestTemplarCleanData(BaseTemplar, unittest.TestCase):
     def test_clean_data(self):
@@ -304,6 +317,66 @@ class TestTemplarMisc(BaseTemplar, unittest.TestCase):
             C.DEFAULT_JINJA2_EXTENSIONS = old_exts
 
 
+class TestTemplateCache(BaseTemplar, unittest.TestCase):
+    def setUp(self):
+        super(TestTemplateCache, self).setUp()
+        patcher = patch.object(Templar, 'template_cache', TemplateCache(2))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shared_between_templars(self):
+        other = Templar(loader=self.fake_loader, variables=dict(foo='baz'))
+        self.assertEqual(self.templar.do_template("{{ foo }}"), "bar")
+        self.assertEqual(other.do_template("{{ foo }}"), "baz")
+        self.assertEqual(self.cache.info(), dict(hits=1, misses=1, size=1, max_size=2))
+
+    def test_key(self):
+        self.assertEqual(self.templar.do_template("\\{{ foo }}", escape_backslashes=True), "\\bar")
+        self.assertEqual(self.templar.do_template("\\{{ foo }}", escape_backslashes=False), "\\bar")
+        self.assertEqual(self.cache.hits, 0)
+        self.assertNotEqual(TemplateCache.make_key("{{ foo }}", True, self.templar.environment),
+                            TemplateCache.make_key("{{ foo }}", True, self.templar.environment.overlay(trim_blocks=False)))
+
+    def test_key_environment(self):
+        # the template action changes the environment of its templar
+        data = "{% if foo %}\nfoo\n{% endif %}\n{% if foo %}\nbar{% endif %}"
+        self.assertEqual(self.templar.do_template(data), "foo\nbar")
+        self.templar.environment.trim_blocks = False
+        self.assertEqual(self.templar.do_template(data), "\nfoo\n\n\nbar")
+
+        other = Templar(loader=self.fake_loader, variables=dict(x=True))
+        other.environment.variable_start_string = '[['
+        other.environment.variable_end_string = ']]'
+        self.assertEqual(other.do_template("{{ x }} [[ x ]]"), "{{ x }} True")
+        other = Templar(loader=self.fake_loader, variables=dict(x=True))
+        self.assertEqual(other.do_template("{{ x }} [[ x ]]"), "True [[ x ]]")
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_least_recently_used_dropped(self):
+        for data in ("{{ foo }}", "{{ num }}", "{{ foo }}", "{{ some_var }}", "{{ foo }}", "{{ num }}"):
+            self.templar.do_template(data)
+        self.assertEqual(self.cache.info(), dict(hits=2, misses=4, size=2, max_size=2))
+
+    def test_syntax_error_not_cached(self):
+        self.assertRaises(AnsibleError, self.templar.do_template, "{{ foo")
+        self.assertRaises(AnsibleError, self.templar.do_template, "{{ foo")
+        self.assertEqual(self.cache.info()['size'], 0)
+
+    def test_compile_templates(self):
+        self.cache.max_size = 10
+        self.templar.compile_templates(dict(a=["{{ foo }}", "plain", "{{ foo"], b="{{ num }}"))
+        self.assertEqual(self.cache.info()['size'], 2)
+        self.assertEqual(self.templar.template("{{ foo }}-{{ num }}", cache=False), "bar-1")
+        self.assertEqual(self.templar.do_template("{{ num }}"), "1")
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_disabled(self):
+        self.cache.max_size = 0
+        self.templar.compile_templates("{{ foo }}")
+        self.assertEqual(self.templar.do_template("{{ foo }}"), "bar")
+        self.assertEqual(self.cache.info(), dict(hits=0, misses=0, size=0, max_size=0))
+
+
 class TestTemplarLookup(BaseTemplar, unittest.TestCase):
     def test_lookup_missing_plugin(self):
         self.assertRaisesRegexp(AnsibleError,
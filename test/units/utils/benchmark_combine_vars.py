@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Times folding layers of variables with combine_vars() against VarsCombiner, for both hash behaviours."""
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import os
+import sys
+import timeit
+
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+ANSIBLE_PATH = os.path.join(BASE_PATH, 'lib')
+
+if ANSIBLE_PATH not in sys.path:
+    sys.path.insert(0, ANSIBLE_PATH)
+
+from ansible import constants as C
+from ansible.utils.vars import combine_vars, VarsCombiner
+
+
+def build_layers(layers, facts):
+    '''
+    Builds layers looking like the ones of VariableManager.get_vars(): a large
+    one holding the facts injected as variables, followed by small ones, some
+    of which update a nested dict.
+    '''
+
+    fact_layer = dict(('ansible_fact%d' % i, dict(value=i, items=list(range(5)))) for i in range(facts))
+    fact_layer['ansible_facts'] = dict(fact_layer)
+
+    result = [dict(role_default='value', settings=dict(a=1, b=2)), fact_layer]
+    for i in range(layers):
+        result.append({'layer%d' % i: i, 'settings': dict(layer=i)})
+    return result
+
+
+def fold_combine_vars(layers):
+    data = dict()
+    for layer in layers:
+        data = combine_vars(data, layer)
+    return data
+
+
+def fold_combiner(layers):
+    combiner = VarsCombiner()
+    for layer in layers:
+        combiner.combine(layer)
+    return combiner.vars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--layers', type=int, default=15)
+    parser.add_argument('--facts', type=int, default=1000)
+    parser.add_argument('--number', type=int, default=1000)
+    args = parser.parse_args()
+
+    layers = build_layers(args.layers, args.facts)
+
+    print('%d layers, %d facts' % (len(layers), args.facts))
+    for behaviour in ('replace', 'merge'):
+        C.DEFAULT_HASH_BEHAVIOUR = behaviour
+        for func in (fold_combine_vars, fold_combiner):
+            elapsed = timeit.timeit(lambda: func(layers), number=args.number)
+            print('%-8s %-18s %8.1fus per fold' % (behaviour, func.__name__, elapsed * 1e6 / args.number))
+
+
+if __name__ == '__main__':
+    main()
@@ -20,11 +20,12 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import copy
 from collections import defaultdict
 
 from ansible.compat.tests import mock, unittest
 from ansible.errors import AnsibleError
-from ansible.utils.vars import combine_vars, merge_hash
+from ansible.utils.vars import combine_vars, merge_hash, VarsCombiner
 
 
 class TestVariableUtils(unittest.TestCase):
@@ -96,3 +97,40 @@ class TestVariableUtils(unittest.TestCase):
         with mock.patch('ansible.constants.DEFAULT_HASH_BEHAVIOUR', 'merge'):
             for test in self.test_merge_data:
                 self.assertEqual(combine_vars(test['a'], test['b']), test['result'])
+
+    test_layers = (
+        dict(a=1, c=dict(foo='bar', nested=dict(x=1)), d=[1, 2]),
+        dict(b=2, c=dict(baz='bam', nested=dict(y=2))),
+        dict(c=dict(nested=dict(x=3)), d=dict(e=1)),
+        dict(c=dict(nested=dict(x=3))),
+        dict(c='replaced', d=dict(f=2)),
+        dict(c=dict(again=True), d=dict(e=1, f=2)),
+    )
+
+    def _check_combiner(self):
+        layers = copy.deepcopy(self.test_layers)
+
+        expected = dict()
+        for layer in layers:
+            expected = combine_vars(expected, layer)
+
+        combiner = VarsCombiner()
+        for layer in layers:
+            combiner.combine(layer)
+
+        self.assertEqual(combiner.vars, expected)
+        self.assertEqual(list(combiner.vars.keys()), list(expected.keys()))
+        # the layers themselves are never modified
+        self.assertEqual(layers, self.test_layers)
+
+    def test_vars_combiner_replace(self):
+        with mock.patch('ansible.constants.DEFAULT_HASH_BEHAVIOUR', 'replace'):
+            self._check_combiner()
+
+    def test_vars_combiner_merge(self):
+        with mock.patch('ansible.constants.DEFAULT_HASH_BEHAVIOUR', 'merge'):
+            self._check_combiner()
+
+    def test_vars_combiner_improper_args(self):
+        with self.assertRaises(AnsibleError):
+            VarsCombiner(dict(a=1)).combine([1, 2, 3])
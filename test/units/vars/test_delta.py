@@ -0,0 +1,91 @@
+# Copyright (c) 2018 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.compat.tests import unittest
+from ansible.utils.unsafe_proxy import AnsibleUnsafeText
+from ansible.vars.delta import apply_vars_delta, diff_vars, vars_equal
+
+
+def _with_vars(variables):
+    variables['vars'] = variables.copy()
+    return variables
+
+
+class TestVarsEqual(unittest.TestCase):
+
+    def test_nested(self):
+        self.assertTrue(vars_equal({'a': [1, {'b': u'c'}]}, {'a': [1, {'b': u'c'}]}))
+        self.assertFalse(vars_equal({'a': [1, {'b': u'c'}]}, {'a': [1, {'b': u'd'}]}))
+        self.assertFalse(vars_equal({'a': 1}, {'a': 1, 'b': 2}))
+        self.assertFalse(vars_equal([1, 2], (1, 2)))
+
+    def test_unsafe_is_not_equal_to_text(self):
+        self.assertFalse(vars_equal(u'foo', AnsibleUnsafeText(u'foo')))
+        self.assertFalse(vars_equal({'a': [u'foo']}, {'a': [AnsibleUnsafeText(u'foo')]}))
+
+    def test_other_objects_compare_by_identity(self):
+        obj = object()
+        self.assertTrue(vars_equal(obj, obj))
+        self.assertFalse(vars_equal(set([1]), set([1])))
+
+
+class TestVarsDelta(unittest.TestCase):
+
+    def _roundtrip(self, old, new, skip=(), fill=None):
+        delta = diff_vars(old, new, skip=skip)
+        result = apply_vars_delta(old, delta, fill=fill)
+        return (delta, result)
+
+    def test_only_changes_are_shipped(self):
+        facts = {'ansible_facts': {'os': u'linux', 'mounts': [{'mount': u'/'}]}}
+        old = _with_vars(dict(facts, foo=1, bar=2))
+        new = _with_vars(dict({'ansible_facts': {'os': u'linux', 'mounts': [{'mount': u'/'}]}}, foo=1, baz=3))
+
+        ((changed, removed, filled, vars_view), result) = self._roundtrip(old, new)
+        self.assertEqual(changed, {'baz': 3})
+        self.assertEqual(removed, ['bar'])
+        self.assertEqual(vars_view, ([], {}))
+        self.assertEqual(result, new)
+        self.assertEqual(result['vars'], new['vars'])
+
+    def test_from_scratch(self):
+        new = _with_vars(dict(foo=1))
+        (delta, result) = self._roundtrip(dict(), new)
+        self.assertEqual(result, new)
+
+    def test_old_is_not_modified(self):
+        old = _with_vars(dict(foo=1))
+        (delta, result) = self._roundtrip(old, _with_vars(dict(foo=2)))
+        self.assertEqual(old['foo'], 1)
+        self.assertEqual(old['vars'], dict(foo=1))
+        self.assertEqual(result['vars'], dict(foo=2))
+
+    def test_vars_view_differences(self):
+        new = _with_vars(dict(foo=1, bar=2))
+        new['vars']['bar'] = 3
+        new['added_later'] = 4
+
+        ((changed, removed, filled, vars_view), result) = self._roundtrip(dict(), new)
+        self.assertEqual(vars_view, (['added_later'], {'bar': 3}))
+        self.assertEqual(result, new)
+
+    def test_skipped_keys_are_filled(self):
+        controller_hostvars = object()
+        worker_hostvars = object()
+
+        old = dict(foo=1, hostvars=worker_hostvars)
+        new = _with_vars(dict(foo=1, hostvars=controller_hostvars))
+
+        ((changed, removed, filled, vars_view), result) = self._roundtrip(old, new, skip=('hostvars',), fill=dict(hostvars=worker_hostvars))
+        self.assertEqual(changed, {})
+        self.assertEqual(filled, ['hostvars'])
+        self.assertIs(result['hostvars'], worker_hostvars)
+        self.assertIs(result['vars']['hostvars'], worker_hostvars)
+
+        # and dropped again when no longer present
+        (delta, result) = self._roundtrip(result, dict(foo=1), skip=('hostvars',), fill=dict(hostvars=worker_hostvars))
+        self.assertEqual(result, dict(foo=1))
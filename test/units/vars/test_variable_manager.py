@@ -19,16 +19,19 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import json
 import os
 
 from collections import defaultdict
 
 from ansible.compat.tests import unittest
 from ansible.compat.tests.mock import MagicMock, mock_open, patch
+from ansible.errors import AnsibleError
 from ansible.inventory.manager import InventoryManager
 from ansible.module_utils.six import iteritems
 from ansible.module_utils.six.moves import builtins
 from ansible.playbook.play import Play
+from ansible.template import Templar
 
 
 from units.mock.loader import DictDataLoader
@@ -303,3 +306,140 @@ class TestVariableManager(unittest.TestCase):
         task = blocks[2].block[0]
         res = v.get_vars(play=play1, task=task)
         self.assertEqual(res['role_var'], 'role_var_from_role2')
+
+    def test_variable_manager_changes(self):
+        fake_loader = DictDataLoader({})
+
+        mock_inventory = MagicMock()
+        host = MagicMock()
+        host.name = host.get_name.return_value = 'host1'
+
+        v = VariableManager(loader=fake_loader, inventory=mock_inventory)
+        v._fact_cache = {}
+
+        # changes are only recorded once asked to
+        v.set_host_variable(host, 'included', 0)
+        self.assertEqual(v._changes, [])
+
+        v.track_changes()
+        (version, host_state, inventory) = v.get_changes()
+        self.assertEqual(host_state, {})
+        self.assertIsNone(inventory)
+
+        v.set_host_facts(host, dict(fact=1))
+        v.set_nonpersistent_facts(host, dict(registered=2))
+        v.set_host_variable(host, 'included', 3)
+        (new_version, host_state, inventory) = v.get_changes(since=version)
+        self.assertEqual(host_state, {'host1': (dict(fact=1), dict(registered=2), dict(included=3))})
+        self.assertIsNone(inventory)
+
+        v.mark_inventory_changed()
+        (newer_version, host_state, inventory) = v.get_changes(since=new_version)
+        self.assertEqual(host_state, {})
+        self.assertIs(inventory, mock_inventory)
+
+        # a copy catches up on the changes made to the original
+        other = VariableManager(loader=fake_loader, inventory=MagicMock())
+        other._fact_cache = {}
+        (_, host_state, inventory) = v.get_changes(since=version)
+        other.apply_changes(host_state, inventory)
+        self.assertEqual(other._fact_cache, {'host1': dict(fact=1)})
+        self.assertEqual(other._nonpersistent_fact_cache['host1'], dict(registered=2))
+        self.assertEqual(other._vars_cache['host1'], dict(included=3))
+        self.assertIs(other._inventory, mock_inventory)
+
+        v.clear_facts('host1')
+        (_, host_state, inventory) = v.get_changes(since=newer_version)
+        other.apply_changes(host_state, inventory)
+        self.assertEqual(other._fact_cache, {})
+
+        # the changes seen by every consumer are dropped, versions go on
+        (newest_version, _, _) = v.get_changes()
+        v.drop_changes(newer_version)
+        self.assertEqual(v._changes, ['host1'])
+        self.assertEqual(v.get_changes(since=newer_version)[0], newest_version)
+        v.set_host_variable(host, 'included', 4)
+        (_, host_state, _) = v.get_changes(since=newest_version)
+        self.assertEqual(host_state['host1'][2], dict(included=4))
+        self.assertRaises(AnsibleError, v.get_changes, since=version)
+
+    def test_variable_manager_layer_cache(self):
+        fake_loader = DictDataLoader({})
+
+        inventory = InventoryManager(loader=fake_loader)
+        inventory.add_host('host1')
+        host = inventory.get_host('host1')
+        host.set_variable('inv_var', 'one')
+
+        v = VariableManager(loader=fake_loader, inventory=inventory)
+        self.assertEqual(v.get_vars(host=host).get('inv_var'), 'one')
+
+        # inventory vars are cached until the inventory is marked as changed
+        host.set_variable('inv_var', 'two')
+        self.assertEqual(v.get_vars(host=host).get('inv_var'), 'one')
+        self.assertEqual(v.get_vars(host=host, use_cache=False).get('inv_var'), 'two')
+        v.mark_inventory_changed()
+        self.assertEqual(v.get_vars(host=host).get('inv_var'), 'two')
+
+        # facts are picked up as soon as they are set or cleared
+        v.set_host_facts(host, dict(fact='one'))
+        self.assertEqual(v.get_vars(host=host)['ansible_facts'], dict(fact='one'))
+        v.set_host_facts(host, dict(fact='two'))
+        self.assertEqual(v.get_vars(host=host)['ansible_facts'], dict(fact='two'))
+        v.clear_facts('host1')
+        self.assertEqual(v.get_vars(host=host)['ansible_facts'], dict())
+
+    def test_variable_manager_magic_host_lists(self):
+        fake_loader = DictDataLoader({})
+
+        inventory = InventoryManager(loader=fake_loader)
+        for name in ('host1', 'host2', 'host3'):
+            inventory.add_host(name)
+        inventory.reconcile_inventory()
+        v = VariableManager(loader=fake_loader, inventory=inventory)
+        play = Play.load(dict(hosts=['all']), loader=fake_loader, variable_manager=v)
+        (host1, host2) = (inventory.get_host('host1'), inventory.get_host('host2'))
+
+        vars1 = v.get_vars(play=play, host=host1)
+        self.assertEqual(vars1['groups'], inventory.get_groups_dict())
+        self.assertEqual(vars1['groups']['all'], ['host1', 'host2', 'host3'])
+        self.assertNotIn('nope', vars1['groups'])
+        self.assertRaises(KeyError, vars1['groups'].__getitem__, 'nope')
+
+        # the groups and play host lists are shared until the play or inventory state changes
+        vars2 = v.get_vars(play=play, host=host2)
+        self.assertIs(vars1['groups'], vars2['groups'])
+        self.assertIs(vars1['ansible_play_hosts'], vars2['ansible_play_hosts'])
+
+        play._removed_hosts.append('host2')
+        self.assertEqual(v.get_vars(play=play, host=host1)['ansible_play_hosts'], ['host1', 'host3'])
+
+        inventory.restrict_to_hosts([host1])
+        self.assertEqual(v.get_vars(play=play, host=host1)['ansible_play_batch'], ['host1'])
+        inventory.remove_restriction()
+
+        inventory.add_group('new')
+        inventory.add_host('host4', group='new')
+        inventory.reconcile_inventory()
+        v.mark_inventory_changed()
+        vars3 = v.get_vars(play=play, host=host1)
+        self.assertEqual(sorted(vars3['ansible_play_hosts_all']), ['host1', 'host2', 'host3', 'host4'])
+        self.assertEqual(vars3['groups']['new'], ['host4'])
+        self.assertEqual(vars1['groups']['all'], ['host1', 'host2', 'host3'])
+
+    def test_variable_manager_groups_filters(self):
+        fake_loader = DictDataLoader({})
+
+        inventory = InventoryManager(loader=fake_loader, sources='host1,host2')
+        inventory.add_group('web')
+        inventory.add_host('host2', group='web')
+        inventory.reconcile_inventory()
+        v = VariableManager(loader=fake_loader, inventory=inventory)
+        templar = Templar(loader=fake_loader, variables=v.get_vars(host=inventory.get_host('host1')))
+
+        groups = inventory.get_groups_dict()
+        self.assertEqual(sorted(groups), ['all', 'ungrouped', 'web'])
+        self.assertEqual(sorted(templar.template('{{ groups | dict2items }}'), key=lambda item: item['key']),
+                         [dict(key=k, value=groups[k]) for k in sorted(groups)])
+        self.assertEqual(templar.template("{{ groups | combine({'db': ['host3']}) }}"), dict(groups, db=['host3']))
+        self.assertEqual(json.loads(templar.template('{{ groups | to_json }}')), groups)